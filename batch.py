@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Batch generation of several environments, with a check for conflicts between them.
+
+The environments come from several k8s-env.yaml files, or from a matrix: one base config and a list of
+per-environment overrides (name, ports, domains, the enabled services, ...). service_presets.yaml and the
+templates are parsed and compiled once, before the worker processes start. Forked workers inherit them,
+and spawned workers load them once each, so every environment only costs its own context and rendering.
+
+The environments are first checked against each other, without writing anything: two environments conflict
+when they share a name, when their DNS domains overlap, or when they publish the same host port on
+overlapping addresses (Kubernetes API, ingress and service ports of the ingress nodes, image cache mirrors).
+Only without conflicts (or with --force) are they generated, in parallel and with the same incremental
+rendering as generate_configs.py.
+
+The DNS resolver of each domain is not installed here (it needs sudo); `task generate-configs` or
+`task create-env` with the environment's config does that.
+
+Usage:
+    python3 batch.py team-a.yaml team-b.yaml                  # generate several environments
+    python3 batch.py --matrix environments.yaml               # a base config with per-environment overrides
+    python3 batch.py --matrix environments.yaml --check       # only check for conflicts, write nothing
+    python3 batch.py --matrix environments.yaml --force       # generate even when environments conflict
+    python3 batch.py --matrix environments.yaml --json        # one JSON document with per-environment results
+
+Matrix file:
+    base: k8s-env.yaml            # relative to the matrix file
+    output-dir: .batch            # where each environment's config is written (default: .batch next to the matrix)
+    environments:
+      - name: team-a              # environment.name
+        services: [mysql, valkey] # only enable these services (optional)
+        overrides:                # deep-merged into the base config's environment
+          local-domain: team-a.me
+          kubernetes:
+            api-port: 6444
+"""
+import io
+import os
+import sys
+import copy
+import json
+import time
+import argparse
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+import yaml
+
+from generate_configs import (
+    ANY_ADDRESS, create_output_directories, deep_merge_dicts, generate_config_files, get_k8s_dir, get_published_ports,
+    load_config, prepare_context, save_credential_store, warm_up, write_resolved_vars,
+)
+
+DEFAULT_OUTPUT_DIR = '.batch'
+
+def load_matrix(matrix_file):
+    """
+    Build the config of every environment of a matrix file, in memory.
+    Each config is the base config with the environment's name, services and overrides applied;
+    returns (config_file, config) pairs, where config_file is the path the config is written to.
+    """
+    matrix_dir = os.path.dirname(os.path.abspath(matrix_file))
+    matrix = load_config(matrix_file) or {}
+    if 'base' not in matrix or not matrix.get('environments'):
+        raise ValueError(f"{matrix_file} needs a base config and a list of environments")
+    base = load_config(os.path.join(matrix_dir, matrix['base']))
+    output_dir = os.path.join(matrix_dir, matrix.get('output-dir', DEFAULT_OUTPUT_DIR))
+
+    environments = []
+    for entry in matrix['environments']:
+        if 'name' not in entry:
+            raise ValueError(f"Every environment in {matrix_file} needs a name")
+        config = copy.deepcopy(base)
+        env = config['environment']
+        deep_merge_dicts(entry.get('overrides', {}) or {}, env)
+        env['name'] = entry['name']
+        if 'services' in entry:
+            enabled = set(entry['services'])
+            for service in itertools.chain.from_iterable(services or [] for services in (env.get('services') or {}).values()):
+                service['enabled'] = service['name'] in enabled
+        environments.append((os.path.join(output_dir, f"{entry['name']}.yaml"), config))
+    return environments
+
+def write_matrix(matrix_file, environments):
+    """Write the configs built by load_matrix, so each environment's tasks can run with its CONFIG_FILE"""
+    for config_file, config in environments:
+        os.makedirs(os.path.dirname(config_file), exist_ok=True)
+        content = f"# Generated by batch.py from {os.path.basename(matrix_file)} - do not edit\n" + \
+                  yaml.safe_dump(config, sort_keys=False)
+        # Leave an unchanged config alone, so incremental generation and Task see no change
+        try:
+            with open(config_file) as f:
+                unchanged = f.read() == content
+        except FileNotFoundError:
+            unchanged = False
+        if not unchanged:
+            with open(config_file, 'w') as f:
+                f.write(content)
+
+def get_footprint(context):
+    """What an environment claims on the host: its DNS domain and published host ports"""
+    return {'domain': context['local_domain'], 'bindings': get_published_ports(context)}
+
+def generate_environment(config_file, check_only=False, config=None):
+    """
+    Prepare (and unless check_only, generate) one environment; runs in a worker process.
+    `config` is the environment's config when it is only held in memory, otherwise it is read from config_file.
+    """
+    start = time.perf_counter()
+    output = io.StringIO()
+    result = {'config_file': config_file, 'name': None, 'changed': None, 'footprint': None, 'error': None}
+    try:
+        with redirect_stdout(output):
+            if config is None:
+                config = load_config(config_file)
+            result['name'] = config['environment']['name']
+            if not check_only:
+                write_resolved_vars(config, config_file)
+            context = prepare_context(config)
+            result['footprint'] = get_footprint(context)
+            if not check_only:
+                create_output_directories(context)
+                save_credential_store(context['k8s_dir'], context['credentials'])
+                result['changed'] = generate_config_files(context)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['log'] = output.getvalue()
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+def addresses_overlap(a, b):
+    return a == b or ANY_ADDRESS in (a, b)
+
+def domains_overlap(a, b):
+    """Equal domains, or one a subdomain of the other, send the same queries to both environments' DNS"""
+    return a == b or a.endswith('.' + b) or b.endswith('.' + a)
+
+def find_conflicts(results):
+    """Conflicts between every pair of successfully prepared environments, as messages"""
+    conflicts = []
+    prepared = [result for result in results if result['footprint']]
+    for a, b in itertools.combinations(prepared, 2):
+        pair = f"{a['name']} ({a['config_file']}) and {b['name']} ({b['config_file']})"
+        if a['name'] == b['name']:
+            conflicts.append(f"{pair} have the same name")
+        if domains_overlap(a['footprint']['domain'], b['footprint']['domain']):
+            conflicts.append(f"{pair} have overlapping DNS domains "
+                             f"{a['footprint']['domain']} and {b['footprint']['domain']}")
+        by_port = {}
+        for binding in b['footprint']['bindings']:
+            by_port.setdefault(binding['port'], []).append(binding)
+        ports = sorted({binding['port'] for binding in a['footprint']['bindings']
+                        for other in by_port.get(binding['port'], [])
+                        if addresses_overlap(binding['address'], other['address'])})
+        if ports:
+            conflicts.append(f"{pair} both publish host ports {', '.join(map(str, ports))}")
+    return conflicts
+
+def get_available_cpus():
+    """CPUs this process may run on (its affinity on Linux, which can be fewer than the machine has)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def get_start_method():
+    """Fork shares the warmed-up presets and templates with the workers; macOS and Windows spawn them"""
+    methods = multiprocessing.get_all_start_methods()
+    return 'fork' if 'fork' in methods and sys.platform != 'darwin' else 'spawn'
+
+def generate_all(config_files, jobs=None, check_only=False, configs=None):
+    """
+    Generate all environments, in parallel worker processes; returns one result per config file, in order.
+    `configs` holds the in-memory config of each config file, or None for the ones read from disk.
+    """
+    configs = configs or [None] * len(config_files)
+    # A check writes nothing, not even the on-disk caches of the presets and templates
+    cache_dir = None
+    if not check_only:
+        first_config = configs[0] if configs[0] is not None else load_config(config_files[0])
+        cache_dir = os.path.join(get_k8s_dir(first_config['environment']), '.cache')
+    warm_up(cache_dir)
+    jobs = min(jobs or get_available_cpus(), len(config_files))
+    # An environment renders in milliseconds, so a single worker runs in this process without a pool
+    if jobs == 1:
+        return [generate_environment(config_file, check_only, config) for config_file, config in zip(config_files, configs)]
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context(get_start_method()),
+                             initializer=warm_up, initargs=(cache_dir,)) as executor:
+        return list(executor.map(generate_environment, config_files, [check_only] * len(config_files), configs,
+                                 chunksize=max(1, len(config_files) // (jobs * 4))))
+
+def print_results(results, conflicts, verbose=False):
+    for result in results:
+        if result['error']:
+            print(f"  ❌ {result['name'] or result['config_file']}: {result['error']}")
+        elif result['changed'] is None:
+            print(f"  🔍 {result['name']}: checked ({result['seconds']}s)")
+        elif result['changed']:
+            print(f"  📝 {result['name']}: updated {', '.join(result['changed'])} ({result['seconds']}s)")
+        else:
+            print(f"  ℹ️ {result['name']}: up to date ({result['seconds']}s)")
+        if verbose or result['error']:
+            for line in result['log'].splitlines():
+                print(f"      {line}")
+    if conflicts:
+        print(f"❌ {len(conflicts)} conflicts between environments:")
+        for conflict in conflicts:
+            print(f"  ⚠️  {conflict}")
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Generate several environments at once and check them for conflicts")
+    parser.add_argument('config_files', nargs='*', help="k8s-env.yaml files of the environments")
+    parser.add_argument('--matrix', help="a matrix file with a base config and per-environment overrides")
+    parser.add_argument('--jobs', '-j', type=int, help="worker processes (default: one per available CPU)")
+    parser.add_argument('--check', action='store_true', help="only check the environments for conflicts, write nothing")
+    parser.add_argument('--force', action='store_true', help="generate the environments even when they conflict")
+    parser.add_argument('--verbose', '-v', action='store_true', help="print the generator output of every environment")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args(argv)
+    if not args.config_files and not args.matrix:
+        parser.error("config files or --matrix are required")
+    return args
+
+def main(argv):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    config_files = [os.path.abspath(path) for path in args.config_files]
+    configs = [None] * len(config_files)
+    environments = []
+    if args.matrix:
+        # The workers get the configs in memory; they are only written when generating, for the environments' tasks
+        environments = load_matrix(args.matrix)
+        config_files += [config_file for config_file, _ in environments]
+        configs += [config for _, config in environments]
+
+    if not args.json:
+        print(f"🔄 Checking {len(config_files)} environments...")
+    # Conflicts are found before anything is written, so clashing environments are not generated
+    results = generate_all(config_files, args.jobs, True, configs)
+    conflicts = find_conflicts(results)
+    generate = not args.check and (not conflicts or args.force)
+    if generate:
+        if not args.json:
+            print(f"🔄 Generating {len(config_files)} environments...")
+        if environments:
+            write_matrix(args.matrix, environments)
+        results = generate_all(config_files, args.jobs, False, configs)
+    ok = not conflicts and not any(result['error'] for result in results)
+    seconds = round(time.perf_counter() - start, 3)
+
+    if args.json:
+        print(json.dumps({'ok': ok, 'generated': generate, 'seconds': seconds, 'conflicts': conflicts,
+                          'environments': [{key: value for key, value in result.items() if key != 'footprint'}
+                                           for result in results]}, indent=2))
+    else:
+        print_results(results, conflicts, args.verbose)
+        print(f"  ⏱️  {len(config_files)} environments in {seconds}s")
+        if conflicts and not args.check and not generate:
+            print("❌ Nothing was generated; resolve the conflicts or use --force to generate anyway")
+        if ok:
+            print("✅ All environments generated without conflicts" if generate else "✅ No conflicts between environments")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
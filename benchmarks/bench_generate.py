@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Offline scalability benchmark for generate_configs.py.
+
+Builds synthetic k8s-env configurations (number of services, number of nodes, size of helm values)
+and measures wall time and peak memory of each generator stage. No cluster, container runtime or
+network access is needed; all output goes to a temporary base-dir.
+
+Usage:
+    python3 benchmarks/bench_generate.py                               # run the default scenarios
+    python3 benchmarks/bench_generate.py --scenarios 10x3,500x50       # <services>x<nodes>
+    python3 benchmarks/bench_generate.py --save-baseline               # store results as the baseline
+    python3 benchmarks/bench_generate.py --compare                     # fail on regressions vs the baseline
+"""
+import os
+import io
+import sys
+import copy
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import statistics
+from contextlib import redirect_stdout
+
+import yaml
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import generate_configs as gc
+
+DEFAULT_SCENARIOS = '1x1,10x3,50x5,200x20,500x50'
+DEFAULT_BASELINE_FILE = os.path.join(BENCH_DIR, '.baseline.json')
+
+# System services with presets; the remaining synthetic services are user services
+SYSTEM_SERVICES = {
+    'mysql': ('groundhog2k/mysql', '3.0.7', 3306),
+    'postgres': ('groundhog2k/postgres', '1.6.0', 5432),
+    'mongodb': ('groundhog2k/mongodb', '0.7.6', 27017),
+    'rabbitmq': ('groundhog2k/rabbitmq', '2.2.2', 5672),
+    'valkey': ('groundhog2k/valkey', '2.2.2', 6379),
+}
+
+def parse_scenarios(value):
+    """Parse '10x3,500x50' into [(10, 3), (500, 50)]"""
+    scenarios = []
+    for item in value.split(','):
+        services, _, nodes = item.strip().partition('x')
+        if not services.isdigit() or not nodes.isdigit() or int(services) < 1 or int(nodes) < 1:
+            raise argparse.ArgumentTypeError(f"invalid scenario '{item}', expected <services>x<nodes>")
+        scenarios.append((int(services), int(nodes)))
+    return scenarios
+
+def build_values(depth, width, index):
+    """Build a nested helm values tree with variable references, lists and an ingress block"""
+    if depth == 0:
+        return f"value-{index}.${{LOCAL_DOMAIN}}"
+    values = {}
+    for i in range(width):
+        key = f"key{depth}_{i}"
+        if i % 3 == 2:
+            values[key] = [build_values(depth - 1, max(1, width // 2), index) for _ in range(2)]
+        else:
+            values[key] = build_values(depth - 1, width, index)
+    return values
+
+def build_config(num_services, num_nodes, base_dir, values_depth=3, values_width=5):
+    """Build a synthetic k8s-env configuration"""
+    servers = 1 if num_nodes < 5 else 3
+    system_services = []
+    for i, (name, (chart, version, port)) in enumerate(SYSTEM_SERVICES.items()):
+        if i >= num_services:
+            break
+        system_services.append({
+            'name': name,
+            'enabled': True,
+            'namespace': 'common-services',
+            'ports': [port],
+            'storage': {'size': '1Gi'},
+            'config': {
+                'repo': {'ref': 'groundhog2k'},
+                'chart': chart,
+                'version': version,
+                'values': {'extra': build_values(values_depth, values_width, i)},
+            },
+        })
+
+    user_services = []
+    for i in range(len(system_services), num_services):
+        name = f"app{i}"
+        values = build_values(values_depth, values_width, i)
+        values['ingress'] = {
+            'enabled': True,
+            'hosts': [{'host': f"{name}.${{APPS_SUBDOMAIN}}.${{LOCAL_DOMAIN}}", 'paths': [{'path': '/'}]}],
+            'tls': [{'hosts': [f"{name}.${{LOCAL_APPS_DOMAIN}}"]}],
+        }
+        values['image'] = {'repository': f"${{REGISTRY_HOST}}/{name}", 'tag': 'latest'}
+        user_services.append({
+            'name': name,
+            'enabled': True,
+            'namespace': f"team{i % 10}",
+            'ports': [20000 + i] if i % 4 == 0 else [],
+            'config': {
+                'repo': {'ref': 'bjw-s'},
+                'chart': 'bjw-s/app-template',
+                'version': '4.4.0',
+                'values': values,
+            },
+        })
+
+    return {
+        'environment': {
+            'name': 'bench',
+            'base-dir': base_dir,
+            'expand-env-vars': True,
+            'provider': {'name': 'kind', 'runtime': 'docker'},
+            'kubernetes': {'api-port': 6443, 'image': 'kindest/node', 'tag': 'v1.34.0'},
+            'nodes': {
+                'servers': servers,
+                'workers': num_nodes - servers if num_nodes > servers else 0,
+                'allow-scheduling-on-control-plane': True,
+                'internal-components-on-control-plane': True,
+                'labels': {
+                    'control-plane': {'tier': 'control'},
+                    'worker': {'tier': 'compute'},
+                },
+            },
+            'local-ip': '192.168.0.10',
+            'local-domain': 'bench.me',
+            'use-apps-subdomain': True,
+            'apps-subdomain': 'apps',
+            'local-lb-ports': [80, 443],
+            'registry': {'name': 'cr', 'storage': {'size': '15Gi'}},
+            'internal-components': [
+                {'app-template': '4.4.0'},
+                {'traefik': '37.3.0'},
+                {'metrics-server': '3.13.0'},
+                {'registry': '3'},
+                {'dnsmasq': '2.91'},
+            ],
+            'use-service-presets': True,
+            'run-services-on-workers-only': True,
+            'enable-metrics-server': False,
+            'helm-repositories': [
+                {'name': 'groundhog2k', 'url': 'https://groundhog2k.github.io/helm-charts/'},
+                {'name': 'bjw-s', 'url': 'https://bjw-s-labs.github.io/helm-charts/'},
+            ],
+            'services': {'system': system_services, 'user': user_services},
+        }
+    }
+
+def build_stages(config):
+    """
+    Return (name, setup, run) for each stage; `setup` prepares fresh inputs outside of the measurement
+    since the generator mutates the service definitions it processes.
+    """
+    env = config['environment']
+    repositories = env['helm-repositories']
+    k8s_env_vars = gc.build_k8s_env_vars(env)
+    service_ports, service_values_presets, _, _ = gc.load_presets()
+
+    def fresh_services(kind):
+        services = copy.deepcopy(env['services'][kind])
+        gc.resolve_repo_references(services, repositories)
+        return services
+
+    def fresh_config():
+        return copy.deepcopy(config)
+
+    context = gc.prepare_context(fresh_config())
+    gc.create_output_directories(context)
+    config_dir = f"{context['k8s_dir']}/config"
+    cache_dir = f"{context['k8s_dir']}/.cache"
+    config_file = f"{context['k8s_dir']}/k8s-env.yaml"
+    with open(config_file, 'w') as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+    values = [
+        service[key] for service in context['system_services'] + context['user_services']
+        for key in ('base_values', 'custom_values') if service.get(key)
+    ]
+    # Compile the templates up front so the first render stage does not include it
+    gc.render_all(context)
+
+    def clean_config_dir():
+        # Keep the directories (e.g. dnsmasq.d), the generator does not create them
+        for root, _, files in os.walk(config_dir):
+            for name in files:
+                os.remove(os.path.join(root, name))
+
+    def clear_presets_cache(remove_file):
+        gc._presets_cache = None
+        if remove_file and os.path.exists(os.path.join(cache_dir, gc.PRESETS_CACHE_FILE)):
+            os.remove(os.path.join(cache_dir, gc.PRESETS_CACHE_FILE))
+
+    stages = [
+        ('load_config', lambda: None, lambda _: gc.load_config(config_file)),
+        # A new generator run: the parsed presets come from the on-disk cache
+        ('load_presets', lambda: clear_presets_cache(False), lambda _: gc.load_presets(cache_dir)),
+        ('load_presets (uncached)', lambda: clear_presets_cache(True), lambda _: gc.load_presets()),
+        ('to_yaml (service values)', lambda: None, lambda _: [gc.custom_yaml_dump(value) for value in values]),
+        ('process_system_services', lambda: fresh_services('system'), lambda services: gc.process_system_services(
+            services, service_ports, service_values_presets, True, k8s_env_vars)),
+        ('process_user_services', lambda: fresh_services('user'), lambda services: gc.process_user_services(
+            services, k8s_env_vars)),
+        ('prepare_context', fresh_config, gc.prepare_context),
+    ]
+    for output_name in gc.CONFIG_TEMPLATES:
+        stages.append((f"render {output_name}", lambda: None,
+                       lambda _, output_name=output_name: gc.render_output(output_name, context)))
+    stages.append(('generate_config_files (cold)', clean_config_dir, lambda _: gc.generate_config_files(context)))
+    stages.append(('generate_config_files (warm)', lambda: None, lambda _: gc.generate_config_files(context)))
+    return stages
+
+def measure(setup, run, repeat):
+    """Median wall time over `repeat` runs, then peak traced memory of one extra run"""
+    timings = []
+    for _ in range(repeat):
+        data = setup()
+        start = time.perf_counter()
+        run(data)
+        timings.append(time.perf_counter() - start)
+
+    data = setup()
+    tracemalloc.start()
+    run(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'time_ms': round(statistics.median(timings) * 1000, 3),
+        'min_ms': round(min(timings) * 1000, 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+def run_scenario(num_services, num_nodes, repeat, values_depth, values_width, work_dir):
+    base_dir = os.path.join(work_dir, f"{num_services}x{num_nodes}")
+    config = build_config(num_services, num_nodes, base_dir, values_depth, values_width)
+    results = {}
+    # The generator reports progress on stdout; keep the benchmark output readable
+    with redirect_stdout(io.StringIO()):
+        for name, setup, run in build_stages(config):
+            results[name] = measure(setup, run, repeat)
+    return results
+
+def print_results(scenario, results, baseline=None):
+    print(f"\n📊 {scenario[0]} services x {scenario[1]} nodes")
+    print(f"  {'stage':<34} {'median ms':>11} {'min ms':>10} {'peak KiB':>11}  {'min vs base':>12}")
+    for stage, result in results.items():
+        delta = ''
+        if baseline and stage in baseline:
+            previous = baseline[stage]['min_ms']
+            delta = f"{(result['min_ms'] - previous) / previous * 100:+.1f}%" if previous else 'n/a'
+        print(f"  {stage:<34} {result['time_ms']:>11.3f} {result['min_ms']:>10.3f} {result['peak_kib']:>11.1f}  {delta:>12}")
+
+def find_regressions(results, baseline, max_regression, min_delta_ms):
+    """Compare results with a baseline; small absolute changes are treated as noise"""
+    regressions = []
+    for scenario, stages in results.items():
+        for stage, result in stages.items():
+            previous = baseline.get(scenario, {}).get(stage)
+            if not previous:
+                continue
+            # The fastest run is the least affected by other load on the machine
+            time_delta = result['min_ms'] - previous['min_ms']
+            if time_delta > min_delta_ms and time_delta > previous['min_ms'] * max_regression:
+                regressions.append(f"{scenario} {stage}: {previous['min_ms']:.3f} ms -> {result['min_ms']:.3f} ms (min)")
+            memory_delta = result['peak_kib'] - previous['peak_kib']
+            if memory_delta > 64 and memory_delta > previous['peak_kib'] * max_regression:
+                regressions.append(f"{scenario} {stage}: {previous['peak_kib']:.1f} KiB -> {result['peak_kib']:.1f} KiB peak")
+    return regressions
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark configuration generation with synthetic environments")
+    parser.add_argument('--scenarios', type=parse_scenarios, default=parse_scenarios(DEFAULT_SCENARIOS),
+                        help=f"comma-separated <services>x<nodes> pairs (default: {DEFAULT_SCENARIOS})")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage (default: 3)")
+    parser.add_argument('--values-depth', type=int, default=3, help="nesting depth of synthetic helm values (default: 3)")
+    parser.add_argument('--values-width', type=int, default=5, help="keys per level of synthetic helm values (default: 5)")
+    parser.add_argument('--baseline-file', default=DEFAULT_BASELINE_FILE, help="baseline results file")
+    parser.add_argument('--save-baseline', action='store_true', help="store the results as the new baseline")
+    parser.add_argument('--compare', action='store_true', help="exit with an error when results regress vs the baseline")
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help="allowed relative slowdown or memory growth before failing (default: 0.25)")
+    parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                        help="ignore slowdowns smaller than this many milliseconds (default: 2.0)")
+    parser.add_argument('--json', dest='json_file', help="also write the results to this file")
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+
+    baseline = {}
+    if args.compare or os.path.exists(args.baseline_file):
+        if os.path.exists(args.baseline_file):
+            with open(args.baseline_file) as f:
+                baseline = json.load(f).get('results', {})
+        elif args.compare:
+            print(f"❌ Baseline file {args.baseline_file} not found, run with --save-baseline first")
+            return 1
+
+    print(f"🔄 Benchmarking generate_configs.py (values depth {args.values_depth}, width {args.values_width}, {args.repeat} runs)")
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='k8s-env-bench-') as work_dir:
+        for num_services, num_nodes in args.scenarios:
+            scenario = f"{num_services}x{num_nodes}"
+            results[scenario] = run_scenario(num_services, num_nodes, args.repeat, args.values_depth, args.values_width, work_dir)
+            print_results((num_services, num_nodes), results[scenario], baseline.get(scenario))
+
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'values_depth': args.values_depth,
+        'values_width': args.values_width,
+        'results': results,
+    }
+    if args.json_file:
+        with open(args.json_file, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline_file, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Baseline saved to {args.baseline_file}")
+
+    if args.compare:
+        regressions = find_regressions(results, baseline, args.max_regression, args.min_delta_ms)
+        if regressions:
+            print("\n❌ Regressions against the baseline:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print("\n✅ No regressions against the baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,65 +1,154 @@
 #!/usr/bin/env python3
 import os
 import sys
+import json
+import time
+import argparse
 import yaml
 import jinja2
 import subprocess
 import secrets
 import string
+import re
+import pickle
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from k8s_timing import Stopwatch
+
 CACERT_FILE = "/etc/ssl/certs/mkcert-ca.pem"
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_DIR = os.path.join(SCRIPT_DIR, 'templates')
+
+# Generated files under <k8s_dir>/config and the templates they are rendered from
+CONFIG_TEMPLATES = {
+    'cluster.yaml': 'kind/cluster.yaml.j2',
+    'containerd.yaml': 'containerd/config.yaml.j2',
+    'dnsmasq.conf': 'dnsmasq/config.conf.j2',
+    'dnsmasq.d/services.hosts': 'dnsmasq/services.hosts.j2',
+    'helmfile.yaml': 'helmfile/helmfile.yaml.j2',
+    'traefik-tcp-routes.yaml': 'traefik-tcp-routes.yaml.j2',
+    'storage-tiers.yaml': 'storage-tiers.yaml.j2',
+}
+
+RENDER_MANIFEST_FILE = 'render-manifest.json'
+
+# Directory under <k8s_dir>/config with the hosts files dnsmasq watches, so records change without a restart
+DNSMASQ_HOSTS_DIR = 'dnsmasq.d'
+
+# dnsmasq cache settings, overridable with dns.cache-size, dns.local-ttl and dns.neg-ttl
+DEFAULT_DNS_CACHE = {'cache-size': 1000, 'local-ttl': 60, 'neg-ttl': 60}
+
 def generate_random_password(length=16):
     """Generate a secure random password"""
     alphabet = string.ascii_letters + string.digits + "!@#$%^&*"
     return ''.join(secrets.choice(alphabet) for _ in range(length))
 
-def generate_chart_auth_config(service_name, chart_name):
+# Credentials required by the supported charts: the fixed username and the generated secrets with their length
+CHART_CREDENTIALS = {
+    'mysql': {'username': 'root', 'secrets': {'password': 16}},
+    'postgres': {'username': 'postgres', 'secrets': {'password': 16}},
+    'mongodb': {'username': 'root', 'secrets': {'password': 16}},
+    'rabbitmq': {'username': 'admin', 'secrets': {'password': 16, 'erlangCookie': 32}},
+}
+
+CREDENTIALS_FILE = 'credentials.json'
+
+# Fingerprints of the releases applied by the last successful helmfile run, stored under k8s_dir
+APPLIED_RELEASES_FILE = 'applied-releases.json'
+
+def get_chart_basename(chart_name):
+    # Extract chart name from full path (e.g., 'groundhog2k/mysql' -> 'mysql')
+    return chart_name.split('/')[-1] if '/' in chart_name else chart_name
+
+def load_credential_store(k8s_dir):
+    """Load stored service credentials from <k8s_dir>/credentials.json"""
+    try:
+        with open(os.path.join(k8s_dir, CREDENTIALS_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_credential_store(k8s_dir, credentials):
+    """Persist service credentials, readable by the current user only; unchanged stores are not rewritten"""
+    content = json.dumps(credentials, indent=2, sort_keys=True) + "\n"
+    credentials_path = os.path.join(k8s_dir, CREDENTIALS_FILE)
+    if hash_file(credentials_path) != hash_content(content):
+        write_file_atomic(credentials_path, content, mode=0o600)
+
+def resolve_service_credentials(credentials, service_name, chart_name, rotate=False):
+    """
+    Return the credentials for a service from the store, generating them only when missing
+    or when rotation is requested. Returns a (credentials, generated) tuple, or (None, False)
+    for charts without credentials.
+    """
+    spec = CHART_CREDENTIALS.get(get_chart_basename(chart_name))
+    if not spec:
+        return None, False
+    
+    stored = credentials.get(service_name, {})
+    if not rotate and stored.get('username') == spec['username'] and all(key in stored for key in spec['secrets']):
+        return stored, False
+    
+    entry = {'username': spec['username']}
+    for key, length in spec['secrets'].items():
+        entry[key] = generate_random_password(length)
+    credentials[service_name] = entry
+    return entry, True
+
+def generate_chart_auth_config(service_name, chart_name, service_credentials=None):
     """Generate authentication configuration for specific charts"""
-    auth_configs = {
-        'mysql': {
+    chart_basename = get_chart_basename(chart_name)
+    if service_credentials is None and chart_basename in CHART_CREDENTIALS:
+        service_credentials, _ = resolve_service_credentials({}, service_name, chart_name)
+    
+    if chart_basename == 'mysql':
+        return {
             'settings': {
                 'rootPassword': {
-                    'value': generate_random_password()
+                    'value': service_credentials['password']
                 }
             }
-        },
-        'postgres': {
+        }
+    if chart_basename == 'postgres':
+        return {
             'settings': {
                 'superuserPassword': {
-                    'value': generate_random_password()
+                    'value': service_credentials['password']
                 }
             }
-        },
-        'mongodb': {
+        }
+    if chart_basename == 'mongodb':
+        return {
             'settings': {
-                'rootUsername': 'root',
-                'rootPassword': generate_random_password()
+                'rootUsername': service_credentials['username'],
+                'rootPassword': service_credentials['password']
             }
-        },
-        'rabbitmq': {
+        }
+    if chart_basename == 'rabbitmq':
+        return {
             'authentication': {
                 'user': {
-                    'value': 'admin'
+                    'value': service_credentials['username']
                 },
                 'password': {
-                    'value': generate_random_password()
+                    'value': service_credentials['password']
                 },
                 'erlangCookie': {
-                    'value': generate_random_password(32)
+                    'value': service_credentials['erlangCookie']
                 }
             }
-        },
-        'valkey': {
+        }
+    if chart_basename == 'valkey':
+        return {
             'useDeploymentWhenNonHA': False  # Use StatefulSet instead of Deployment
         }
-    }
-    
-    # Extract chart name from full path (e.g., 'groundhog2k/mysql' -> 'mysql')
-    chart_basename = chart_name.split('/')[-1] if '/' in chart_name else chart_name
     
-    return auth_configs.get(chart_basename, {})
+    return {}
 
 def deep_merge_dicts(source, destination):
     """Deep merge two dictionaries."""
@@ -72,56 +161,190 @@ def deep_merge_dicts(source, destination):
             destination[key] = value
     return destination
 
-def load_presets():
-    """Load service ports and presets from service_presets.yaml"""
-    # Get the directory containing this script
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    preset_file = os.path.join(script_dir, 'templates', 'service_presets.yaml')
-    with open(preset_file) as f:
-        presets = yaml.safe_load(f)
-    return (
-        presets.get('service_ports', {}),
-        presets.get('service_values_presets', {})
-    )
+# libyaml-backed loader when PyYAML was built with it; it produces the same data as SafeLoader
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+PRESETS_FILE = os.path.join(TEMPLATE_DIR, 'service_presets.yaml')
+
+# Parsed service_presets.yaml, pickled under <k8s_dir>/.cache and reused by later runs
+PRESETS_CACHE_FILE = 'presets.pickle'
+
+# Pickled presets of the current process and the presets file mtime they belong to (e.g. across --watch runs)
+_presets_cache = None
+
+def read_presets(mtime, cache_dir=None):
+    """
+    Return a cache entry (mtime, hash and pickled presets) for service_presets.yaml.
+    The entry on disk is reused when the file's mtime matches, or its content hash when only the mtime changed.
+    """
+    cache_path = os.path.join(cache_dir, PRESETS_CACHE_FILE) if cache_dir else None
+    cached = None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            cached = None
+        if not isinstance(cached, dict) or 'presets' not in cached:
+            cached = None
+        elif cached.get('mtime') == mtime:
+            return cached
+    
+    with open(PRESETS_FILE, 'rb') as f:
+        content = f.read()
+    content_hash = hash_content(content)
+    if cached and cached.get('hash') == content_hash:
+        entry = dict(cached, mtime=mtime)
+    else:
+        presets = yaml.load(content, Loader=YAML_LOADER) or {}
+        entry = {
+            'mtime': mtime,
+            'hash': content_hash,
+            'presets': pickle.dumps((
+                presets.get('service_ports', {}),
+                presets.get('service_values_presets', {}),
+                presets.get('release_timeouts', {}),
+                presets.get('performance_profiles', {})
+            ), protocol=pickle.HIGHEST_PROTOCOL),
+        }
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_file_atomic(cache_path, pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+    return entry
+
+def load_presets(cache_dir=None):
+    """
+    Load service ports, presets, release timeouts and performance profiles from service_presets.yaml.
+    The parsed file is kept in memory and, with a cache_dir, on disk until the file changes.
+    """
+    global _presets_cache
+    mtime = os.stat(PRESETS_FILE).st_mtime_ns
+    if _presets_cache is None or _presets_cache['mtime'] != mtime:
+        _presets_cache = read_presets(mtime, cache_dir)
+    # The presets are merged into service values in place, so every caller gets its own copy
+    return pickle.loads(_presets_cache['presets'])
 
 def load_config(config_file):
     with open(config_file) as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=YAML_LOADER)
+
+class MultilineLiteralRepresenter:
+    """Represent multiline strings as literal blocks (|)"""
+    def represent_scalar(self, tag, value, style=None):
+        if isinstance(value, str) and '\n' in value:
+            style = '|'
+        return super().represent_scalar(tag, value, style)
+
+# Custom YAML dumper class to handle multiline strings
+class MyDumper(MultilineLiteralRepresenter, yaml.Dumper):
+    pass
+
+# The same dumper on libyaml's emitter, when PyYAML was built with it
+if hasattr(yaml, 'CDumper'):
+    class MyCDumper(MultilineLiteralRepresenter, yaml.CDumper):
+        pass
+else:
+    MyCDumper = None
+
+def is_c_dumper_safe(value):
+    """
+    Whether libyaml's emitter writes `value` byte for byte like the pure-Python one.
+    They differ in a few corner cases, which are left to the Python emitter: bare scalars, double-quoted
+    strings (non-printable or non-ASCII characters, spaces before a line break), literal blocks that keep
+    trailing line breaks (|+), and empty, multiline or long keys.
+    """
+    if not isinstance(value, (dict, list)):
+        return False
+    stack = [value]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for key, item in node.items():
+                if isinstance(key, str):
+                    if not key or len(key) > 100 or not key.isascii() or not key.isprintable():
+                        return False
+                elif not (key is None or isinstance(key, (bool, int, float))) or len(repr(key)) > 100:
+                    return False
+                stack.append(item)
+        elif isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, str):
+            if not node.isascii():
+                return False
+            if '\n' in node:
+                if (' \n' in node or node.endswith((' ', '\n\n')) or node == '\n'
+                        or not node.replace('\n', '').isprintable()):
+                    return False
+            elif not node.isprintable():
+                return False
+        elif not (node is None or isinstance(node, (bool, int, float))):
+            return False
+    return True
 
-def setup_jinja_env():
-    # Get the directory containing this script
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    template_dir = os.path.join(script_dir, 'templates')
+# Modified YAML dumper to handle multiline strings
+def custom_yaml_dump(value):
+    dumper = MyCDumper if MyCDumper and is_c_dumper_safe(value) else MyDumper
+    return yaml.dump(value, 
+                    Dumper=dumper,
+                    default_flow_style=False,
+                    default_style=None,
+                    allow_unicode=True)
+
+class TemplateBytecodeCache(jinja2.FileSystemBytecodeCache):
+    """Bytecode cache whose directory is only created when the first compiled template is written to it"""
+    def dump_bytecode(self, bucket):
+        os.makedirs(self.directory, exist_ok=True)
+        super().dump_bytecode(bucket)
+
+def setup_jinja_env(cache_dir=None):
     env = jinja2.Environment(
-        loader=jinja2.FileSystemLoader(str(template_dir)),
+        loader=jinja2.FileSystemLoader(TEMPLATE_DIR),
         trim_blocks=True,
         lstrip_blocks=True,
-        extensions=['jinja2.ext.do']
+        extensions=['jinja2.ext.do'],
+        bytecode_cache=TemplateBytecodeCache(cache_dir) if cache_dir else None
     )
     
-    # Custom YAML dumper class to handle multiline strings
-    class MyDumper(yaml.Dumper):
-        def represent_scalar(self, tag, value, style=None):
-            if isinstance(value, str) and '\n' in value:
-                style = '|'
-            return super().represent_scalar(tag, value, style)
-    
-    # Modified YAML dumper to handle multiline strings
-    def custom_yaml_dump(value):
-        return yaml.dump(value, 
-                        Dumper=MyDumper,
-                        default_flow_style=False,
-                        default_style=None,
-                        allow_unicode=True)
-    
     # Add custom filters
     env.filters['to_yaml'] = custom_yaml_dump
     
     return env
 
+# Process-wide render engine, created on first use; compiled templates are kept in memory
+# and their bytecode is cached on disk so later runs skip compilation as well
+_jinja_env = None
+_jinja_env_lock = threading.Lock()
+
+def get_jinja_env(cache_dir=None):
+    """
+    Return the shared Jinja environment, creating it on first use.
+    Compiled templates are shared by all callers of the process (batch.py, --watch); the bytecode cache follows
+    `cache_dir`, so templates compiled for an environment are cached under its own k8s_dir (None: not on disk).
+    """
+    global _jinja_env
+    with _jinja_env_lock:
+        if _jinja_env is None:
+            _jinja_env = setup_jinja_env(cache_dir)
+        elif (_jinja_env.bytecode_cache.directory if _jinja_env.bytecode_cache else None) != cache_dir:
+            _jinja_env.bytecode_cache = TemplateBytecodeCache(cache_dir) if cache_dir else None
+        return _jinja_env
+
+def warm_up(cache_dir=None):
+    """
+    Parse the presets and compile all templates of this process once, cached on disk under cache_dir if given.
+    Later calls with another cache_dir find both in memory, so without a cache_dir nothing is written to disk.
+    """
+    load_presets(cache_dir)
+    jinja_env = get_jinja_env(os.path.join(cache_dir, 'jinja') if cache_dir else None)
+    for template_name in CONFIG_TEMPLATES.values():
+        jinja_env.get_template(template_name)
+
+def get_template_cache_dir(context):
+    return os.path.join(context['k8s_dir'], '.cache', 'jinja')
+
 def render_template(template_name, context):
     try:
-        env = setup_jinja_env()
+        env = get_jinja_env(get_template_cache_dir(context))
         template = env.get_template(template_name)
         result = template.render(**context)
         return result
@@ -135,46 +358,232 @@ def render_template(template_name, context):
             print(f"[ERROR] Message: {e.message}")
         raise
 
-def expand_os_variables(obj, expand_vars=True):
+def compute_release_fingerprints(context):
     """
-    Recursively expand OS environment variables in objects.
-    Supports ${PWD}, ${HOME}, ${USER}, etc.
+    Fingerprint each release of the helmfile from its name, namespace, chart, version and values.
+    The releases are rendered once without fingerprints to get their final values; returns a dict
+    mapping release name to fingerprint, in helmfile order, which helmfile.yaml.j2 emits as a label.
     """
-    if not expand_vars:
-        return obj
-        
-    if isinstance(obj, dict):
-        return {k: expand_os_variables(v, expand_vars) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [expand_os_variables(item, expand_vars) for item in obj]
-    elif isinstance(obj, str):
-        import os
-        return os.path.expandvars(obj)
-    else:
-        return obj
+    helmfile_content = render_template(CONFIG_TEMPLATES['helmfile.yaml'], {**context, 'release_fingerprints': {}})
+    # The helmfile can be large; use the libyaml parser when PyYAML was built with it
+    helmfile = yaml.load(helmfile_content, Loader=YAML_LOADER) or {}
+    fingerprints = {}
+    for release in helmfile.get('releases', []) or []:
+        identity = {key: release.get(key) for key in ('name', 'namespace', 'chart', 'version', 'values')}
+        fingerprints[release['name']] = hash_content(json.dumps(identity, sort_keys=True, default=str))[:16]
+    return fingerprints
+
+# Context computed for one output right before it is rendered, by output name
+CONFIG_CONTEXT_BUILDERS = {
+    'helmfile.yaml': lambda context: {'release_fingerprints': compute_release_fingerprints(context)},
+}
 
-def expand_k8s_env_variables(obj, k8s_env_vars, expand_vars=True):
+def render_output(output_name, context, stopwatch=None):
+    """Render one configuration file, with its output-specific context; timed when a stopwatch is given"""
+    stopwatch = stopwatch or Stopwatch()
+    with stopwatch.stage(f"render {output_name}"):
+        build_context = CONFIG_CONTEXT_BUILDERS.get(output_name)
+        if build_context:
+            context = {**context, **build_context(context)}
+        return render_template(CONFIG_TEMPLATES[output_name], context)
+
+def render_all(context, output_names=None, stopwatch=None):
     """
-    Recursively expand k8s-env specific variables in values objects.
-    Supports ${LOCAL_DOMAIN}, ${ENV_NAME}, ${REGISTRY_HOST}, etc.
+    Render the configuration templates concurrently with the shared engine.
+    Returns a dict mapping each output path (<k8s_dir>/config/<name>) to its content;
+    `output_names` restricts rendering to a subset of CONFIG_TEMPLATES.
     """
-    if not expand_vars:
-        return obj
-        
-    if isinstance(obj, dict):
-        return {k: expand_k8s_env_variables(v, k8s_env_vars, expand_vars) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [expand_k8s_env_variables(item, k8s_env_vars, expand_vars) for item in obj]
-    elif isinstance(obj, str):
-        result = obj
-        for var_name, var_value in k8s_env_vars.items():
-            result = result.replace(f'${{{var_name}}}', str(var_value))
-        return result
-    else:
-        return obj
+    config_dir = f"{context['k8s_dir']}/config"
+    if output_names is None:
+        output_names = list(CONFIG_TEMPLATES)
+    if not output_names:
+        return {}
+    
+    with ThreadPoolExecutor(max_workers=len(output_names)) as executor:
+        futures = {
+            f"{config_dir}/{name}": executor.submit(render_output, name, context, stopwatch)
+            for name in output_names
+        }
+        return {path: future.result() for path, future in futures.items()}
+
+# Variable references, in the same forms os.path.expandvars understands: $NAME and ${NAME}
+VARIABLE_PATTERN = re.compile(r'\$(\w+|\{[^}]*\})')
 
-def process_system_services(system_services, service_ports, service_values_presets, use_service_presets, k8s_env_vars, expand_vars=True):
-    """Process system services with presets and port/storage management"""
+# Legacy forms of the apps domain, rewritten to ${LOCAL_APPS_DOMAIN} in user service ingress hosts
+LEGACY_APPS_DOMAIN_FORMS = ('${USER_SUBDOMAIN}.${LOCAL_DOMAIN}', '${APPS_SUBDOMAIN}.${LOCAL_DOMAIN}')
+
+def is_ingress_host_path(path):
+    """Whether a values path is ingress.hosts[*].host or ingress.tls[*].hosts[*]"""
+    return (
+        (len(path) == 4 and path[0] == 'ingress' and path[1] == 'hosts' and path[3] == 'host')
+        or (len(path) == 5 and path[0] == 'ingress' and path[1] == 'tls' and path[3] == 'hosts')
+    )
+
+def format_values_path(prefix, path):
+    result = prefix
+    for key in path:
+        result += f"[{key}]" if isinstance(key, int) else f".{key}"
+    return result
+
+class VariableExpander:
+    """
+    Expands OS variables (${PWD}, $HOME, ...) and k8s-env variables (${LOCAL_DOMAIN}, ${ENV_NAME}, ...)
+    in a single walk over a values tree, with one compiled pattern and a per-string memo.
+    OS variables take precedence, as they did when OS variables were expanded in a first pass.
+    References that cannot be resolved are left as-is and collected in `unresolved`.
+    """
+    def __init__(self, k8s_env_vars, expand_vars=True, environ=None):
+        self.expand_vars = expand_vars
+        self.os_vars = dict(os.environ if environ is None else environ)
+        self.k8s_env_vars = {name: str(value) for name, value in k8s_env_vars.items()}
+        self.unresolved = []
+        self._memo = {}
+
+    def _replace(self, match):
+        name = match.group(1)
+        if name.startswith('{'):
+            name = name[1:-1]
+            if name in self.os_vars:
+                return self.os_vars[name]
+            if name in self.k8s_env_vars:
+                return self.k8s_env_vars[name]
+        elif name in self.os_vars:
+            return self.os_vars[name]
+        return match.group(0)
+
+    def expand_string(self, value):
+        """Expand a single string; returns (expanded, unresolved references)"""
+        cached = self._memo.get(value)
+        if cached is None:
+            if '$' not in value:
+                cached = (value, ())
+            else:
+                expanded = VARIABLE_PATTERN.sub(self._replace, value)
+                unresolved = tuple(
+                    match.group(0) for match in VARIABLE_PATTERN.finditer(expanded)
+                    if match.group(1).startswith('{')
+                )
+                cached = (expanded, unresolved)
+            self._memo[value] = cached
+        return cached
+
+    def expand(self, obj, source='values', rewrite_ingress_hosts=False):
+        """Return a copy of obj with all variables expanded; `source` prefixes reported paths"""
+        if not self.expand_vars and not rewrite_ingress_hosts:
+            return obj
+        return self._expand(obj, (), source, rewrite_ingress_hosts)
+
+    def _expand(self, obj, path, source, rewrite_ingress_hosts):
+        if isinstance(obj, dict):
+            return {k: self._expand(v, path + (k,), source, rewrite_ingress_hosts) for k, v in obj.items()}
+        elif isinstance(obj, list):
+            return [self._expand(item, path + (i,), source, rewrite_ingress_hosts) for i, item in enumerate(obj)]
+        elif isinstance(obj, str):
+            if rewrite_ingress_hosts and is_ingress_host_path(path):
+                for legacy_form in LEGACY_APPS_DOMAIN_FORMS:
+                    if legacy_form in obj:
+                        obj = obj.replace(legacy_form, '${LOCAL_APPS_DOMAIN}')
+                        break
+            if not self.expand_vars:
+                return obj
+            expanded, unresolved = self.expand_string(obj)
+            for reference in unresolved:
+                self.unresolved.append({'path': format_values_path(source, path), 'variable': reference})
+            return expanded
+        else:
+            return obj
+
+# Performance profiles from the smallest to the largest; `auto` picks the largest one that fits the host
+PERFORMANCE_PROFILES = ['small', 'medium', 'large']
+
+# Share of the host's memory and CPUs that `auto` lets the profiled services request
+AUTO_PROFILE_HOST_SHARE = 0.5
+
+# Memory reserved for every kind node (kubelet, containerd, system pods) before sizing the services, in MiB
+NODE_OVERHEAD_MIB = {'control-plane': 1024, 'worker': 384}
+
+QUANTITY_SUFFIXES = {'Ki': 1 / 1024, 'Mi': 1, 'Gi': 1024, 'Ti': 1024 ** 2, 'K': 1000 / 1024 ** 2,
+                     'M': 1000 ** 2 / 1024 ** 2, 'G': 1000 ** 3 / 1024 ** 2}
+
+def parse_memory_mib(quantity):
+    """Kubernetes memory quantity (e.g. 512Mi, 2Gi, 1G) in MiB"""
+    quantity = str(quantity)
+    for suffix in sorted(QUANTITY_SUFFIXES, key=len, reverse=True):
+        if quantity.endswith(suffix):
+            return float(quantity[:-len(suffix)]) * QUANTITY_SUFFIXES[suffix]
+    return float(quantity) / 1024 ** 2
+
+def parse_cpu_millicores(quantity):
+    """Kubernetes CPU quantity (e.g. 250m, 1) in millicores"""
+    quantity = str(quantity)
+    return float(quantity[:-1]) if quantity.endswith('m') else float(quantity) * 1000
+
+def get_host_resources():
+    """CPUs and memory (MiB) of the machine running the cluster's containers; None when unknown"""
+    try:
+        memory_mib = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 1024 ** 2
+    except (AttributeError, ValueError, OSError):
+        return None
+    return os.cpu_count() or 1, memory_mib
+
+def select_auto_profile(env, system_services, performance_profiles, host_resources=None):
+    """
+    The largest performance profile whose requests for the enabled services fit into a share of the host,
+    after reserving memory for every kind node; more workers leave less memory for the services.
+    """
+    host_resources = host_resources or get_host_resources()
+    if host_resources is None:
+        return PERFORMANCE_PROFILES[0]
+    cpus, memory_mib = host_resources
+    nodes = env.get('nodes', {})
+    reserved_mib = nodes.get('servers', 1) * NODE_OVERHEAD_MIB['control-plane'] + \
+        nodes.get('workers', 0) * NODE_OVERHEAD_MIB['worker']
+    available_mib = memory_mib * AUTO_PROFILE_HOST_SHARE - reserved_mib
+    available_millicores = cpus * 1000 * AUTO_PROFILE_HOST_SHARE
+    enabled = [service['name'] for service in system_services if service.get('enabled', False)]
+
+    for name in reversed(PERFORMANCE_PROFILES):
+        requests = [
+            performance_profiles.get(name, {})[service].get('resources', {}).get('requests', {})
+            for service in enabled if service in performance_profiles.get(name, {})
+        ]
+        memory = sum(parse_memory_mib(request.get('memory', 0)) for request in requests)
+        cpu = sum(parse_cpu_millicores(request.get('cpu', 0)) for request in requests)
+        if memory <= available_mib and cpu <= available_millicores:
+            return name
+    return PERFORMANCE_PROFILES[0]
+
+# Node path of kind's local-path provisioner; bind-mounted from <k8s_dir>/storage/<node> (the `host` tier)
+LOCAL_PATH_STORAGE_PATH = '/var/local-path-provisioner'
+
+# Storage tiers of PVCs: storage class and node path of the local-path provisioner for each non-host tier.
+# kind nodes keep /tmp on tmpfs and /var on a runtime volume, so neither goes through a host bind mount
+STORAGE_TIERS = {
+    'host': None,
+    'tmpfs': {'storage_class': 'local-path-tmpfs', 'path': '/tmp/local-path-provisioner'},
+    'node-local': {'storage_class': 'local-path-node-local', 'path': '/var/local-path-node-local'},
+}
+
+def get_storage_tier(storage, owner):
+    """The STORAGE_TIERS entry for a `storage` config block (None for the host tier)"""
+    tier = (storage or {}).get('tier', 'host')
+    if tier not in STORAGE_TIERS:
+        raise ValueError(f"Unknown storage.tier '{tier}' for {owner}; expected one of: {', '.join(STORAGE_TIERS)}")
+    return STORAGE_TIERS[tier]
+
+def process_system_services(system_services, service_ports, service_values_presets, use_service_presets, k8s_env_vars, expand_vars=True, credentials=None, rotate_credentials=None, expander=None, performance_profiles=None, performance_profile=None):
+    """
+    Process system services with presets and port/storage management.
+    Credentials are taken from (and added to) the `credentials` store; services listed in
+    `rotate_credentials` get new ones (an empty list rotates all of them).
+    The values of `performance_profile` (or a service's own performance-profile) are merged into the presets.
+    """
+    if performance_profiles is None:
+        performance_profiles = {}
+    if credentials is None:
+        credentials = {}
+    if expander is None:
+        expander = VariableExpander(k8s_env_vars, expand_vars)
     processed_services = []
     
     for service in system_services:
@@ -217,10 +626,29 @@ def process_system_services(system_services, service_ports, service_values_prese
                     }
                 deep_merge_dicts(storage_config, base_values)
             
+            # Place the PVC on the service's storage tier
+            storage_tier = get_storage_tier(service.get('storage'), f"service '{service_name}'")
+            if storage_tier and 'storage' in service_values_presets[service_name]:
+                deep_merge_dicts({'storage': {'className': storage_tier['storage_class']}}, base_values)
+            
+            # Apply the performance profile: resources and engine settings
+            profile = service.get('performance-profile', performance_profile)
+            if profile:
+                if profile not in performance_profiles:
+                    raise ValueError(f"Unknown performance profile '{profile}' for service '{service_name}'; "
+                                     f"expected one of: {', '.join(PERFORMANCE_PROFILES + ['auto'])}")
+                profile_values = performance_profiles[profile].get(service_name)
+                if profile_values:
+                    deep_merge_dicts(pickle.loads(pickle.dumps(profile_values)), base_values)
+            
             # Generate and apply authentication configuration automatically
             chart_name = service.get('config', {}).get('chart', '')
             if chart_name:
-                auth_config = generate_chart_auth_config(service_name, chart_name)
+                rotate = rotate_credentials is not None and (not rotate_credentials or service_name in rotate_credentials)
+                service_credentials, generated = resolve_service_credentials(credentials, service_name, chart_name, rotate)
+                if generated:
+                    print(f"🔐 {'Rotated' if rotate else 'Generated'} credentials for {service_name}")
+                auth_config = generate_chart_auth_config(service_name, chart_name, service_credentials)
                 if auth_config:
                     # Deep merge auth config into base_values
                     for key, value in auth_config.items():
@@ -230,14 +658,12 @@ def process_system_services(system_services, service_ports, service_values_prese
                             base_values[key].extend(value)
                         else:
                             base_values[key] = value
-                    print(f"🔐 Generated authentication configuration for {service_name}")
         
         # Merge custom values from config if they exist
         custom_values = service.get('config', {}).get('values', {})
         if custom_values:
-            # First expand OS variables, then k8s-env variables
-            expanded_custom_values = expand_os_variables(custom_values, expand_vars)
-            expanded_custom_values = expand_k8s_env_variables(expanded_custom_values, k8s_env_vars, expand_vars)
+            # Expand OS and k8s-env variables in a single pass
+            expanded_custom_values = expander.expand(custom_values, f"services.system.{service_name}.config.values")
             service['custom_values'] = expanded_custom_values
             base_values.update(expanded_custom_values)
         
@@ -254,9 +680,11 @@ def process_system_services(system_services, service_ports, service_values_prese
     
     return processed_services
 
-def process_user_services(user_services, k8s_env_vars, expand_vars=True):
+def process_user_services(user_services, k8s_env_vars, expand_vars=True, expander=None):
     """Process user services without presets - users provide complete configuration"""
     processed_services = []
+    if expander is None:
+        expander = VariableExpander(k8s_env_vars, expand_vars)
     
     for service in user_services:
         if not service.get('enabled', False):
@@ -276,41 +704,9 @@ def process_user_services(user_services, k8s_env_vars, expand_vars=True):
         # For user services, use values from config with variable expansion
         base_values = config.get('values', {})
         
-        # Replace instances of ${APPS_SUBDOMAIN}.${LOCAL_DOMAIN} with ${LOCAL_APPS_DOMAIN}
-        # This simplifies configuration and makes it more intuitive
-        if 'ingress' in base_values and isinstance(base_values['ingress'], dict):
-            ingress_config = base_values['ingress']
-            
-            # Process hosts if they exist
-            if 'hosts' in ingress_config and isinstance(ingress_config['hosts'], list):
-                for i, host_entry in enumerate(ingress_config['hosts']):
-                    if isinstance(host_entry, dict) and 'host' in host_entry:
-                        host = host_entry['host']
-                        # Handle both old and new variable names for backward compatibility
-                        if '${USER_SUBDOMAIN}.${LOCAL_DOMAIN}' in host:
-                            # Replace with the new variable
-                            host_entry['host'] = host.replace('${USER_SUBDOMAIN}.${LOCAL_DOMAIN}', '${LOCAL_APPS_DOMAIN}')
-                        elif '${APPS_SUBDOMAIN}.${LOCAL_DOMAIN}' in host:
-                            # Replace with the new variable
-                            host_entry['host'] = host.replace('${APPS_SUBDOMAIN}.${LOCAL_DOMAIN}', '${LOCAL_APPS_DOMAIN}')
-            
-            # Process TLS hosts if they exist
-            if 'tls' in ingress_config and isinstance(ingress_config['tls'], list):
-                for tls_entry in ingress_config['tls']:
-                    if isinstance(tls_entry, dict) and 'hosts' in tls_entry and isinstance(tls_entry['hosts'], list):
-                        for i, host in enumerate(tls_entry['hosts']):
-                            if isinstance(host, str):
-                                # Handle both old and new variable names for backward compatibility
-                                if '${USER_SUBDOMAIN}.${LOCAL_DOMAIN}' in host:
-                                    # Replace with the new variable
-                                    tls_entry['hosts'][i] = host.replace('${USER_SUBDOMAIN}.${LOCAL_DOMAIN}', '${LOCAL_APPS_DOMAIN}')
-                                elif '${APPS_SUBDOMAIN}.${LOCAL_DOMAIN}' in host:
-                                    # Replace with the new variable
-                                    tls_entry['hosts'][i] = host.replace('${APPS_SUBDOMAIN}.${LOCAL_DOMAIN}', '${LOCAL_APPS_DOMAIN}')
-        
-        # First expand OS variables, then k8s-env variables
-        expanded_values = expand_os_variables(base_values, expand_vars)
-        expanded_values = expand_k8s_env_variables(expanded_values, k8s_env_vars, expand_vars)
+        # Expand OS and k8s-env variables in a single pass; instances of ${APPS_SUBDOMAIN}.${LOCAL_DOMAIN}
+        # in ingress hosts are replaced with ${LOCAL_APPS_DOMAIN} to keep configuration intuitive
+        expanded_values = expander.expand(base_values, f"services.user.{service_name}.config.values", rewrite_ingress_hosts=True)
         service['base_values'] = expanded_values
         service['namespace'] = service_namespace
         service['service_type'] = 'user'
@@ -357,9 +753,317 @@ def resolve_repo_references(services, helm_repositories):
                 raise ValueError(f"Repository reference '{ref_name}' not found in helm-repositories for service '{service.get('name', 'unknown')}'")
 
 
-def prepare_context(config):
+def values_use_ingress(values):
+    """Whether helm values configure an ingress (any enabled `ingress` block, at any depth)"""
+    if isinstance(values, dict):
+        for key, value in values.items():
+            if key == 'ingress' and isinstance(value, dict) and value.get('enabled', True) is not False:
+                return True
+            if values_use_ingress(value):
+                return True
+    elif isinstance(values, list):
+        return any(values_use_ingress(item) for item in values)
+    return False
+
+def values_reference(values, text):
+    """Whether any string in helm values contains `text`"""
+    if isinstance(values, dict):
+        return any(values_reference(value, text) for value in values.values())
+    elif isinstance(values, list):
+        return any(values_reference(item, text) for item in values)
+    return isinstance(values, str) and text in values
+
+def build_release_plan(services, registry_host, deploy_metrics_server, release_timeouts):
+    """
+    Build the helm release dependency graph and group releases into tiers that can be deployed in parallel.
+    Services only need traefik when their values configure an ingress and the registry when they pull from it;
+    extra dependencies come from the optional per-service `needs` list (release names or namespace/name).
+    Timeouts come from `config.timeout`, else release_timeouts by release name, chart name, then default.
+    Returns (plan, tiers): plan maps release name to {namespace, needs, tier, timeout}, tiers lists release names.
+    """
+    default_timeout = release_timeouts.get('default', 600)
+    
+    def timeout_for(name, chart_name, override=None):
+        if override:
+            return int(override)
+        return int(release_timeouts.get(name, release_timeouts.get(get_chart_basename(chart_name), default_timeout)))
+    
+    releases = {
+        'traefik': {'namespace': 'traefik', 'needs': [], 'timeout': timeout_for('traefik', 'traefik/traefik')},
+    }
+    if deploy_metrics_server:
+        releases['metrics-server'] = {
+            'namespace': 'kube-system', 'needs': [], 'timeout': timeout_for('metrics-server', 'metrics-server/metrics-server')
+        }
+    releases['registry'] = {
+        'namespace': 'registry', 'needs': ['traefik'], 'timeout': timeout_for('registry', 'bjw-s-labs/app-template')
+    }
+    
+    explicit_needs = {}
+    for service in services:
+        service_name = service['name']
+        if service_name in releases:
+            raise ValueError(f"Service '{service_name}' conflicts with another release of the same name")
+        values = service.get('base_values', {})
+        needs = []
+        if values_use_ingress(values):
+            needs.append('traefik')
+        if values_reference(values, registry_host):
+            needs.append('registry')
+        config = service.get('config', {})
+        releases[service_name] = {
+            'namespace': service.get('namespace', service_name),
+            'needs': needs,
+            'timeout': timeout_for(service_name, config.get('chart', ''), config.get('timeout')),
+        }
+        explicit_needs[service_name] = service.get('needs', []) or []
+    
+    # Resolve explicit needs, given as release names or namespace/name
+    by_qualified_name = {f"{release['namespace']}/{name}": name for name, release in releases.items()}
+    for service_name, needs in explicit_needs.items():
+        for need in needs:
+            name = by_qualified_name.get(need, need if need in releases else None)
+            if name is None:
+                raise ValueError(f"Service '{service_name}' needs unknown release '{need}'")
+            if name not in releases[service_name]['needs']:
+                releases[service_name]['needs'].append(name)
+    
+    # Assign tiers (longest dependency chain), detecting cycles on the way
+    tiers_by_name = {}
+    def assign_tier(name, chain):
+        if name in tiers_by_name:
+            return tiers_by_name[name]
+        if name in chain:
+            cycle = chain[chain.index(name):] + [name]
+            raise ValueError(f"Release dependency cycle: {' -> '.join(cycle)}")
+        needs = releases[name]['needs']
+        tier = max((assign_tier(need, chain + [name]) + 1 for need in needs), default=0)
+        tiers_by_name[name] = tier
+        return tier
+    
+    for name in releases:
+        assign_tier(name, [])
+    
+    tiers = [[] for _ in range(max(tiers_by_name.values()) + 1)]
+    plan = {}
+    for name, release in releases.items():
+        tiers[tiers_by_name[name]].append(name)
+        plan[name] = {
+            'namespace': release['namespace'],
+            'needs': [f"{releases[need]['namespace']}/{need}" for need in release['needs']],
+            'tier': tiers_by_name[name],
+            'timeout': release['timeout'],
+        }
+    
+    return plan, tiers
+
+def get_internal_component(env, key):
+    for comp in env.get('internal-components', []):
+        if key in comp:
+            return comp[key]
+    return None
+
+def get_base_dir(env):
+    """Return the base directory, with OS variables expanded if enabled"""
+    base_dir = env['base-dir']
+    if env.get('expand-env-vars', True):
+        base_dir = os.path.expandvars(base_dir)
+    return base_dir
+
+# Upstream registries mirrored by default when image-cache is enabled
+DEFAULT_MIRRORED_REGISTRIES = ['docker.io', 'ghcr.io', 'registry.k8s.io', 'quay.io']
+
+# Registries whose API endpoint differs from their name
+REGISTRY_REMOTE_URLS = {
+    'docker.io': 'https://registry-1.docker.io',
+}
+
+def get_image_mirrors(env):
+    """
+    Pull-through registry mirrors run next to the dnsmasq container when image-cache is enabled.
+    One mirror per upstream registry, published on consecutive host ports starting at image-cache.port;
+    the cached layers live under <base-dir>/.cache/image-mirrors so they survive environment re-creation.
+    """
+    image_cache = env.get('image-cache', {}) or {}
+    if not image_cache.get('enabled', False):
+        return []
+    
+    base_dir = get_base_dir(env)
+    first_port = int(image_cache.get('port', 5100))
+    mirrors = []
+    for i, registry in enumerate(image_cache.get('registries', DEFAULT_MIRRORED_REGISTRIES)):
+        port = first_port + i
+        mirrors.append({
+            'registry': registry,
+            'remote_url': REGISTRY_REMOTE_URLS.get(registry, f"https://{registry}"),
+            'container': f"{env['name']}-mirror-{registry.replace('.', '-')}",
+            'port': port,
+            'endpoint': f"http://{env['local-ip']}:{port}",
+            'storage': os.path.join(base_dir, '.cache', 'image-mirrors', registry),
+        })
+    return mirrors
+
+INGRESS_MODES = ['single', 'scale-out']
+INGRESS_WORKLOADS = ['DaemonSet', 'Deployment']
+INGRESS_NODE_ROLES = ['control-plane', 'worker', 'all']
+
+def get_ingress_config(env, services):
+    """
+    Which nodes run Traefik and publish the ingress and service ports to the host.
+    `single` (the default) is one Traefik pod on the first control-plane node. `scale-out` runs Traefik on
+    every selected node, each publishing the ports on its own host IP (ingress.host-ips, across which the
+    DNS records are spread) or, without host IPs, on its ports shifted by port-offset per node.
+    """
+    ingress = env.get('ingress', {}) or {}
+    mode = ingress.get('mode', 'single')
+    if mode not in INGRESS_MODES:
+        raise ValueError(f"Unknown ingress.mode '{mode}'; expected one of: {', '.join(INGRESS_MODES)}")
+    if mode == 'single':
+        return {'mode': mode, 'nodes': {'control-plane-0': {'listen_address': None, 'port_offset': 0}},
+                'addresses': [env['local-ip']]}
+    
+    workload = ingress.get('workload', 'DaemonSet')
+    if workload not in INGRESS_WORKLOADS:
+        raise ValueError(f"Unknown ingress.workload '{workload}'; expected one of: {', '.join(INGRESS_WORKLOADS)}")
+    roles = ingress.get('nodes', 'all')
+    if roles not in INGRESS_NODE_ROLES:
+        raise ValueError(f"Unknown ingress.nodes '{roles}'; expected one of: {', '.join(INGRESS_NODE_ROLES)}")
+    names = []
+    if roles in ('control-plane', 'all'):
+        names += [f"control-plane-{i}" for i in range(env['nodes']['servers'])]
+    if roles in ('worker', 'all'):
+        names += [f"worker-{i}" for i in range(env['nodes'].get('workers', 0))]
+    if not names:
+        raise ValueError(f"ingress.nodes '{roles}' selects no nodes")
+    
+    host_ips = ingress.get('host-ips', []) or []
+    if host_ips and len(host_ips) < len(names):
+        raise ValueError(f"ingress.host-ips lists {len(host_ips)} addresses for {len(names)} ingress nodes")
+    port_offset = int(ingress.get('port-offset', 1000))
+    nodes = {
+        name: {'listen_address': host_ips[k] if host_ips else None, 'port_offset': 0 if host_ips else k * port_offset}
+        for k, name in enumerate(names)
+    }
+    
+    # Every node publishes the same ports; they must not collide on the host
+    ports = list(env['local-lb-ports']) + [
+        port for service in services if service.get('enabled', False) for port in service.get('ports', []) or []
+    ]
+    published = {}
+    for name, node in nodes.items():
+        for port in ports:
+            key = (node['listen_address'], port + node['port_offset'])
+            if key in published:
+                raise ValueError(f"Host port {key[1]} of ingress node {name} collides with {published[key]}; "
+                                 f"change ingress.port-offset or set ingress.host-ips")
+            published[key] = f"{port} of {name}"
+    
+    replicas = int(ingress.get('replicas', 0)) or len(names)
+    return {
+        'mode': mode,
+        'workload': workload,
+        'replicas': min(replicas, len(names)),
+        'nodes': nodes,
+        # Only nodes on their own host IP can share DNS names; with port offsets the records stay on local-ip
+        'addresses': list(dict.fromkeys(host_ips[:len(names)])) if host_ips else [env['local-ip']],
+    }
+
+# Host address of port mappings without a listen address
+ANY_ADDRESS = '0.0.0.0'
+
+def get_published_ports(context):
+    """
+    Host ports the environment publishes, as dicts with address, port and what: the API server,
+    the ingress and service ports of every ingress node (see cluster.yaml.j2) and the image cache mirrors
+    """
+    published = [{'address': '127.0.0.1', 'port': int(context['api_port']), 'what': 'Kubernetes API'}]
+    service_ports = [int(port) for service in context['services'] if service.get('enabled')
+                     for port in service.get('ports', [])]
+    for node, ingress_node in context['ingress']['nodes'].items():
+        for port in [int(port) for port in context['ingress_ports']] + service_ports:
+            published.append({'address': ingress_node['listen_address'] or ANY_ADDRESS,
+                              'port': port + ingress_node['port_offset'], 'what': f"port {port} of {node}"})
+    for mirror in context['image_mirrors']:
+        published.append({'address': ANY_ADDRESS, 'port': mirror['port'], 'what': f"{mirror['registry']} mirror"})
+    return published
+
+# provider.profile values; `default` keeps kind's stock kubeadm and kubelet settings
+PROVIDER_PROFILES = ['default', 'fast']
+
+def get_kubeadm_tuning(env):
+    """
+    Cluster-wide kubeadm arguments for provider.profile and provider.disabled-controllers, or None for
+    stock settings. The fast profile also turns on the kubelet tuning of cluster.yaml.
+    """
+    provider = env['provider']
+    profile = provider.get('profile', 'default')
+    if profile not in PROVIDER_PROFILES:
+        raise ValueError(f"Unknown provider.profile '{profile}'; expected one of: {', '.join(PROVIDER_PROFILES)}")
+    disabled_controllers = provider.get('disabled-controllers', []) or []
+    if profile == 'default' and not disabled_controllers:
+        return None
+    
+    tuning = {'controller_manager': {}, 'scheduler': {}, 'etcd': {}, 'kubelet': profile == 'fast'}
+    if profile == 'fast':
+        # Notice node readiness changes sooner, in step with the kubelet's shorter lease
+        tuning['controller_manager'].update({'node-monitor-period': '2s', 'node-monitor-grace-period': '20s'})
+        # Disposable clusters: etcd does not fsync, and a single control plane needs no leader election
+        tuning['etcd']['unsafe-no-fsync'] = 'true'
+        if env['nodes'].get('servers', 1) == 1:
+            tuning['controller_manager']['leader-elect'] = 'false'
+            tuning['scheduler']['leader-elect'] = 'false'
+    if disabled_controllers:
+        tuning['controller_manager']['controllers'] = ','.join(['*'] + [f"-{name}" for name in disabled_controllers])
+    return tuning
+
+def get_storage_tiers(registry, system_services):
+    """
+    The non-host storage tiers in use, and the local-path provisioner config.json that maps each tier's
+    storage class to its node path (the host tier stays the default for everything else).
+    """
+    tiers = [get_storage_tier(registry.get('storage'), 'the registry')] + [
+        get_storage_tier(service.get('storage'), f"service '{service['name']}'") for service in system_services
+    ]
+    used = {tier['storage_class']: tier for tier in tiers if tier}
+    if not used:
+        return None
+
+    def node_path_map(path):
+        return [{'node': 'DEFAULT_PATH_FOR_NON_LISTED_NODES', 'paths': [path]}]
+
+    local_path_config = {
+        'nodePathMap': node_path_map(LOCAL_PATH_STORAGE_PATH),
+        'storageClassConfigs': {name: {'nodePathMap': node_path_map(tier['path'])} for name, tier in used.items()},
+    }
+    return {'tiers': list(used.values()), 'local_path_config': json.dumps(local_path_config, indent=2)}
+
+def get_k8s_dir(env):
+    """Return the environment directory (<base-dir>/<name>)"""
+    return f"{get_base_dir(env)}/{env['name']}"
+
+def build_k8s_env_vars(env):
+    """Build the k8s-env variables available for expansion in helm values"""
+    use_apps_subdomain = env.get('use-apps-subdomain', True)
+    apps_subdomain = env.get('apps-subdomain', 'apps')
+    
+    # Create LOCAL_APPS_DOMAIN based on use_apps_subdomain setting
+    local_apps_domain = f"{apps_subdomain}.{env['local-domain']}" if use_apps_subdomain else env['local-domain']
+    
+    return {
+        'ENV_NAME': env['name'],
+        'LOCAL_DOMAIN': env['local-domain'],
+        'LOCAL_IP': env['local-ip'],
+        'REGISTRY_NAME': env['registry']['name'],
+        'REGISTRY_HOST': f"{env['registry']['name']}.{env['local-domain']}",
+        'APPS_SUBDOMAIN': apps_subdomain,
+        'USE_APPS_SUBDOMAIN': str(use_apps_subdomain).lower(),
+        'LOCAL_APPS_DOMAIN': local_apps_domain,
+    }
+
+def prepare_context(config, rotate_credentials=None, credentials=None):
     # Load service ports and presets from file
-    service_ports, service_values_presets = load_presets()
+    service_ports, service_values_presets, release_timeouts, performance_profiles = load_presets(
+        os.path.join(get_k8s_dir(config['environment']), '.cache'))
     
     # Get services configuration
     services_config = config['environment'].get('services', {})
@@ -384,24 +1088,33 @@ def prepare_context(config):
     apps_subdomain = env.get('apps-subdomain', 'apps')
     
     # Build k8s-env variables dictionary (most commonly used in helm values)
-    # Create LOCAL_APPS_DOMAIN based on use_apps_subdomain setting
-    local_apps_domain = f"{apps_subdomain}.{env['local-domain']}" if use_apps_subdomain else env['local-domain']
+    k8s_env_vars = build_k8s_env_vars(env)
     
-    k8s_env_vars = {
-        'ENV_NAME': env['name'],
-        'LOCAL_DOMAIN': env['local-domain'],
-        'LOCAL_IP': env['local-ip'],
-        'REGISTRY_NAME': env['registry']['name'],
-        'REGISTRY_HOST': f"{env['registry']['name']}.{env['local-domain']}",
-        'APPS_SUBDOMAIN': apps_subdomain,
-        'USE_APPS_SUBDOMAIN': str(use_apps_subdomain).lower(),
-        'LOCAL_APPS_DOMAIN': local_apps_domain,
-    }
+    # Reuse previously generated service credentials so re-generation does not change helm values;
+    # a given store (e.g. from a snapshot) is used instead of the one in k8s_dir
+    k8s_dir = get_k8s_dir(env)
+    if credentials is None:
+        credentials = load_credential_store(k8s_dir)
+    
+    # One expansion engine for all services so repeated strings are expanded once
+    expander = VariableExpander(k8s_env_vars, expand_vars)
+    
+    # `auto` resolves to one of the sized profiles for the whole environment
+    performance_profile = env.get('performance-profile')
+    if use_service_presets and (performance_profile == 'auto' or any(
+            service.get('performance-profile') == 'auto' for service in system_services if service.get('enabled', False))):
+        auto_profile = select_auto_profile(env, system_services, performance_profiles)
+        performance_profiles['auto'] = performance_profiles.get(auto_profile, {})
+        print(f"⚙️  Performance profile auto: {auto_profile}")
     
     processed_system_services = process_system_services(
-        system_services, service_ports, service_values_presets, use_service_presets, k8s_env_vars, expand_vars
+        system_services, service_ports, service_values_presets, use_service_presets, k8s_env_vars, expand_vars,
+        credentials, rotate_credentials, expander, performance_profiles, performance_profile
     )
-    processed_user_services = process_user_services(user_services, k8s_env_vars, expand_vars)
+    processed_user_services = process_user_services(user_services, k8s_env_vars, expand_vars, expander)
+    
+    for unresolved in expander.unresolved:
+        print(f"⚠️  Unresolved variable {unresolved['variable']} at {unresolved['path']}")
     
     # Combine all enabled services
     all_services = processed_system_services + processed_user_services
@@ -409,24 +1122,19 @@ def prepare_context(config):
     # Collect helm repositories
     helm_repositories = collect_helm_repositories(config, all_services)
     
-    def get_internal_component(env, key):
-        for comp in env.get('internal-components', []):
-            if key in comp:
-                return comp[key]
-        return None
-
+    # Build the release dependency graph so helmfile can deploy independent releases in parallel
+    deploy_metrics_server = env.get('enable-metrics-server', True)
+    release_plan, release_tiers = build_release_plan(
+        all_services, k8s_env_vars['REGISTRY_HOST'], deploy_metrics_server, release_timeouts
+    )
+    
     provider_name = env['provider']['name']
     
     # Set provider-specific paths and settings
-    storage_path = '/var/local-path-provisioner'
+    storage_path = LOCAL_PATH_STORAGE_PATH
     log_path = '/var/log'
     internal_domain = 'kind.internal'
     internal_host = 'localhost.kind.internal'
-    # Expand base directory variables for KinD  
-    base_dir = env['base-dir']
-    if env.get('expand-env-vars', True):
-        import os
-        base_dir = os.path.expandvars(base_dir)
     
     context = {
         'env_name': env['name'],
@@ -456,9 +1164,14 @@ def prepare_context(config):
         'service_values_presets': service_values_presets,
         'use_service_presets': use_service_presets,
         'run_services_on_workers_only': env.get('run-services-on-workers-only', False),
-        'deploy_metrics_server': env.get('enable-metrics-server', True),
+        'deploy_metrics_server': deploy_metrics_server,
+        'release_plan': release_plan,
+        'release_tiers': release_tiers,
+        'deploy_concurrency': env.get('deploy-concurrency', 0),
         'cacert_file': CACERT_FILE,
-        'k8s_dir': f"{base_dir}/{env['name']}",
+        'k8s_dir': k8s_dir,
+        'credentials': credentials,
+        'unresolved_variables': expander.unresolved,
         'mounts': [
             {'local_path': 'logs', 'node_path': log_path},
             {'local_path': 'storage', 'node_path': storage_path}
@@ -468,6 +1181,12 @@ def prepare_context(config):
         'provider': env['provider'],
         'allow_control_plane_scheduling': env['nodes'].get('allow-scheduling-on-control-plane', False),
         'internal_components_on_control_plane': env['nodes'].get('internal-components-on-control-plane', False),
+        'image_mirrors': get_image_mirrors(env),
+        'ingress': get_ingress_config(env, all_services),
+        'registry_storage_tier': get_storage_tier(env['registry'].get('storage'), 'the registry'),
+        'storage_tiers': get_storage_tiers(env['registry'], processed_system_services),
+        'provider_profile': env['provider'].get('profile', 'default'),
+        'kubeadm_tuning': get_kubeadm_tuning(env),
     }
     
     # Ensure all paths in mounts are absolute for KinD
@@ -480,6 +1199,9 @@ def prepare_context(config):
     
     # Add DNS-specific context with default value if not present
     context['dns_port'] = env.get('dns', {}).get('port', 53)
+    context['dns_cache'] = {
+        key.replace('-', '_'): env.get('dns', {}).get(key, default) for key, default in DEFAULT_DNS_CACHE.items()
+    }
     
     # Combine Kubernetes image and tag into a full image reference
     kubernetes_image = env.get('kubernetes', {}).get('image', '')
@@ -489,10 +1211,95 @@ def prepare_context(config):
     else:
         full_image = kubernetes_image
     context['kubernetes_full_image'] = full_image
-    
-    
+
+
     return context
 
+def get_resolved_vars_paths(config_file):
+    """Return the (dotenv, json) paths of the resolved variables file for a config file"""
+    config_path = os.path.abspath(config_file)
+    config_dir = os.path.dirname(config_path)
+    config_stem = os.path.splitext(os.path.basename(config_path))[0]
+    return (
+        os.path.join(config_dir, f".{config_stem}.vars.env"),
+        os.path.join(config_dir, f".{config_stem}.vars.json")
+    )
+
+def build_task_vars(config):
+    """
+    Resolve the variables used by the Taskfiles from the config in a single pass.
+    Mirrors what .taskfiles/vars used to compute with one yq call per variable.
+    """
+    env = config['environment']
+    nodes = env.get('nodes', {})
+    services_config = env.get('services', {})
+
+    base_dir = get_base_dir(env)
+    k8s_dir = get_k8s_dir(env)
+
+    runtime = env['provider']['runtime']
+
+    # Enabled system services are listed once per exposed port, user services are tagged as such
+    enabled_services = []
+    for service in services_config.get('system', []) or []:
+        if service.get('enabled', False):
+            for port in service.get('ports', []) or []:
+                enabled_services.append(f"{service['name']}:{port}")
+    for service in services_config.get('user', []) or []:
+        if service.get('enabled', False):
+            enabled_services.append(f"{service['name']}:user")
+
+    def as_bool(value):
+        return str(bool(value)).lower()
+
+    return {
+        'BASE_DIR': base_dir,
+        'ENV_NAME': env['name'],
+        'CLUSTER_NAME': env['name'],
+        'K8S_DIR': k8s_dir,
+        'USE_SERVICE_PRESETS': as_bool(env.get('use-service-presets', True)),
+        'LOCAL_DOMAIN': env['local-domain'],
+        'APPS_SUBDOMAIN': env.get('apps-subdomain', 'apps'),
+        'USE_APPS_SUBDOMAIN': as_bool(env.get('use-apps-subdomain', True)),
+        'LOCAL_IP': env['local-ip'],
+        'REGISTRY_NAME': env['registry']['name'],
+        'REGISTRY_HOST': f"{env['registry']['name']}.{env['local-domain']}",
+        'SERVERS': str(nodes.get('servers', 1)),
+        'WORKERS': str(nodes.get('workers', 0)),
+        'ALLOW_CONTROL_PLANE_SCHEDULING': as_bool(nodes.get('allow-scheduling-on-control-plane', False)),
+        'INTERNAL_COMPONENTS_ON_CONTROL_PLANE': as_bool(nodes.get('internal-components-on-control-plane', False)),
+        'RUN_SERVICES_ON_WORKERS_ONLY': as_bool(env.get('run-services-on-workers-only', False)),
+        'PROVIDER': env['provider']['name'],
+        'PROVIDER_BINARY': env['provider']['name'],
+        'RUNTIME': runtime,
+        'RUNTIME_BINARY': 'podman' if runtime == 'podman' else 'docker',
+        'APP_TEMPLATE_VERSION': str(get_internal_component(env, 'app-template') or ''),
+        'DNSMASQ_VERSION': str(get_internal_component(env, 'dnsmasq') or ''),
+        'TRAEFIK_VERSION': str(get_internal_component(env, 'traefik') or ''),
+        'DNS_PORT': str(env.get('dns', {}).get('port', 53)),
+        'ENABLED_SERVICES': ' '.join(enabled_services),
+        'DEPLOY_CONCURRENCY': str(env.get('deploy-concurrency', 0)),
+    }
+
+def write_resolved_vars(config, config_file):
+    """Write the resolved Taskfile variables as both a dotenv and a JSON file"""
+    task_vars = build_task_vars(config)
+    dotenv_path, json_path = get_resolved_vars_paths(config_file)
+
+    def quote(value):
+        return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+    with open(dotenv_path, 'w') as f:
+        f.write("# Generated by generate_configs.py - do not edit\n")
+        for key, value in task_vars.items():
+            f.write(f"{key}={quote(value)}\n")
+
+    with open(json_path, 'w') as f:
+        json.dump(task_vars, f, indent=2)
+        f.write("\n")
+
+    return dotenv_path, json_path
+
 def generate_resolver_file_mac(config, local_domain, local_ip):
     resolver_dir = "/etc/resolver"
     resolver_file = f"{resolver_dir}/{local_domain}"
@@ -573,6 +1380,7 @@ def create_output_directories(context):
     
     # Create main directories
     os.makedirs(f"{k8s_dir}/config", exist_ok=True)
+    os.makedirs(f"{k8s_dir}/config/{DNSMASQ_HOSTS_DIR}", exist_ok=True)
     os.makedirs(f"{k8s_dir}/certs", exist_ok=True)
     os.makedirs(f"{k8s_dir}/logs", exist_ok=True)
     os.makedirs(f"{k8s_dir}/storage", exist_ok=True)
@@ -582,66 +1390,384 @@ def create_output_directories(context):
     if containerd_cert_dir:
         os.makedirs(containerd_cert_dir, exist_ok=True)
 
-def generate_config_files(context):
-    """Generate all configuration files"""
+def hash_content(content):
+    """Return the sha256 hex digest of a str or bytes value"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+def hash_render_inputs(template_name, context):
+    """
+    Hash everything a rendered file depends on: the template source and the context.
+    The context is derived from k8s-env.yaml and service_presets.yaml after variable
+    expansion, so it also captures OS variables referenced in the config.
+    """
+    with open(os.path.join(TEMPLATE_DIR, template_name), 'rb') as f:
+        template_source = f.read()
+    context_dump = json.dumps(context, default=str)
+    return hash_content(template_source + b'\0' + context_dump.encode('utf-8'))
+
+def hash_file(path):
+    """Return the sha256 hex digest of a file, or None if it does not exist"""
+    try:
+        with open(path, 'rb') as f:
+            return hash_content(f.read())
+    except FileNotFoundError:
+        return None
+
+def write_file_atomic(path, content, mode=0o644):
+    """Write a str or bytes file via a temporary file in the same directory and an atomic rename"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, 'wb' if isinstance(content, bytes) else 'w') as f:
+            f.write(content)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def load_render_manifest(config_dir):
+    """Load the render manifest from a previous run, if any"""
+    try:
+        with open(os.path.join(config_dir, RENDER_MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def generate_config_files(context, stopwatch=None):
+    """
+    Generate all configuration files.
+    Files whose inputs and outputs are unchanged since the last run are left untouched,
+    changed files are written atomically. Returns the list of changed file names.
+    """
     k8s_dir = context['k8s_dir']
     config_dir = f"{k8s_dir}/config"
     
-    # Generate cluster config
-    cluster_config = render_template('kind/cluster.yaml.j2', context)
-    with open(f"{config_dir}/cluster.yaml", 'w') as f:
-        f.write(cluster_config)
+    previous_files = load_render_manifest(config_dir).get('files', {})
+    manifest_files = {}
+    changed = []
+    
+    # Skip rendering when the inputs match and the file on disk is the one we wrote
+    input_hashes = {}
+    current_hashes = {}
+    to_render = []
+    for output_name, template_name in CONFIG_TEMPLATES.items():
+        input_hashes[output_name] = hash_render_inputs(template_name, context)
+        current_hashes[output_name] = hash_file(f"{config_dir}/{output_name}")
+        previous = previous_files.get(output_name, {})
+        if (previous.get('input_hash') == input_hashes[output_name]
+                and current_hashes[output_name]
+                and previous.get('output_hash') == current_hashes[output_name]):
+            manifest_files[output_name] = previous
+        else:
+            to_render.append(output_name)
+    
+    rendered = render_all(context, to_render, stopwatch)
+    
+    for output_name in to_render:
+        output_path = f"{config_dir}/{output_name}"
+        content = rendered[output_path]
+        output_hash = hash_content(content)
+        if output_hash != current_hashes[output_name]:
+            write_file_atomic(output_path, content)
+            changed.append(output_name)
+        
+        manifest_files[output_name] = {
+            'template': CONFIG_TEMPLATES[output_name],
+            'input_hash': input_hashes[output_name],
+            'output_hash': output_hash,
+        }
     
-    # Generate containerd config
-    containerd_config = render_template('containerd/config.yaml.j2', context)
-    with open(f"{config_dir}/containerd.yaml", 'w') as f:
-        f.write(containerd_config)
+    # Keep the manifest in template order regardless of which files were re-rendered
+    manifest_files = {name: manifest_files[name] for name in CONFIG_TEMPLATES}
     
-    # Generate dnsmasq config
-    dnsmasq_config = render_template('dnsmasq/config.conf.j2', context)
-    with open(f"{config_dir}/dnsmasq.conf", 'w') as f:
-        f.write(dnsmasq_config)
+    manifest = {
+        'files': manifest_files,
+        'changed': changed,
+    }
+    manifest_content = json.dumps(manifest, indent=2) + "\n"
+    manifest_path = os.path.join(config_dir, RENDER_MANIFEST_FILE)
+    if hash_file(manifest_path) != hash_content(manifest_content):
+        write_file_atomic(manifest_path, manifest_content)
+    
+    if changed:
+        for output_name in changed:
+            print(f"  📝 Updated {output_name}")
+    else:
+        print("  ℹ️ All configuration files are up to date")
     
-    # Generate helmfile config
-    helmfile_config = render_template('helmfile/helmfile.yaml.j2', context)
-    with open(f"{config_dir}/helmfile.yaml", 'w') as f:
-        f.write(helmfile_config)
+    return changed
 
-    # Generate Traefik TCP routes manifest
-    tcp_routes_config = render_template('traefik-tcp-routes.yaml.j2', context)
-    with open(f"{config_dir}/traefik-tcp-routes.yaml", 'w') as f:
-        f.write(tcp_routes_config)
+def load_applied_releases(k8s_dir):
+    """Load the release fingerprints recorded by the last successful deploy"""
+    applied_file = os.path.join(k8s_dir, APPLIED_RELEASES_FILE)
+    if not os.path.exists(applied_file):
+        return {}
+    with open(applied_file) as f:
+        return json.load(f)
 
+def load_release_fingerprints(k8s_dir):
+    """Read the fingerprint labels of the releases in the generated helmfile.yaml"""
+    with open(os.path.join(k8s_dir, 'config', 'helmfile.yaml')) as f:
+        helmfile = yaml.load(f, Loader=YAML_LOADER) or {}
+    return {
+        release['name']: {
+            'namespace': release.get('namespace'),
+            'fingerprint': (release.get('labels') or {}).get('fingerprint'),
+        }
+        for release in helmfile.get('releases', []) or []
+    }
 
+def get_changed_releases(config):
+    """Names of the releases whose fingerprint differs from the one recorded at the last deploy"""
+    k8s_dir = get_k8s_dir(config['environment'])
+    applied = load_applied_releases(k8s_dir)
+    return [
+        name for name, release in load_release_fingerprints(k8s_dir).items()
+        if applied.get(name) != release
+    ]
+
+def mark_releases_applied(config, release_names=None):
+    """
+    Record the current fingerprints of the given releases (all of them if none are given) as applied.
+    Releases no longer in helmfile.yaml are dropped from the record.
+    """
+    k8s_dir = get_k8s_dir(config['environment'])
+    current = load_release_fingerprints(k8s_dir)
+    applied = {name: release for name, release in load_applied_releases(k8s_dir).items() if name in current}
+    
+    for name in release_names or current:
+        if name not in current:
+            raise ValueError(f"Release '{name}' is not in helmfile.yaml")
+        applied[name] = current[name]
     
+    applied = {name: applied[name] for name in current if name in applied}
+    write_file_atomic(os.path.join(k8s_dir, APPLIED_RELEASES_FILE), json.dumps(applied, indent=2) + "\n")
+    return list(release_names or current)
 
-def generate_configs(config_file, os_name):
+def format_service_secrets(config):
+    """Format stored credentials of enabled system services, one line per service"""
+    env = config['environment']
+    credentials = load_credential_store(get_k8s_dir(env))
+    lines = []
+    for service in env.get('services', {}).get('system', []) or []:
+        service_name = service['name']
+        if not service.get('enabled', False) or service_name not in credentials:
+            continue
+        namespace = service.get('namespace', service_name)
+        entry = credentials[service_name]
+        lines.append(f"Service {service_name} (namespace: {namespace}), Username: {entry['username']}, Password: {entry['password']}")
+    return lines
+
+def generate_configs(config_file, os_name, rotate_credentials=None):
     """Generate all configuration files"""
     print("🔄 Generating configuration files...")
-    config = load_config(config_file)
+    stopwatch = Stopwatch()
+    with stopwatch.stage('load_config'):
+        config = load_config(config_file)
     
     # Generate resolver file based on OS
-    generate_resolver_file(config, os_name)
+    with stopwatch.stage('generate_resolver_file'):
+        generate_resolver_file(config, os_name)
+    
+    # Export resolved variables for the Taskfiles
+    with stopwatch.stage('write_resolved_vars'):
+        write_resolved_vars(config, config_file)
     
     # Generate all other configs
-    context = prepare_context(config)
+    with stopwatch.stage('prepare_context'):
+        context = prepare_context(config, rotate_credentials)
     
     # Create output directories
     create_output_directories(context)
     
+    # Persist service credentials before rendering anything that uses them
+    save_credential_store(context['k8s_dir'], context['credentials'])
+    
     # Generate all configuration files
-    generate_config_files(context)
+    with stopwatch.stage('generate_config_files'):
+        generate_config_files(context, stopwatch)
+    
+    # Stage timings go to the console and, during an instrumented run, to its trace
+    print(f"  ⏱️  {stopwatch.summary()}")
+    stopwatch.flush(context['k8s_dir'])
+    
+    tiers = context['release_tiers']
+    print(f"  🧭 Release plan: {len(context['release_plan'])} releases in {len(tiers)} tiers")
+    for tier, names in enumerate(tiers):
+        print(f"    {tier}: {', '.join(names)}")
     
     print("✅ Configuration files generated successfully")
 
+# Generated files whose changes only take effect in a new cluster; --watch reports them instead of applying
+RECREATE_ONLY_FILES = ['cluster.yaml', 'containerd.yaml']
+
+def get_watch_inputs(config_file):
+    """Modification times of everything the generated files are rendered from: k8s-env.yaml and templates/"""
+    paths = [config_file]
+    for root, _, files in os.walk(TEMPLATE_DIR):
+        paths.extend(os.path.join(root, name) for name in files)
+    inputs = {}
+    for path in paths:
+        try:
+            inputs[path] = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            pass
+    return inputs
+
+def regenerate_configs(config_file):
+    """Re-render the configuration files in process; returns the config and the names of the changed files"""
+    config = load_config(config_file)
+    write_resolved_vars(config, config_file)
+    context = prepare_context(config)
+    create_output_directories(context)
+    save_credential_store(context['k8s_dir'], context['credentials'])
+    return config, generate_config_files(context)
+
+def plan_reapply(config_file, config, changed):
+    """
+    Map changed files to the actions that apply them to the running environment, in the order they should run.
+    Returns a list of (description, command) pairs; the command is None for changes that are only reported.
+    """
+    k8s_dir = get_k8s_dir(config['environment'])
+    kubeconfig = os.path.join(k8s_dir, 'kubeconfig')
+    config_var = f"CONFIG_FILE={os.path.abspath(config_file)}"
+    actions = []
+    
+    for name in RECREATE_ONLY_FILES:
+        if name in changed:
+            actions.append((f"{name} changed, it only takes effect in a new cluster (`task recreate-env`)", None))
+    
+    if 'dnsmasq.conf' in changed:
+        actions.append(("DNS configuration changed, re-creating the DNS container", ['task', 'start-dnsmasq', config_var]))
+    elif f"{DNSMASQ_HOSTS_DIR}/services.hosts" in changed:
+        actions.append(("DNS records changed, reloading dnsmasq",
+                        [sys.executable, os.path.join(SCRIPT_DIR, 'k8s_runtime.py'), config_file, 'reload-dns']))
+    
+    # deploy-changed-services also applies the storage tiers and the TCP routes
+    releases = get_changed_releases(config) if 'helmfile.yaml' in changed else []
+    if 'storage-tiers.yaml' in changed and not releases:
+        actions.append(("Storage tiers changed, applying them", ['task', 'kubernetes:apply-storage-tiers', config_var]))
+    if releases:
+        actions.append((f"Releases changed: {', '.join(releases)}",
+                        ['task', 'kubernetes:deploy-changed-services', config_var]))
+    elif 'traefik-tcp-routes.yaml' in changed:
+        actions.append(("TCP routes changed, applying them",
+                        ['kubectl', '--kubeconfig', kubeconfig, 'apply', '-f',
+                         os.path.join(k8s_dir, 'config', 'traefik-tcp-routes.yaml')]))
+    return actions
+
+def watch_configs(config_file, interval=1.0, apply=True):
+    """
+    Re-render the configuration files whenever k8s-env.yaml or a template changes and apply only
+    the affected parts (DNS, releases, storage tiers, TCP routes) to the running environment.
+    Presets and compiled templates stay in memory between runs; runs until interrupted.
+    """
+    config_file = os.path.abspath(config_file)
+    print(f"👀 Watching {config_file} and {TEMPLATE_DIR} (Ctrl+C to stop)...")
+    resolver = None
+    inputs = get_watch_inputs(config_file)
+    pending = ['initial run']
+    try:
+        while True:
+            if pending:
+                print(f"🔄 Regenerating configuration files ({', '.join(pending)})...")
+                try:
+                    config, changed = regenerate_configs(config_file)
+                    env = config['environment']
+                    if resolver is not None and resolver != (env['local-domain'], env['local-ip']):
+                        print("  ⚠️  local-domain or local-ip changed, run `task generate-configs` to update the host resolver")
+                    resolver = (env['local-domain'], env['local-ip'])
+                    
+                    actions = plan_reapply(config_file, config, changed)
+                    running = os.path.exists(os.path.join(get_k8s_dir(env), 'kubeconfig'))
+                    for description, command in actions:
+                        if command is None:
+                            print(f"  ⚠️  {description}")
+                        elif not apply or not running:
+                            print(f"  ℹ️ {description} (not applied{'' if apply else ', --no-apply'})")
+                        else:
+                            print(f"  🚀 {description}")
+                            if subprocess.run(command, cwd=SCRIPT_DIR).returncode != 0:
+                                print(f"  ❌ Failed: {description}")
+                except Exception as e:
+                    # Keep watching: the next save usually fixes a half-edited file
+                    print(f"  ❌ {type(e).__name__}: {e}")
+                print("👀 Waiting for changes...")
+            
+            time.sleep(interval)
+            current = get_watch_inputs(config_file)
+            if current == inputs:
+                pending = []
+                continue
+            # Editors may write several files in a row; wait until the inputs settle
+            while True:
+                time.sleep(min(interval, 0.2))
+                settled = get_watch_inputs(config_file)
+                if settled == current:
+                    break
+                current = settled
+            pending = sorted(
+                os.path.relpath(path, SCRIPT_DIR) if path.startswith(SCRIPT_DIR) else path
+                for path in set(inputs) | set(current) if inputs.get(path) != current.get(path)
+            )
+            inputs = current
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching")
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Generate configuration files for the local Kubernetes environment")
+    parser.add_argument('config_file', help="path to k8s-env.yaml")
+    parser.add_argument('os_name', nargs='?', help="ignored, the OS is detected from the running interpreter")
+    parser.add_argument('--export-vars', action='store_true',
+                        help="only write the resolved Taskfile variables (dotenv and JSON) next to the config file")
+    parser.add_argument('--rotate-credentials', nargs='*', metavar='SERVICE',
+                        help="generate new credentials for the given system services (all of them if none are given)")
+    parser.add_argument('--show-credentials', action='store_true',
+                        help="print the stored credentials of enabled system services and exit")
+    parser.add_argument('--changed-releases', action='store_true',
+                        help="print the releases whose fingerprint changed since the last deploy and exit")
+    parser.add_argument('--mark-applied', nargs='*', metavar='RELEASE',
+                        help="record the given releases (all of them if none are given) as deployed and exit")
+    parser.add_argument('--watch', action='store_true',
+                        help="re-render on changes to the config file or templates and apply only the affected parts")
+    parser.add_argument('--watch-interval', type=float, default=1.0,
+                        help="seconds between checks for changes in --watch (default: 1)")
+    parser.add_argument('--no-apply', action='store_true',
+                        help="with --watch: only re-render and report what would be applied")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage:")
-        print("  generate_configs.py k8s-env.yaml # Generate all configs")
-        sys.exit(1)
+    args = parse_args(sys.argv[1:])
     
-    config_file = sys.argv[1]
+    config_file = args.config_file
     os_name = sys.platform
     
-    generate_configs(config_file, os_name)
-    sys.exit(0) 
\ No newline at end of file
+    if args.export_vars:
+        dotenv_path, json_path = write_resolved_vars(load_config(config_file), config_file)
+        print(f"✅ Resolved variables written to {dotenv_path} and {json_path}")
+        sys.exit(0)
+    
+    if args.show_credentials:
+        for line in format_service_secrets(load_config(config_file)):
+            print(line)
+        sys.exit(0)
+    
+    if args.changed_releases:
+        for name in get_changed_releases(load_config(config_file)):
+            print(name)
+        sys.exit(0)
+    
+    if args.mark_applied is not None:
+        mark_releases_applied(load_config(config_file), args.mark_applied)
+        sys.exit(0)
+    
+    if args.watch:
+        watch_configs(config_file, args.watch_interval, not args.no_apply)
+        sys.exit(0)
+    
+    generate_configs(config_file, os_name, args.rotate_credentials)
+    sys.exit(0)
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Node-level operations on the containers of the local cluster.
+
+The cluster's containers (kind nodes, the kind load balancer, the dnsmasq container and the registry mirrors) are listed
+with a single `<runtime> ps -a --format json` call, and per-container operations run concurrently
+in a bounded thread pool, so starting or stopping N nodes takes about as long as the slowest one.
+
+Usage:
+    python3 k8s_runtime.py k8s-env.yaml start          # start all stopped cluster containers, wait until ready
+    python3 k8s_runtime.py k8s-env.yaml stop           # stop all running cluster containers
+    python3 k8s_runtime.py k8s-env.yaml inject-dns     # point the nodes' resolv.conf at the dnsmasq container
+    python3 k8s_runtime.py k8s-env.yaml reload-dns     # make dnsmasq re-read its hosts files (SIGHUP)
+    python3 k8s_runtime.py k8s-env.yaml label-workers  # label worker nodes with node-role.kubernetes.io/worker
+    python3 k8s_runtime.py k8s-env.yaml wait-ready     # wait for the API server and all nodes to be ready
+    python3 k8s_runtime.py k8s-env.yaml start-mirrors  # start the pull-through registry mirrors (image-cache)
+    python3 k8s_runtime.py k8s-env.yaml remove-mirrors # remove the mirror containers, keeping their cache
+    python3 k8s_runtime.py k8s-env.yaml preload-images # load the images of the helm releases into all nodes
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+from generate_configs import (
+    load_config, build_task_vars, get_image_mirrors, get_internal_component, load_render_manifest, DNSMASQ_HOSTS_DIR,
+    YAML_LOADER,
+)
+from k8s_timing import span
+from readiness import wait_for, nodes_ready
+
+# Labels kind puts on the containers it creates
+KIND_CLUSTER_LABEL = 'io.x-k8s.kind.cluster'
+KIND_ROLE_LABEL = 'io.x-k8s.kind.role'
+
+WORKER_ROLE_LABEL = 'node-role.kubernetes.io/worker'
+
+# Label put on the pull-through mirror containers, set to the cluster name
+MIRROR_LABEL = 'k8s-env.mirror-for'
+
+DEFAULT_MAX_WORKERS = 8
+
+def run(command, check=True, timeout=None):
+    """Run a command and return its stdout; raises RuntimeError with stderr when `check` fails"""
+    result = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    if check and result.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} failed: {result.stderr.strip() or result.stdout.strip()}")
+    return result.stdout
+
+def parse_labels(labels):
+    """Container labels as a dict; docker reports them as 'k=v,k=v', podman as an object"""
+    if isinstance(labels, dict):
+        return labels
+    parsed = {}
+    for item in (labels or '').split(','):
+        key, _, value = item.partition('=')
+        if key:
+            parsed[key] = value
+    return parsed
+
+def parse_ps_output(output):
+    """Parse `ps --format json`: one object per line (docker) or a single array (podman)"""
+    output = output.strip()
+    if not output:
+        return []
+    if output.startswith('['):
+        return json.loads(output)
+    return [json.loads(line) for line in output.splitlines() if line.strip()]
+
+class ClusterRuntime:
+    """The containers of one local cluster and the operations on them"""
+
+    def __init__(self, config, max_workers=DEFAULT_MAX_WORKERS):
+        self.env = config['environment']
+        task_vars = build_task_vars(config)
+        self.cluster_name = task_vars['CLUSTER_NAME']
+        self.runtime = task_vars['RUNTIME_BINARY']
+        self.provider = task_vars['PROVIDER']
+        self.k8s_dir = task_vars['K8S_DIR']
+        self.kubeconfig = os.path.join(self.k8s_dir, 'kubeconfig')
+        self.dns_container = f"{self.cluster_name}-dns"
+        self.node_count = int(task_vars['SERVERS']) + int(task_vars['WORKERS'])
+        self.max_workers = max_workers
+
+    def list_containers(self, timeout=None):
+        """
+        List the cluster's containers with one runtime call.
+        Returns dicts with name, role (control-plane, worker, external-load-balancer, dns or mirror), running state
+        and the runtime's status text.
+        """
+        output = run([self.runtime, 'ps', '-a', '--format', 'json', '--filter', f"name={self.cluster_name}"],
+                     timeout=timeout)
+        containers = []
+        for entry in parse_ps_output(output):
+            names = entry.get('Names')
+            name = names[0] if isinstance(names, list) else (names or '').split(',')[0]
+            name = name.lstrip('/')
+            labels = parse_labels(entry.get('Labels'))
+            if labels.get(KIND_CLUSTER_LABEL) == self.cluster_name:
+                role = labels.get(KIND_ROLE_LABEL, '')
+            elif name == self.dns_container:
+                role = 'dns'
+            elif labels.get(MIRROR_LABEL) == self.cluster_name:
+                role = 'mirror'
+            else:
+                continue
+            containers.append({
+                'name': name,
+                'role': role,
+                'running': str(entry.get('State', '')).lower() == 'running',
+                'status': entry.get('Status') or str(entry.get('State', '')),
+            })
+        return sorted(containers, key=lambda container: container['name'])
+
+    def nodes(self, containers=None):
+        containers = self.list_containers() if containers is None else containers
+        return [container for container in containers if container['role'] in ('control-plane', 'worker')]
+
+    def for_each(self, items, operation):
+        """Run `operation` on every item in a bounded thread pool; returns {item: exception or None}"""
+        if not items:
+            return {}
+        def guarded(item):
+            try:
+                operation(item)
+                return None
+            except Exception as e:
+                return e
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            return dict(zip(items, executor.map(guarded, items)))
+
+    def report(self, results, verb):
+        """Print per-container results; returns True when all succeeded"""
+        ok = True
+        for name, error in results.items():
+            if error is None:
+                print(f"    ✅ {verb} {name}")
+            else:
+                print(f"    ❌ {name}: {error}")
+                ok = False
+        return ok
+
+    def start(self, timeout=180):
+        containers = self.list_containers()
+        stopped = [container['name'] for container in containers if not container['running']]
+        if containers and not stopped:
+            print(f"ℹ️ Cluster '{self.cluster_name}' is already running")
+            return True
+        if not containers:
+            print(f"❌ No containers found for cluster '{self.cluster_name}'")
+            return False
+
+        print(f"  🔄 Starting {len(stopped)} '{self.cluster_name}'-related containers...")
+        results = self.for_each(stopped, lambda name: run([self.runtime, 'start', name]))
+        if not self.report(results, 'Started'):
+            return False
+        print(f"  ✅ Started all '{self.cluster_name}'-related containers")
+
+        # Restarted nodes come up with the runtime's default resolv.conf
+        if any(container['role'] == 'dns' for container in containers):
+            self.inject_dns()
+        return self.wait_ready(timeout)
+
+    def stop(self):
+        containers = self.list_containers()
+        running = [container['name'] for container in containers if container['running']]
+        if not running:
+            print(f"ℹ️ Cluster '{self.cluster_name}' is already stopped")
+            return True
+
+        print(f"  🔄 Stopping {len(running)} '{self.cluster_name}'-related containers...")
+        results = self.for_each(running, lambda name: run([self.runtime, 'stop', name]))
+        if not self.report(results, 'Stopped'):
+            return False
+        print(f"  ✅ Stopped all '{self.cluster_name}'-related containers")
+        return True
+
+    def inject_dns(self):
+        """Make the dnsmasq container the first nameserver in every node's resolv.conf"""
+        dns_ip = run([
+            self.runtime, 'inspect', self.dns_container,
+            '--format', '{{range .NetworkSettings.Networks}}{{.IPAddress}}{{end}}',
+        ], check=False).strip()
+        if not dns_ip:
+            print("❌ Failed to get DNS container IP")
+            return False
+
+        script = (
+            f"if ! grep -q '^nameserver {dns_ip}$' /etc/resolv.conf; then "
+            f"awk '/^[^#]/{{if(!p){{print \"nameserver {dns_ip}\";p=1}}}}1' /etc/resolv.conf > /tmp/resolv.new "
+            f"&& cat /tmp/resolv.new > /etc/resolv.conf; fi"
+        )
+        nodes = [node['name'] for node in self.nodes() if node['running']]
+        print(f"  📝 Updating DNS for {len(nodes)} nodes")
+        results = self.for_each(nodes, lambda name: run([self.runtime, 'exec', name, '/bin/sh', '-c', script]))
+        return self.report(results, 'Updated DNS for')
+
+    def reload_dns(self, if_changed=False):
+        """
+        Send SIGHUP to the dnsmasq container so it re-reads its hosts files and clears its cache.
+        dnsmasq also watches the hosts directory itself, but file events do not reach containers
+        on every runtime (e.g. bind mounts from a macOS host). With `if_changed`, only reload when
+        the last generator run changed a hosts file.
+        """
+        if if_changed:
+            changed = load_render_manifest(os.path.join(self.k8s_dir, 'config')).get('changed', [])
+            if not any(name.startswith(f"{DNSMASQ_HOSTS_DIR}/") for name in changed):
+                return True
+        running = any(container['role'] == 'dns' and container['running'] for container in self.list_containers())
+        if not running:
+            print("ℹ️ DNS container is not running, nothing to reload")
+            return True
+        run([self.runtime, 'kill', '--signal', 'HUP', self.dns_container])
+        print("✅ Reloaded DNS records")
+        return True
+
+    def kubectl(self, *args, check=True, timeout=None):
+        return run(['kubectl', '--kubeconfig', self.kubeconfig, *args], check=check, timeout=timeout)
+
+    def unlabeled_workers(self):
+        """Worker nodes missing the worker role label, from a single `kubectl get nodes`"""
+        worker_names = {node['name'] for node in self.nodes() if node['role'] == 'worker'}
+        nodes = json.loads(self.kubectl('get', 'nodes', '-o', 'json'))
+        return sorted(
+            node['metadata']['name'] for node in nodes.get('items', [])
+            if node['metadata']['name'] in worker_names
+            and WORKER_ROLE_LABEL not in node['metadata'].get('labels', {})
+        )
+
+    def label_workers(self):
+        unlabeled = self.unlabeled_workers()
+        if not unlabeled:
+            print("ℹ️ All worker nodes are already labeled")
+            return True
+        # One call labels all nodes
+        self.kubectl('label', 'node', *unlabeled, f"{WORKER_ROLE_LABEL}=true", '--overwrite')
+        for name in unlabeled:
+            print(f"✅ Labeled node {name} as worker")
+        return True
+
+    def wait_ready(self, timeout=180):
+        """Wait for the API server to answer /readyz, then for all configured nodes to report Ready"""
+        if not os.path.exists(self.kubeconfig):
+            print("ℹ️ No kubeconfig yet, skipping readiness check")
+            return True
+
+        deadline = time.monotonic() + timeout
+        self.kubectl('config', 'use-context', f"{self.provider}-{self.cluster_name}", check=False)
+
+        print("  ⏳ Waiting for the API server...")
+        with span(self.k8s_dir, 'api-server ready'):
+            while self.kubectl('get', '--raw', '/readyz', check=False, timeout=10).strip() != 'ok':
+                if time.monotonic() > deadline:
+                    print(f"  ⚠️  Warning: API server not ready after {timeout}s")
+                    return False
+                time.sleep(1)
+
+        remaining = max(1, int(deadline - time.monotonic()))
+        print(f"  ⏱️  Waiting up to {remaining}s for {self.node_count} nodes to become ready...")
+        with span(self.k8s_dir, 'nodes ready'):
+            if not wait_for(self.kubeconfig, [nodes_ready(self.node_count)], remaining):
+                return False
+        print("✅ All nodes are ready")
+        return True
+
+    def start_mirrors(self):
+        """Create or start one pull-through registry mirror per upstream registry"""
+        mirrors = get_image_mirrors(self.env)
+        if not mirrors:
+            print("ℹ️ Image cache is disabled")
+            return True
+
+        existing = {container['name']: container for container in self.list_containers()}
+        image = f"registry:{get_internal_component(self.env, 'registry')}"
+
+        by_name = {mirror['container']: mirror for mirror in mirrors}
+
+        def start_mirror(name):
+            mirror = by_name[name]
+            container = existing.get(name)
+            if container and container['running']:
+                return
+            if container:
+                run([self.runtime, 'start', mirror['container']])
+                return
+            os.makedirs(mirror['storage'], exist_ok=True)
+            run([
+                self.runtime, 'run', '-d', '--name', mirror['container'],
+                '--network', 'kind',
+                '--restart', 'unless-stopped',
+                '--label', f"{MIRROR_LABEL}={self.cluster_name}",
+                '-p', f"{mirror['port']}:5000",
+                '-v', f"{mirror['storage']}:/var/lib/registry",
+                '-e', f"REGISTRY_PROXY_REMOTEURL={mirror['remote_url']}",
+                image,
+            ])
+
+        print(f"  🔄 Starting {len(mirrors)} registry mirrors...")
+        results = self.for_each(list(by_name), start_mirror)
+        return self.report(results, 'Mirror ready:')
+
+    def remove_mirrors(self):
+        """Remove the mirror containers; the cached layers stay on disk"""
+        mirrors = [container['name'] for container in self.list_containers() if container['role'] == 'mirror']
+        if not mirrors:
+            return True
+        results = self.for_each(mirrors, lambda name: run([self.runtime, 'rm', '-f', name]))
+        return self.report(results, 'Removed')
+
+    def release_images(self, helm_binary=None):
+        """Images referenced by the manifests that helmfile renders for the releases"""
+        command = ['helmfile', '--file', os.path.join(self.k8s_dir, 'config', 'helmfile.yaml')]
+        if helm_binary:
+            command += ['--helm-binary', helm_binary]
+        output = run(command + ['template'])
+
+        images = set()
+        def collect(node):
+            if isinstance(node, dict):
+                for key, value in node.items():
+                    if key == 'image' and isinstance(value, str) and value:
+                        images.add(value)
+                    else:
+                        collect(value)
+            elif isinstance(node, list):
+                for item in node:
+                    collect(item)
+        for document in yaml.load_all(output, Loader=YAML_LOADER):
+            collect(document)
+
+        # Images from the local registry are not available before it is deployed
+        local_registry = f"{self.env['registry']['name']}.{self.env['local-domain']}/"
+        return sorted(image for image in images if not image.startswith(local_registry))
+
+    def preload_images(self, helm_binary=None):
+        """Pull missing release images into the host's image store, which outlives the cluster, and load them into all nodes"""
+        image_cache = self.env.get('image-cache', {}) or {}
+        if not image_cache.get('enabled', False) or not image_cache.get('preload', True):
+            print("ℹ️ Image preloading is disabled")
+            return True
+
+        images = sorted(set(self.release_images(helm_binary)) | set(image_cache.get('preload-images', []) or []))
+        if not images:
+            print("ℹ️ No images to preload")
+            return True
+
+        def ensure_image(image):
+            if subprocess.run([self.runtime, 'image', 'inspect', image], capture_output=True).returncode != 0:
+                run([self.runtime, 'pull', image])
+
+        print(f"  📥 Pulling {len(images)} images on the host...")
+        results = self.for_each(images, ensure_image)
+        available = [image for image, error in results.items() if error is None]
+        for image, error in results.items():
+            if error is not None:
+                print(f"    ⚠️  Skipping {image}: {error}")
+        if not available:
+            print("⚠️ No images could be pulled, nothing to preload")
+            return True
+
+        # kind saves the images once and loads them into all nodes concurrently
+        print(f"  📦 Loading {len(available)} images into the nodes...")
+        run([self.provider, 'load', 'docker-image', '--name', self.cluster_name, *available])
+        print(f"✅ Preloaded {len(available)} images")
+        return True
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Run node-level operations on the local cluster's containers")
+    parser.add_argument('config_file', help="path to k8s-env.yaml")
+    parser.add_argument('action', choices=[
+        'start', 'stop', 'inject-dns', 'reload-dns', 'label-workers', 'wait-ready', 'start-mirrors', 'remove-mirrors',
+        'preload-images',
+    ])
+    parser.add_argument('--max-workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f"maximum number of containers handled at the same time (default: {DEFAULT_MAX_WORKERS})")
+    parser.add_argument('--timeout', type=int, default=180, help="seconds to wait for readiness (default: 180)")
+    parser.add_argument('--check', action='store_true',
+                        help="with label-workers: only exit non-zero when a worker node is not labeled")
+    parser.add_argument('--helm-binary', help="helm binary for helmfile (preload-images)")
+    parser.add_argument('--if-changed', action='store_true',
+                        help="with reload-dns: only reload when the last generator run changed the DNS records")
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    runtime = ClusterRuntime(load_config(args.config_file), args.max_workers)
+
+    if args.action == 'start':
+        ok = runtime.start(args.timeout)
+    elif args.action == 'stop':
+        ok = runtime.stop()
+    elif args.action == 'inject-dns':
+        ok = runtime.inject_dns()
+    elif args.action == 'reload-dns':
+        ok = runtime.reload_dns(args.if_changed)
+    elif args.action == 'label-workers':
+        ok = not runtime.unlabeled_workers() if args.check else runtime.label_workers()
+    elif args.action == 'start-mirrors':
+        ok = runtime.start_mirrors()
+    elif args.action == 'remove-mirrors':
+        ok = runtime.remove_mirrors()
+    elif args.action == 'preload-images':
+        ok = runtime.preload_images(args.helm_binary)
+    else:
+        ok = runtime.wait_ready(args.timeout)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
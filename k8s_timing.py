@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Timing instrumentation for the environment lifecycle tasks.
+
+A run (e.g. create-env) is a sequence of phases and sub-steps recorded as events in
+<k8s_dir>/timing/events.jsonl. Events come from the Taskfiles (begin/end on the command line),
+from helmfile release hooks and from the Python scripts (spans). Finishing a run writes:
+  - <k8s_dir>/timing/trace.json    Chrome trace / Perfetto JSON (open in ui.perfetto.dev or chrome://tracing)
+  - <k8s_dir>/timing/summary.txt   phase table with the change against the previous run
+and appends the run to <base-dir>/.timing/<name>/history.jsonl, which outlives destroy-env.
+
+Recording is a no-op when no run is active, so instrumented commands also work on their own.
+
+Usage:
+    python3 k8s_timing.py k8s-env.yaml begin-run create-env
+    python3 k8s_timing.py k8s-env.yaml begin kubernetes:create-cluster
+    python3 k8s_timing.py k8s-env.yaml end kubernetes:create-cluster
+    python3 k8s_timing.py k8s-env.yaml finish-run
+    python3 k8s_timing.py k8s-env.yaml history
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+TIMING_DIR = 'timing'
+EVENTS_FILE = 'events.jsonl'
+TRACE_FILE = 'trace.json'
+SUMMARY_FILE = 'summary.txt'
+HISTORY_FILE = 'history.jsonl'
+
+# Trace lanes (thread ids) for the categories that run one after another
+CATEGORY_LANES = {'run': 0, 'phase': 1, 'step': 2}
+
+def get_events_path(k8s_dir):
+    return os.path.join(k8s_dir, TIMING_DIR, EVENTS_FILE)
+
+def is_run_active(k8s_dir):
+    return bool(k8s_dir) and os.path.exists(get_events_path(k8s_dir))
+
+def now_us():
+    return int(time.time() * 1_000_000)
+
+def append_event(k8s_dir, event):
+    """Append one event to the active run; a single small write keeps concurrent writers from interleaving"""
+    if not is_run_active(k8s_dir):
+        return
+    line = json.dumps(event) + "\n"
+    fd = os.open(get_events_path(k8s_dir), os.O_WRONLY | os.O_APPEND)
+    try:
+        os.write(fd, line.encode())
+    finally:
+        os.close(fd)
+
+def begin(k8s_dir, name, category='phase'):
+    append_event(k8s_dir, {'ph': 'B', 'name': name, 'cat': category, 'ts': now_us()})
+
+def end(k8s_dir, name, category='phase', status='ok'):
+    append_event(k8s_dir, {'ph': 'E', 'name': name, 'cat': category, 'ts': now_us(), 'status': status})
+
+def record(k8s_dir, name, start, finish, category='step', args=None):
+    """Record a completed span; `start` and `finish` are time.time() values"""
+    event = {'ph': 'X', 'name': name, 'cat': category, 'ts': int(start * 1_000_000),
+             'dur': int((finish - start) * 1_000_000)}
+    if args:
+        event['args'] = args
+    append_event(k8s_dir, event)
+
+@contextmanager
+def span(k8s_dir, name, category='step', args=None):
+    """Time a block of code as a sub-step of the active run"""
+    start = time.time()
+    status = 'ok'
+    try:
+        yield
+    except BaseException:
+        status = 'failed'
+        raise
+    finally:
+        record(k8s_dir, name, start, time.time(), category, dict(args or {}, status=status))
+
+class Stopwatch:
+    """
+    Collects the durations of the stages of one process (thread-safe), for printing and,
+    once the output directory is known, for the active run's trace.
+    """
+    def __init__(self):
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def add(self, name, start, finish, category='generator'):
+        with self._lock:
+            self.stages.append((name, start, finish, category))
+
+    @contextmanager
+    def stage(self, name, category='generator'):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.time(), category)
+
+    def flush(self, k8s_dir):
+        """Write the collected stages to the active run, if any"""
+        for name, start, finish, category in self.stages:
+            record(k8s_dir, name, start, finish, category)
+
+    def summary(self):
+        return ', '.join(f"{name} {(finish - start) * 1000:.1f}ms" for name, start, finish, _ in self.stages)
+
+def begin_run(k8s_dir, name):
+    """Start a new run, discarding the events of a previous unfinished one"""
+    os.makedirs(os.path.join(k8s_dir, TIMING_DIR), exist_ok=True)
+    with open(get_events_path(k8s_dir), 'w') as f:
+        f.write(json.dumps({'ph': 'B', 'name': name, 'cat': 'run', 'ts': now_us()}) + "\n")
+
+def load_events(k8s_dir):
+    with open(get_events_path(k8s_dir)) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def build_spans(events, finished_at):
+    """
+    Pair begin/end events into spans. Spans never ended (a failed phase) end at `finished_at`
+    and are marked incomplete.
+    """
+    spans = []
+    open_spans = {}
+    for event in events:
+        key = (event['cat'], event['name'])
+        if event['ph'] == 'B':
+            open_spans.setdefault(key, []).append(event)
+        elif event['ph'] == 'E' and open_spans.get(key):
+            started = open_spans[key].pop()
+            spans.append({'name': event['name'], 'cat': event['cat'], 'ts': started['ts'],
+                          'dur': event['ts'] - started['ts'], 'args': {'status': event.get('status', 'ok')}})
+        elif event['ph'] == 'X':
+            spans.append({'name': event['name'], 'cat': event['cat'], 'ts': event['ts'], 'dur': event['dur'],
+                          'args': event.get('args', {})})
+    for started_events in open_spans.values():
+        for started in started_events:
+            spans.append({'name': started['name'], 'cat': started['cat'], 'ts': started['ts'],
+                          'dur': finished_at - started['ts'], 'args': {'status': 'incomplete'}})
+    return sorted(spans, key=lambda item: (item['ts'], -item['dur']))
+
+def build_trace(spans):
+    """Chrome trace events; parallel spans (releases, renders) get a lane of their own"""
+    lanes = dict(CATEGORY_LANES)
+    trace_events = [{'ph': 'M', 'name': 'process_name', 'pid': 1, 'tid': 0, 'args': {'name': 'k8s-env'}}]
+    for item in spans:
+        lane_key = item['cat'] if item['cat'] in CATEGORY_LANES else f"{item['cat']}:{item['name']}"
+        if lane_key not in lanes:
+            lanes[lane_key] = len(lanes)
+            trace_events.append({'ph': 'M', 'name': 'thread_name', 'pid': 1, 'tid': lanes[lane_key],
+                                 'args': {'name': lane_key}})
+        trace_events.append(dict(item, ph='X', pid=1, tid=lanes[lane_key]))
+    for category, tid in CATEGORY_LANES.items():
+        trace_events.append({'ph': 'M', 'name': 'thread_name', 'pid': 1, 'tid': tid, 'args': {'name': category}})
+    return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+def load_history(history_path):
+    if not os.path.exists(history_path):
+        return []
+    with open(history_path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def format_summary(entry, previous=None):
+    """Table of the run's phases and slowest sub-steps, with the change against the previous run"""
+    def delta(section, name, seconds):
+        if not previous or name not in previous.get(section, {}):
+            return ''
+        return f"{seconds - previous[section][name]:+.1f}s"
+
+    profile = f" [{entry['profile']} profile]" if entry.get('profile') else ''
+    versus = ''
+    if previous:
+        previous_profile = f", {previous['profile']} profile" if previous.get('profile', 'default') != entry.get('profile', 'default') else ''
+        versus = f" ({entry['total'] - previous['total']:+.1f}s vs previous run{previous_profile})"
+    lines = [f"⏱️  {entry['run']}{profile} started {entry['started']}: {entry['total']:.1f}s{versus}"]
+    lines.append(f"  {'phase':<44} {'seconds':>9} {'change':>9}")
+    for name, seconds in entry['phases'].items():
+        lines.append(f"  {name:<44} {seconds:>9.1f} {delta('phases', name, seconds):>9}")
+    if entry['steps']:
+        lines.append(f"  {'slowest sub-steps':<44} {'seconds':>9} {'change':>9}")
+        for name, seconds in sorted(entry['steps'].items(), key=lambda item: -item[1])[:15]:
+            lines.append(f"  {name:<44} {seconds:>9.1f} {delta('steps', name, seconds):>9}")
+    return '\n'.join(lines) + '\n'
+
+def finish_run(k8s_dir, history_path, profile=None):
+    """
+    Write the trace and summary of the active run, append it to the history and end the run.
+    The provider profile is recorded so runs with different kubeadm/kubelet tuning can be compared.
+    """
+    if not is_run_active(k8s_dir):
+        print("ℹ️ No timing run is active")
+        return None
+
+    finished_at = now_us()
+    events = load_events(k8s_dir)
+    spans = build_spans(events, finished_at)
+    run_span = next((item for item in spans if item['cat'] == 'run'), None)
+    if run_span is None:
+        return None
+
+    timing_dir = os.path.join(k8s_dir, TIMING_DIR)
+    with open(os.path.join(timing_dir, TRACE_FILE), 'w') as f:
+        json.dump(build_trace(spans), f)
+
+    phases = {}
+    steps = {}
+    for item in spans:
+        if item['cat'] == 'phase':
+            phases[item['name']] = phases.get(item['name'], 0) + item['dur'] / 1_000_000
+        elif item['cat'] != 'run':
+            name = f"{item['cat']}: {item['name']}"
+            steps[name] = steps.get(name, 0) + item['dur'] / 1_000_000
+    entry = {
+        'run': run_span['name'],
+        'started': datetime.fromtimestamp(run_span['ts'] / 1_000_000).isoformat(timespec='seconds'),
+        'total': round(run_span['dur'] / 1_000_000, 3),
+        'phases': {name: round(seconds, 3) for name, seconds in phases.items()},
+        'steps': {name: round(seconds, 3) for name, seconds in steps.items()},
+    }
+    if profile:
+        entry['profile'] = profile
+
+    previous = next((item for item in reversed(load_history(history_path)) if item['run'] == entry['run']), None)
+    summary = format_summary(entry, previous)
+    with open(os.path.join(timing_dir, SUMMARY_FILE), 'w') as f:
+        f.write(summary)
+
+    os.makedirs(os.path.dirname(history_path), exist_ok=True)
+    with open(history_path, 'a') as f:
+        f.write(json.dumps(entry) + "\n")
+
+    os.remove(get_events_path(k8s_dir))
+    print(summary, end='')
+    print(f"📝 Trace written to {os.path.join(timing_dir, TRACE_FILE)}")
+    return entry
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Record phase timings of environment tasks")
+    parser.add_argument('config_file', help="path to k8s-env.yaml")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    begin_run_parser = subparsers.add_parser('begin-run', help="start a new timing run")
+    begin_run_parser.add_argument('name')
+    for command in ('begin', 'end'):
+        command_parser = subparsers.add_parser(command, help=f"{command} a phase or sub-step")
+        command_parser.add_argument('name')
+        command_parser.add_argument('--cat', default='phase', help="category: phase (default), step, release, ...")
+        if command == 'end':
+            command_parser.add_argument('--status', default='ok')
+    subparsers.add_parser('finish-run', help="write the trace and summary and append the run to the history")
+    history_parser = subparsers.add_parser('history', help="show the totals of previous runs")
+    history_parser.add_argument('-n', type=int, default=10, help="number of runs to show (default: 10)")
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+
+    from generate_configs import load_config, get_k8s_dir, get_base_dir
+    env = load_config(args.config_file)['environment']
+    k8s_dir = get_k8s_dir(env)
+    history_path = os.path.join(get_base_dir(env), '.timing', env['name'], HISTORY_FILE)
+
+    if args.command == 'begin-run':
+        begin_run(k8s_dir, args.name)
+    elif args.command == 'begin':
+        begin(k8s_dir, args.name, args.cat)
+    elif args.command == 'end':
+        end(k8s_dir, args.name, args.cat, args.status)
+    elif args.command == 'finish-run':
+        if is_run_active(k8s_dir):
+            end(k8s_dir, load_events(k8s_dir)[0]['name'], 'run')
+        finish_run(k8s_dir, history_path, env['provider'].get('profile', 'default'))
+    else:
+        for entry in load_history(history_path)[-args.n:]:
+            phases = sorted(entry['phases'].items(), key=lambda item: -item[1])[:3]
+            slowest = ', '.join(f"{name} {seconds:.1f}s" for name, seconds in phases)
+            print(f"{entry['started']}  {entry['run']:<14} {entry.get('profile', 'default'):<8} {entry['total']:>8.1f}s  {slowest}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Load generator for the ingress and the TCP routes of the local environment.
+
+The targets are built from prepare_context(): the registry (HTTPS through Traefik with the wildcard
+certificate), the ingress hosts of user services and the TCP ports of system services. Each target is
+driven at a fixed request rate with asyncio for a given duration; every request opens its own
+connection, so HTTPS requests include the TLS handshake with Traefik and TCP requests measure the
+connection through the IngressRouteTCP. The report has the throughput, errors and p50/p95/p99
+latency of each target.
+
+Requests are sent on schedule whether or not earlier ones have finished (up to --concurrency in flight
+per target), and latency is measured from the scheduled start. A saturated target therefore shows up as
+growing latency instead of a lower request rate.
+
+The load part only uses the standard library. --targets-json runs it against any server, e.g. a local
+stub, to measure the generator itself or compare settings:
+
+Usage:
+    python3 loadgen.py k8s-env.yaml                                  # all targets, 20 requests/s each for 10s
+    python3 loadgen.py k8s-env.yaml --rate 100 --duration 30 --only registry
+    python3 loadgen.py k8s-env.yaml --json                           # one JSON document with per-target results
+    python3 -m http.server 8080 &
+    python3 loadgen.py --targets-json '[{"name": "stub", "kind": "http", "host": "127.0.0.1", "port": 8080}]'
+"""
+import os
+import re
+import sys
+import ssl
+import json
+import asyncio
+import argparse
+from collections import Counter
+from contextlib import redirect_stdout
+
+DEFAULT_RATE = 20.0
+DEFAULT_DURATION = 10.0
+DEFAULT_CONCURRENCY = 50
+DEFAULT_TIMEOUT = 5.0
+
+TARGET_KINDS = ['tcp', 'http', 'https']
+PERCENTILES = [50, 95, 99]
+
+# Ingress hosts that still contain a variable after generation cannot be resolved
+UNRESOLVED_VARIABLE = re.compile(r'\$\{[^}]*\}')
+
+def find_ingress_hosts(values):
+    """(host, path) of every ingress.hosts entry in helm values, at any depth"""
+    found = []
+    if isinstance(values, dict):
+        for key, value in values.items():
+            if key == 'ingress' and isinstance(value, dict) and value.get('enabled', True) is not False:
+                for entry in value.get('hosts', []) or []:
+                    host = entry.get('host') if isinstance(entry, dict) else entry
+                    paths = entry.get('paths', []) if isinstance(entry, dict) else []
+                    path = paths[0].get('path', '/') if paths and isinstance(paths[0], dict) else '/'
+                    if isinstance(host, str) and host:
+                        found.append((host, path))
+            else:
+                found.extend(find_ingress_hosts(value))
+    elif isinstance(values, list):
+        for item in values:
+            found.extend(find_ingress_hosts(item))
+    return found
+
+def build_targets(context):
+    """Targets as dicts with name, kind, host, port and path, in configuration order and without duplicates"""
+    https_port = 443 if 443 in context['ingress_ports'] else context['ingress_ports'][-1]
+    targets = [{'name': 'registry', 'kind': 'https', 'host': f"{context['registry_name']}.{context['local_domain']}",
+                'port': https_port, 'path': '/v2/'}]
+    for service in context['user_services']:
+        for host, path in find_ingress_hosts(service.get('base_values', {})):
+            if UNRESOLVED_VARIABLE.search(host):
+                continue
+            targets.append({'name': service['name'], 'kind': 'https', 'host': host, 'port': https_port, 'path': path})
+    for service in context['system_services']:
+        if not service.get('enabled', False):
+            continue
+        ports = service.get('ports') or ([service['default_port']] if service.get('default_port') else [])
+        for port in ports:
+            targets.append({'name': service['name'], 'kind': 'tcp', 'host': f"{service['name']}.{context['local_domain']}",
+                            'port': int(port), 'path': None})
+
+    unique = {}
+    for target in targets:
+        unique.setdefault((target['kind'], target['host'], target['port'], target['path']), target)
+    return list(unique.values())
+
+def make_ssl_context(cafile=None, insecure=False):
+    """TLS client context trusting the environment's root CA (and the system CAs)"""
+    context = ssl.create_default_context()
+    if cafile and os.path.exists(cafile):
+        context.load_verify_locations(cafile)
+    if insecure:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+async def send_request(target, ssl_context):
+    """One request on a new connection; returns the HTTP status (None for TCP targets)"""
+    kind = target['kind']
+    reader, writer = await asyncio.open_connection(
+        target['host'], target['port'],
+        ssl=ssl_context if kind == 'https' else None,
+        server_hostname=target['host'] if kind == 'https' else None,
+    )
+    try:
+        if kind == 'tcp':
+            return None
+        writer.write(f"GET {target.get('path') or '/'} HTTP/1.1\r\nHost: {target['host']}\r\n"
+                     f"User-Agent: k8s-env-loadgen\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        parts = status_line.split()
+        if len(parts) < 2 or not parts[0].startswith(b'HTTP/'):
+            raise ConnectionError(f"invalid response: {status_line[:40]!r}")
+        # Read the whole response, so a slow body counts towards the latency
+        while await reader.read(65536):
+            pass
+        return int(parts[1])
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (OSError, ssl.SSLError):
+            pass
+
+async def drive_target(target, rate, duration, concurrency, timeout, ssl_context):
+    """Send requests to a target at a fixed rate for a duration; returns the per-request samples"""
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(scheduled):
+        async with semaphore:
+            try:
+                status = await asyncio.wait_for(send_request(target, ssl_context), timeout)
+                # Server errors are failures; any other response shows the route works
+                error = f"HTTP {status}" if status is not None and status >= 500 else None
+            except asyncio.TimeoutError:
+                status, error = None, f"timed out after {timeout}s"
+            except (OSError, ssl.SSLError, ConnectionError) as e:
+                status, error = None, getattr(e, 'strerror', None) or str(e) or type(e).__name__
+        samples.append({'latency': loop.time() - scheduled, 'status': status, 'error': error})
+
+    start = loop.time()
+    requests = max(1, int(rate * duration))
+    tasks = []
+    for i in range(requests):
+        scheduled = start + i / rate
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(scheduled)))
+    await asyncio.gather(*tasks)
+    return samples, loop.time() - start
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+def summarize(target, samples, elapsed):
+    """Throughput, error counts and latency percentiles (in ms) of a target's samples"""
+    ok_latencies = sorted(sample['latency'] * 1000 for sample in samples if sample['error'] is None)
+    errors = Counter(sample['error'] for sample in samples if sample['error'] is not None)
+    statuses = Counter(str(sample['status']) for sample in samples if sample['status'] is not None)
+    result = dict(target, requests=len(samples), ok=len(ok_latencies), failed=sum(errors.values()),
+                  seconds=round(elapsed, 3), throughput=round(len(ok_latencies) / elapsed, 1) if elapsed else 0.0,
+                  statuses=dict(statuses), errors=dict(errors))
+    for p in PERCENTILES:
+        value = percentile(ok_latencies, p)
+        result[f"p{p}_ms"] = round(value, 1) if value is not None else None
+    result['max_ms'] = round(ok_latencies[-1], 1) if ok_latencies else None
+    return result
+
+async def run_all(targets, rate, duration, concurrency, timeout, ssl_context):
+    runs = await asyncio.gather(*(drive_target(target, rate, duration, concurrency, timeout, ssl_context)
+                                  for target in targets))
+    return [summarize(target, samples, elapsed) for target, (samples, elapsed) in zip(targets, runs)]
+
+def run(targets, rate=DEFAULT_RATE, duration=DEFAULT_DURATION, concurrency=DEFAULT_CONCURRENCY,
+        timeout=DEFAULT_TIMEOUT, ssl_context=None):
+    """Drive all targets at the same time; returns one summary per target, in target order"""
+    if not targets:
+        return []
+    return asyncio.run(run_all(targets, rate, duration, concurrency, timeout, ssl_context or make_ssl_context()))
+
+def format_ms(value):
+    return f"{value:.1f}" if value is not None else '-'
+
+def print_results(results):
+    header = f"  {'target':<44} {'req':>6} {'fail':>5} {'req/s':>7} " + \
+             ' '.join(f"{'p' + str(p):>7}" for p in PERCENTILES) + f" {'max':>7}"
+    print(header)
+    for result in results:
+        label = f"{result['kind']}://{result['host']}:{result['port']}{result['path'] or ''}"
+        print(f"  {label[:44]:<44} {result['requests']:>6} {result['failed']:>5} {result['throughput']:>7.1f} " +
+              ' '.join(f"{format_ms(result[f'p{p}_ms']):>7}" for p in PERCENTILES) + f" {format_ms(result['max_ms']):>7}")
+        for error, count in result['errors'].items():
+            print(f"      ❌ {count}x {error}")
+    print("  (latencies in ms, from the scheduled start of each request)")
+    if all(result['failed'] == 0 for result in results):
+        print("✅ All requests succeeded")
+    else:
+        print("❌ Some requests failed")
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Drive load through the environment's ingress and TCP routes")
+    parser.add_argument('config_file', nargs='?', help="path to k8s-env.yaml")
+    parser.add_argument('--targets-json', help="load these targets instead of the configured ones "
+                                               "(a JSON list of objects with name, kind, host, port and path)")
+    parser.add_argument('--only', action='append', metavar='NAME',
+                        help="only load targets of this service (repeatable; `registry` for the registry)")
+    parser.add_argument('--kind', choices=TARGET_KINDS, action='append', help="only load targets of this kind (repeatable)")
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f"requests per second for each target (default: {DEFAULT_RATE})")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION,
+                        help=f"seconds to send requests for (default: {DEFAULT_DURATION})")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"requests in flight per target (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f"seconds per request, including connecting (default: {DEFAULT_TIMEOUT})")
+    parser.add_argument('--cafile', help="CA bundle for HTTPS targets (default: the environment's root CA)")
+    parser.add_argument('--insecure', action='store_true', help="do not verify the certificates of HTTPS targets")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args(argv)
+    if not args.config_file and not args.targets_json:
+        parser.error("a config file or --targets-json is required")
+    if args.rate <= 0 or args.duration <= 0 or args.concurrency <= 0:
+        parser.error("--rate, --duration and --concurrency must be positive")
+    return args
+
+def main(argv):
+    args = parse_args(argv)
+    cafile = args.cafile
+
+    if args.targets_json:
+        targets = json.loads(args.targets_json)
+        for target in targets:
+            if target.get('kind', 'tcp') not in TARGET_KINDS:
+                print(f"❌ Unknown target kind '{target['kind']}'; expected one of: {', '.join(TARGET_KINDS)}")
+                return 1
+            target.setdefault('kind', 'tcp')
+            target.setdefault('name', target['host'])
+            target.setdefault('path', None if target['kind'] == 'tcp' else '/')
+    else:
+        from generate_configs import load_config, prepare_context
+        # Keep the generator's messages out of the JSON output
+        with redirect_stdout(sys.stderr if args.json else sys.stdout):
+            context = prepare_context(load_config(args.config_file))
+        targets = build_targets(context)
+        cafile = cafile or context['root_ca_path']
+
+    targets = [target for target in targets
+               if (not args.only or target['name'] in args.only) and (not args.kind or target['kind'] in args.kind)]
+    if not targets:
+        print("❌ No targets to load")
+        return 1
+    if not args.json:
+        print(f"🚀 Sending {args.rate:g} requests/s to each of {len(targets)} targets for {args.duration:g}s...")
+
+    results = run(targets, args.rate, args.duration, args.concurrency, args.timeout,
+                  make_ssl_context(cafile, args.insecure))
+    ok = all(result['failed'] == 0 for result in results)
+    if args.json:
+        print(json.dumps({'ok': ok, 'rate': args.rate, 'duration': args.duration, 'results': results}, indent=2))
+    else:
+        print_results(results)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Preflight checks that run before an environment is created, so create-env fails in about a second instead
+of minutes into kind or helm.
+
+The configuration is validated in one pass: required settings and internal-components versions, duplicate
+service names, repo.ref entries that do not resolve, service ports that clash with the ingress ports, the
+API port or each other, and everything prepare_context() rejects. The host checks run concurrently:
+
+- ports:        every host port of cluster.yaml's extraPortMappings, the API server and the image cache mirrors
+                can be bound (skipped when the cluster's containers already exist)
+- dns:          port 53 for the dnsmasq container (skipped when it already exists)
+- runtime:      the container runtime answers, within a timeout
+- tools:        the provider and the tools of later phases are installed
+- disk:         free space under base-dir
+- certificates: the wildcard certificate and root CA exist, or mkcert is installed to create them
+
+Usage:
+    python3 preflight.py k8s-env.yaml            # all checks; exits 1 when any of them fails
+    python3 preflight.py k8s-env.yaml --json     # one JSON document with every check result
+    python3 preflight.py k8s-env.yaml --no-host  # configuration checks only
+"""
+import io
+import os
+import sys
+import json
+import time
+import errno
+import shutil
+import socket
+import argparse
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+from generate_configs import (
+    ANY_ADDRESS, build_task_vars, get_base_dir, get_internal_component, get_k8s_dir, get_published_ports,
+    load_config, prepare_context,
+)
+from k8s_runtime import ClusterRuntime
+
+# Settings create-env cannot do without, as paths under `environment`
+REQUIRED_SETTINGS = [
+    ('name',), ('base-dir',), ('local-domain',), ('local-ip',), ('local-lb-ports',),
+    ('kubernetes', 'api-port'), ('provider', 'name'), ('provider', 'runtime'), ('registry', 'name'),
+]
+
+# internal-components entries used by the templates and tasks; metrics-server only when it is deployed
+REQUIRED_COMPONENTS = ['app-template', 'traefik', 'registry', 'dnsmasq']
+
+# start-dnsmasq publishes the DNS container on this host port (TCP and UDP)
+DNSMASQ_HOST_PORT = 53
+
+# Tools the create-env phases run, besides the provider
+REQUIRED_TOOLS = ['kubectl', 'helmfile', 'mkcert']
+
+DEFAULT_MIN_FREE_GIB = 10
+DEFAULT_TIMEOUT = 5.0
+
+def result(check, status, message):
+    return {'check': check, 'status': status, 'message': message}
+
+def get_setting(env, path):
+    value = env
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+def check_config(config):
+    """Static checks of k8s-env.yaml that prepare_context() does not make, or only makes one at a time"""
+    env = (config or {}).get('environment')
+    if not isinstance(env, dict):
+        return [result('config', 'error', "the config has no `environment` section")]
+    results = []
+
+    missing = ['.'.join(path) for path in REQUIRED_SETTINGS if get_setting(env, path) in (None, '')]
+    if missing:
+        results.append(result('config', 'error', f"missing settings: {', '.join(missing)}"))
+
+    components = list(REQUIRED_COMPONENTS)
+    if env.get('enable-metrics-server', True):
+        components.append('metrics-server')
+    missing = [name for name in components if not get_internal_component(env, name)]
+    if missing:
+        results.append(result('config', 'error', f"missing internal-components versions: {', '.join(missing)}"))
+
+    services_config = env.get('services') or {}
+    services = [service for kind in ('system', 'user') for service in services_config.get(kind) or []]
+    duplicates = [name for name, count in Counter(service.get('name') for service in services).items() if count > 1]
+    if duplicates:
+        results.append(result('config', 'error', f"duplicate service names: {', '.join(map(str, duplicates))}"))
+
+    repositories = {repo.get('name') for repo in env.get('helm-repositories') or [] if isinstance(repo, dict)}
+    for service in services:
+        repo = (service.get('config') or {}).get('repo') or {}
+        if service.get('enabled') and isinstance(repo, dict) and 'ref' in repo and repo['ref'] not in repositories:
+            results.append(result('config', 'error', f"service '{service.get('name')}' references helm repository "
+                                                     f"'{repo['ref']}', which is not in helm-repositories"))
+
+    # Every service port becomes a Traefik entry point and a host port next to the ingress ports
+    reserved = {int(port): 'an ingress port (local-lb-ports)' for port in env.get('local-lb-ports') or []}
+    api_port = get_setting(env, ('kubernetes', 'api-port'))
+    if api_port:
+        reserved[int(api_port)] = 'the Kubernetes API port'
+    for service in services:
+        if not service.get('enabled'):
+            continue
+        for port in service.get('ports') or []:
+            if int(port) in reserved:
+                results.append(result('config', 'error', f"port {port} of service '{service.get('name')}' "
+                                                         f"clashes with {reserved[int(port)]}"))
+            else:
+                reserved[int(port)] = f"service '{service.get('name')}'"
+    return results
+
+def check_context(config):
+    """Run prepare_context() as the generator would; returns the context (None when it fails) and the results"""
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            context = prepare_context(config)
+    except Exception as e:
+        return None, [result('config', 'error', f"{type(e).__name__}: {e}")]
+    # The generator reports unresolved variables and similar problems as warnings
+    warnings = [line.strip().lstrip('⚠️').strip() for line in output.getvalue().splitlines() if '⚠️' in line]
+    return context, [result('config', 'warn', warning) for warning in warnings]
+
+def probe_port(address, port, kind=socket.SOCK_STREAM):
+    """Why a host port cannot be published (None when it is free, '' when it cannot be told)"""
+    with socket.socket(socket.AF_INET, kind) as sock:
+        # Like the runtime's port proxy, so connections in TIME_WAIT do not count as in use
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind((address, port))
+            return None
+        except PermissionError:
+            pass
+        except OSError as e:
+            if e.errno == errno.EADDRINUSE:
+                return "already in use"
+            if e.errno == errno.EADDRNOTAVAIL:
+                return f"{address} is not an address of this host"
+            return e.strerror or str(e)
+    # Privileged ports cannot be bound without root; a listener that accepts a connection still shows a clash
+    if kind != socket.SOCK_STREAM:
+        return ''
+    try:
+        with socket.create_connection(('127.0.0.1' if address == ANY_ADDRESS else address, port), timeout=0.2):
+            return "already in use"
+    except ConnectionRefusedError:
+        return None
+    except OSError:
+        return ''
+
+def check_ports(context, containers):
+    if any(container['role'] in ('control-plane', 'worker') for container in containers):
+        return [result('ports', 'ok', "the cluster already exists, its ports are not checked")]
+    mirrors_exist = any(container['role'] == 'mirror' for container in containers)
+    results = []
+    unchecked = []
+    for published in get_published_ports(context):
+        if mirrors_exist and published['what'].endswith(' mirror'):
+            continue
+        problem = probe_port(published['address'], published['port'])
+        if problem:
+            results.append(result('ports', 'error', f"host port {published['address']}:{published['port']} "
+                                                    f"({published['what']}): {problem}"))
+        elif problem == '':
+            unchecked.append(str(published['port']))
+    if unchecked:
+        results.append(result('ports', 'warn', f"could not check privileged ports {', '.join(unchecked)}"))
+    if not results:
+        results.append(result('ports', 'ok', f"{len(get_published_ports(context))} host ports are free"))
+    return results
+
+def check_dns(containers):
+    if any(container['role'] == 'dns' for container in containers):
+        return [result('dns', 'ok', "the DNS container already exists")]
+    results = []
+    for kind, protocol in ((socket.SOCK_STREAM, 'TCP'), (socket.SOCK_DGRAM, 'UDP')):
+        problem = probe_port(ANY_ADDRESS, DNSMASQ_HOST_PORT, kind)
+        if problem:
+            results.append(result('dns', 'error', f"{protocol} port {DNSMASQ_HOST_PORT} for dnsmasq: {problem} "
+                                                  f"(a local resolver such as systemd-resolved's stub listener?)"))
+        elif problem == '':
+            results.append(result('dns', 'warn', f"could not check {protocol} port {DNSMASQ_HOST_PORT} for dnsmasq"))
+    return results or [result('dns', 'ok', f"port {DNSMASQ_HOST_PORT} is free for dnsmasq")]
+
+def check_tools(config):
+    provider = build_task_vars(config)['PROVIDER_BINARY']
+    missing = [tool for tool in [provider] + REQUIRED_TOOLS if not shutil.which(tool)]
+    if missing:
+        return [result('tools', 'error', f"not installed: {', '.join(missing)} (run `task check-deps`)")]
+    return [result('tools', 'ok', f"{provider} and {', '.join(REQUIRED_TOOLS)} are installed")]
+
+def check_disk(config, min_free_gib):
+    # base-dir may not exist yet; its nearest existing parent is on the same filesystem
+    path = os.path.abspath(get_base_dir(config['environment']))
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    free_gib = shutil.disk_usage(path).free / 1024 ** 3
+    if free_gib < min_free_gib:
+        return [result('disk', 'error', f"{free_gib:.1f}GiB free under {path}, at least {min_free_gib}GiB needed "
+                                        f"for node images, volumes and service data")]
+    return [result('disk', 'ok', f"{free_gib:.1f}GiB free under {path}")]
+
+def check_certificates(config):
+    env = config['environment']
+    cert_dir = os.path.join(get_k8s_dir(env), 'certs')
+    files = [os.path.join(cert_dir, name) for name in
+             ('rootCA.pem', f"{env['local-domain']}.pem", f"{env['local-domain']}-key.pem")]
+    missing = [path for path in files if not os.path.exists(path)]
+    if not missing:
+        return [result('certificates', 'ok', f"wildcard certificate and root CA are in {cert_dir}")]
+    if shutil.which('mkcert'):
+        return [result('certificates', 'ok', "certificates will be created with mkcert")]
+    return [result('certificates', 'error', f"{', '.join(os.path.basename(path) for path in missing)} missing "
+                                            f"in {cert_dir} and mkcert is not installed")]
+
+def run_checks(config_file, host_checks=True, min_free_gib=DEFAULT_MIN_FREE_GIB, timeout=DEFAULT_TIMEOUT):
+    """All check results, in check order"""
+    try:
+        config = load_config(config_file)
+    except Exception as e:
+        return [result('config', 'error', f"cannot read {config_file}: {e}")]
+    try:
+        results = check_config(config)
+    except (TypeError, ValueError, AttributeError) as e:
+        results = [result('config', 'error', f"invalid configuration: {e}")]
+    if any(entry['status'] == 'error' for entry in results):
+        # prepare_context() would only fail on the first of these problems
+        context = None
+    else:
+        context, context_results = check_context(config)
+        results += context_results
+    if not host_checks or 'environment' not in (config or {}):
+        return results
+
+    def guarded(name, check, *args):
+        try:
+            return check(*args)
+        except Exception as e:
+            return [result(name, 'error', f"{type(e).__name__}: {e}")]
+
+    # The runtime answers first; the port and DNS checks need to know which containers already exist
+    def runtime_and_ports():
+        try:
+            containers = ClusterRuntime(config).list_containers(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return [result('runtime', 'error', f"the container runtime did not answer within {timeout}s")]
+        except (RuntimeError, OSError) as e:
+            return [result('runtime', 'error', f"the container runtime is not reachable: {e}")]
+        checks = [result('runtime', 'ok', f"{build_task_vars(config)['RUNTIME_BINARY']} is running")]
+        if context:
+            checks += guarded('ports', check_ports, context, containers)
+        checks += guarded('dns', check_dns, containers)
+        return checks
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(runtime_and_ports),
+            executor.submit(guarded, 'tools', check_tools, config),
+            executor.submit(guarded, 'disk', check_disk, config, min_free_gib),
+            executor.submit(guarded, 'certificates', check_certificates, config),
+        ]
+        for future in futures:
+            results += future.result()
+    return results
+
+STATUS_ICONS = {'ok': '✅', 'warn': '⚠️ ', 'error': '❌'}
+
+def print_results(results):
+    for entry in results:
+        print(f"  {STATUS_ICONS[entry['status']]} {entry['check']}: {entry['message']}")
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Check the configuration and the host before creating an environment")
+    parser.add_argument('config_file', help="path to k8s-env.yaml")
+    parser.add_argument('--no-host', action='store_true', help="only check the configuration")
+    parser.add_argument('--min-free-gib', type=float, default=DEFAULT_MIN_FREE_GIB,
+                        help=f"free disk space needed under base-dir (default: {DEFAULT_MIN_FREE_GIB})")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f"seconds to wait for the container runtime (default: {DEFAULT_TIMEOUT})")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    start = time.monotonic()
+    if not args.json:
+        print("🔍 Running preflight checks...")
+    results = run_checks(args.config_file, not args.no_host, args.min_free_gib, args.timeout)
+    ok = not any(entry['status'] == 'error' for entry in results)
+    seconds = round(time.monotonic() - start, 3)
+    if args.json:
+        print(json.dumps({'ok': ok, 'seconds': seconds, 'results': results}, indent=2))
+    else:
+        print_results(results)
+        print(f"  ⏱️  {seconds}s")
+        print("✅ Preflight checks passed" if ok else "❌ Preflight checks failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Concurrent TCP reachability checks for the services of the local environment.
+
+The targets (system service ports, the default ports of `service_ports` for services without explicit
+ports, and the registry ingress) are built from prepare_context() and all of them are probed at the same
+time with asyncio, with retries and exponential backoff, so a run takes about as long as the slowest
+target instead of the sum of all of them. The in-cluster check runs this same script once inside a
+single pod, with the targets passed on the command line.
+
+The probing part only uses the standard library, so it also runs in a plain python image.
+
+Usage:
+    python3 probe.py k8s-env.yaml external         # from the local machine
+    python3 probe.py k8s-env.yaml internal         # from a pod inside the cluster
+    python3 probe.py k8s-env.yaml external --json  # one JSON document with per-target results
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from contextlib import redirect_stdout
+
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_ATTEMPTS = 3
+DEFAULT_BACKOFF = 0.5
+
+# Image of the in-cluster prober pod; it only needs a python interpreter
+DEFAULT_PROBE_IMAGE = 'python:3.12-alpine'
+PROBE_POD_NAME = 'k8s-env-probe'
+
+def build_targets(context):
+    """Targets as dicts with name, host and port, in configuration order and without duplicates"""
+    targets = []
+    for service in context['system_services']:
+        if not service.get('enabled', False):
+            continue
+        ports = service.get('ports') or ([service['default_port']] if service.get('default_port') else [])
+        for port in ports:
+            targets.append({'name': service['name'], 'host': f"{service['name']}.{context['local_domain']}", 'port': int(port)})
+    targets.append({'name': 'registry', 'host': f"{context['registry_name']}.{context['local_domain']}", 'port': 443})
+
+    unique = {}
+    for target in targets:
+        unique.setdefault((target['host'], target['port']), target)
+    return list(unique.values())
+
+async def probe_target(target, timeout=DEFAULT_TIMEOUT, attempts=DEFAULT_ATTEMPTS, backoff=DEFAULT_BACKOFF):
+    """Open a TCP connection to a target, retrying with exponential backoff; returns the target with its result"""
+    error = None
+    for attempt in range(1, attempts + 1):
+        start = time.monotonic()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(target['host'], target['port']), timeout)
+            latency = (time.monotonic() - start) * 1000
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+            return dict(target, ok=True, latency_ms=round(latency, 1), attempts=attempt, error=None)
+        except asyncio.TimeoutError:
+            error = f"timed out after {timeout}s"
+        except OSError as e:
+            error = e.strerror or str(e)
+        if attempt < attempts:
+            await asyncio.sleep(backoff * 2 ** (attempt - 1))
+    return dict(target, ok=False, latency_ms=None, attempts=attempts, error=error)
+
+async def probe_all(targets, timeout=DEFAULT_TIMEOUT, attempts=DEFAULT_ATTEMPTS, backoff=DEFAULT_BACKOFF):
+    return await asyncio.gather(*(probe_target(target, timeout, attempts, backoff) for target in targets))
+
+def probe(targets, timeout=DEFAULT_TIMEOUT, attempts=DEFAULT_ATTEMPTS, backoff=DEFAULT_BACKOFF):
+    """Probe all targets concurrently; returns one result per target, in target order"""
+    return asyncio.run(probe_all(targets, timeout, attempts, backoff)) if targets else []
+
+def print_results(results, where):
+    for result in results:
+        if result['ok']:
+            retried = f", {result['attempts']} attempts" if result['attempts'] > 1 else ''
+            print(f"  ✅ {result['host']} is reachable on port {result['port']} ({result['latency_ms']}ms{retried})")
+        else:
+            print(f"  ❌ {result['host']} is NOT reachable on port {result['port']} ({result['error']})")
+    if all(result['ok'] for result in results):
+        print(f"✅ All services are reachable from {where}")
+    else:
+        print(f"❌ Some services are not reachable from {where}")
+
+def delete_probe_pod(kubeconfig, wait=True):
+    subprocess.run(['kubectl', '--kubeconfig', kubeconfig, 'delete', 'pod', PROBE_POD_NAME, '--namespace', 'default',
+                    '--ignore-not-found', f"--wait={'true' if wait else 'false'}"], capture_output=True, timeout=60)
+
+def probe_in_cluster(kubeconfig, targets, args):
+    """
+    Run this script in one short-lived pod, reading it from stdin, and return its results.
+    Returns None when the pod could not be run.
+    """
+    with open(os.path.abspath(__file__)) as f:
+        script = f.read()
+    command = [
+        'kubectl', '--kubeconfig', kubeconfig, 'run', PROBE_POD_NAME, '--namespace', 'default',
+        '--image', args.image, '--restart', 'Never', '--rm', '-i', '--quiet', '--command', '--',
+        'python3', '-', '--targets-json', json.dumps(targets), '--json',
+        '--timeout', str(args.timeout), '--attempts', str(args.attempts), '--backoff', str(args.backoff),
+    ]
+    try:
+        # A leftover pod from an interrupted run would make `kubectl run` fail
+        delete_probe_pod(kubeconfig)
+        result = subprocess.run(command, input=script, capture_output=True, text=True,
+                                timeout=args.pod_timeout)
+    except subprocess.TimeoutExpired:
+        print(f"❌ Probe pod failed: no result within {args.pod_timeout}s (see --pod-timeout)")
+        # kubectl run --rm is killed with the timeout, so the pod would be left behind
+        try:
+            delete_probe_pod(kubeconfig, wait=False)
+        except (subprocess.TimeoutExpired, OSError):
+            pass
+        return None
+    except OSError as e:
+        print(f"❌ Probe pod failed: {e}")
+        return None
+    try:
+        # kubectl may print its own messages around the script's JSON output
+        output = result.stdout[result.stdout.index('{'):result.stdout.rindex('}') + 1]
+        return json.loads(output)['results']
+    except ValueError:
+        print(f"❌ Probe pod failed: {(result.stderr or result.stdout).strip()}")
+        return None
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Check that the environment's services are reachable")
+    parser.add_argument('config_file', nargs='?', help="path to k8s-env.yaml")
+    parser.add_argument('where', nargs='?', choices=['external', 'internal'], default='external',
+                        help="probe from the local machine (default) or from a pod inside the cluster")
+    parser.add_argument('--targets-json', help="probe these targets instead of the configured ones (used inside the pod)")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f"seconds per connection attempt (default: {DEFAULT_TIMEOUT})")
+    parser.add_argument('--attempts', type=int, default=DEFAULT_ATTEMPTS,
+                        help=f"connection attempts per target (default: {DEFAULT_ATTEMPTS})")
+    parser.add_argument('--backoff', type=float, default=DEFAULT_BACKOFF,
+                        help=f"seconds before the first retry, doubled for each further one (default: {DEFAULT_BACKOFF})")
+    parser.add_argument('--image', default=DEFAULT_PROBE_IMAGE,
+                        help=f"image of the in-cluster prober pod (default: {DEFAULT_PROBE_IMAGE})")
+    parser.add_argument('--pod-timeout', type=int, default=180,
+                        help="seconds to wait for the in-cluster prober pod, including its image pull (default: 180)")
+    args = parser.parse_args(argv)
+    if not args.config_file and not args.targets_json:
+        parser.error("a config file or --targets-json is required")
+    return args
+
+def main(argv):
+    args = parse_args(argv)
+    start = time.monotonic()
+
+    if args.targets_json:
+        targets = json.loads(args.targets_json)
+        where = 'here'
+        results = probe(targets, args.timeout, args.attempts, args.backoff)
+    else:
+        from generate_configs import load_config, prepare_context
+        # Keep the generator's messages out of the JSON output
+        with redirect_stdout(sys.stderr if args.json else sys.stdout):
+            context = prepare_context(load_config(args.config_file))
+        targets = build_targets(context)
+        if args.where == 'internal':
+            where = 'inside the cluster'
+            if not args.json:
+                print(f"🔍 Probing {len(targets)} targets from a pod inside the cluster...")
+            results = probe_in_cluster(os.path.join(context['k8s_dir'], 'kubeconfig'), targets, args)
+            if results is None:
+                return 1
+        else:
+            where = 'the local machine'
+            if not args.json:
+                print(f"🔍 Probing {len(targets)} targets from the local machine...")
+            results = probe(targets, args.timeout, args.attempts, args.backoff)
+
+    ok = all(result['ok'] for result in results)
+    if args.json:
+        print(json.dumps({'where': where, 'ok': ok, 'seconds': round(time.monotonic() - start, 3), 'results': results},
+                         indent=2))
+    else:
+        print_results(results, where)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
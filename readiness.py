@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Event-driven readiness checks for the local cluster.
+
+Instead of sleeping or blocking on one object at a time, one streaming
+`kubectl get <resource> --watch -o json` is started per resource type (nodes, pods, endpoints)
+and every condition is re-evaluated whenever one of the watched objects changes. The wait ends
+as soon as all conditions hold; while waiting, the objects that hold things up are reported.
+
+Usage:
+    python3 readiness.py k8s-env.yaml wait --nodes                             # all nodes Ready
+    python3 readiness.py k8s-env.yaml wait --pod default/netcat-internal-test  # one pod Ready
+    python3 readiness.py k8s-env.yaml wait --pods registry --endpoints default # every pod / endpoint in a namespace
+    python3 readiness.py k8s-env.yaml wait --releases --timeout 300            # pods and endpoints of all helm releases
+"""
+import os
+import sys
+import json
+import time
+import queue
+import codecs
+import argparse
+import threading
+import subprocess
+
+import yaml
+
+# Seconds between reports of the objects that are still not ready
+REPORT_INTERVAL = 10
+
+# Seconds before a watch whose kubectl exited (e.g. API server not up yet) is restarted
+WATCH_RETRY_DELAY = 1
+
+def object_key(obj):
+    metadata = obj.get('metadata', {})
+    return metadata.get('namespace', ''), metadata.get('name', '')
+
+def get_condition(obj, condition_type):
+    return next((condition for condition in obj.get('status', {}).get('conditions', [])
+                 if condition.get('type') == condition_type), None)
+
+def node_blocker(node):
+    """Why a node is not ready, or None when it is"""
+    ready = get_condition(node, 'Ready')
+    if ready and ready.get('status') == 'True':
+        return None
+    reason = (ready or {}).get('reason') or 'no Ready condition yet'
+    return f"node/{node['metadata']['name']}: {reason}"
+
+def pod_blocker(pod):
+    """Why a pod is not ready, or None when it is; completed pods count as ready"""
+    namespace, name = object_key(pod)
+    status = pod.get('status', {})
+    phase = status.get('phase', 'Pending')
+    if phase == 'Succeeded':
+        return None
+    ready = get_condition(pod, 'Ready')
+    if ready and ready.get('status') == 'True':
+        return None
+
+    # Report the most specific reason available: a waiting container, then scheduling, then the phase
+    for container in status.get('initContainerStatuses', []) + status.get('containerStatuses', []):
+        waiting = container.get('state', {}).get('waiting')
+        if waiting and waiting.get('reason'):
+            return f"pod/{namespace}/{name}: {container['name']} {waiting['reason']}"
+    scheduled = get_condition(pod, 'PodScheduled')
+    if scheduled and scheduled.get('status') == 'False':
+        return f"pod/{namespace}/{name}: unschedulable ({scheduled.get('message', '')[:80]})"
+    return f"pod/{namespace}/{name}: {phase}"
+
+def endpoints_blocker(endpoints):
+    """An Endpoints object blocks while it only has not-ready addresses"""
+    namespace, name = object_key(endpoints)
+    subsets = endpoints.get('subsets') or []
+    ready = sum(len(subset.get('addresses') or []) for subset in subsets)
+    not_ready = sum(len(subset.get('notReadyAddresses') or []) for subset in subsets)
+    if not_ready and not ready:
+        return f"endpoints/{namespace}/{name}: {not_ready} address(es) not ready"
+    return None
+
+def is_job_pod(pod):
+    return any(owner.get('kind') == 'Job' for owner in pod['metadata'].get('ownerReferences', []))
+
+def nodes_ready(count=0):
+    """Condition: at least `count` nodes are registered and all of them are Ready"""
+    def check(objects):
+        blockers = [blocker for blocker in map(node_blocker, objects.values()) if blocker]
+        if len(objects) < count:
+            blockers.append(f"nodes: {len(objects)} of {count} registered")
+        return blockers
+    return 'nodes', None, check
+
+def pods_ready(namespace, name=None):
+    """
+    Condition: the named pod, or every pod of the namespace (at least one), is Ready.
+    Terminating pods and failed Job pods, which are replaced, are ignored.
+    """
+    def check(objects):
+        if name:
+            pod = objects.get((namespace, name))
+            return [f"pod/{namespace}/{name}: not created yet"] if pod is None else list(filter(None, [pod_blocker(pod)]))
+        pods = [pod for (pod_namespace, _), pod in objects.items() if pod_namespace == namespace
+                and not pod['metadata'].get('deletionTimestamp')
+                and not (pod.get('status', {}).get('phase') == 'Failed' and is_job_pod(pod))]
+        if not pods:
+            return [f"pods/{namespace}: no pods yet"]
+        return [blocker for blocker in map(pod_blocker, pods) if blocker]
+    return 'pods', namespace, check
+
+def endpoints_ready(namespace, name=None):
+    """Condition: the named Endpoints object has a ready address, or no Endpoints of the namespace waits on one"""
+    def check(objects):
+        if name:
+            endpoints = objects.get((namespace, name))
+            if endpoints is None:
+                return [f"endpoints/{namespace}/{name}: not created yet"]
+            if not any(subset.get('addresses') for subset in endpoints.get('subsets') or []):
+                return [endpoints_blocker(endpoints) or f"endpoints/{namespace}/{name}: no addresses"]
+            return []
+        in_namespace = [endpoints for (endpoints_namespace, _), endpoints in objects.items()
+                        if endpoints_namespace == namespace]
+        if not in_namespace:
+            return [f"endpoints/{namespace}: none yet"]
+        return [blocker for blocker in map(endpoints_blocker, in_namespace) if blocker]
+    return 'endpoints', namespace, check
+
+def release_namespaces(k8s_dir):
+    """Namespaces of the releases in the generated helmfile.yaml"""
+    with open(os.path.join(k8s_dir, 'config', 'helmfile.yaml')) as f:
+        helmfile = yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader)) or {}
+    return sorted({release.get('namespace', 'default') for release in helmfile.get('releases') or []})
+
+class ResourceWatch:
+    """
+    One `kubectl get --watch` stream for a resource type. Decoded objects are put on a shared queue
+    as (resource, batch) tuples; a batch is everything decoded from one read, so the initial listing
+    mostly arrives at once. kubectl is restarted when it exits, with a `reset` batch (None) first.
+    """
+    def __init__(self, kubeconfig, resource, namespace, events):
+        self.command = ['kubectl', '--kubeconfig', kubeconfig, 'get', resource, '--watch',
+                        '--output-watch-events', '-o', 'json']
+        if resource != 'nodes':
+            self.command += ['--namespace', namespace] if namespace else ['--all-namespaces']
+        self.resource = resource
+        self.events = events
+        self.process = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+
+    def run(self):
+        decoder = json.JSONDecoder()
+        while not self.stopped.is_set():
+            try:
+                self.process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            except OSError as error:
+                print(f"  ⚠️  Warning: cannot watch {self.resource}: {error}")
+                return
+            self.events.put((self.resource, None))
+            text = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            buffer = ''
+            while True:
+                chunk = os.read(self.process.stdout.fileno(), 65536)
+                if not chunk:
+                    break
+                buffer += text.decode(chunk)
+                batch = []
+                while True:
+                    buffer = buffer.lstrip()
+                    try:
+                        item, offset = decoder.raw_decode(buffer)
+                    except ValueError:
+                        break
+                    batch.append(item)
+                    buffer = buffer[offset:]
+                if batch:
+                    self.events.put((self.resource, batch))
+            self.process.wait()
+            self.stopped.wait(WATCH_RETRY_DELAY)
+
+def apply_event(objects, item):
+    """Apply one watch event (or a bare object / list, from kubectl without watch events) to the object store"""
+    if 'object' in item and 'type' in item:
+        event_type, obj = item['type'], item['object']
+    else:
+        event_type, obj = 'MODIFIED', item
+    if obj.get('kind', '').endswith('List'):
+        for child in obj.get('items', []):
+            apply_event(objects, child)
+    elif event_type == 'DELETED':
+        objects.pop(object_key(obj), None)
+    elif event_type != 'ERROR':
+        objects[object_key(obj)] = obj
+
+def format_blockers(blockers, limit=5):
+    shown = ', '.join(blockers[:limit])
+    return shown + (f" and {len(blockers) - limit} more" if len(blockers) > limit else '')
+
+def wait_for(kubeconfig, conditions, timeout=180, report_interval=REPORT_INTERVAL):
+    """
+    Wait until every (resource, namespace, check) condition reports no blockers, watching each resource type once.
+    Returns True when ready, False on timeout (after printing what was still not ready).
+    """
+    if not conditions:
+        return True
+    deadline = time.monotonic() + timeout
+    events = queue.Queue()
+    namespaces = {}
+    for resource, namespace, _ in conditions:
+        namespaces.setdefault(resource, set()).add(namespace)
+    stores = {resource: {} for resource in namespaces}
+
+    # A single namespace is watched directly, anything else across all namespaces
+    watches = []
+    for resource, resource_namespaces in namespaces.items():
+        namespace = next(iter(resource_namespaces)) if len(resource_namespaces) == 1 else None
+        watches.append(ResourceWatch(kubeconfig, resource, namespace, events))
+    for watch in watches:
+        watch.start()
+
+    blockers = ['no data yet']
+    next_report = time.monotonic() + report_interval
+    try:
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                print(f"  ⚠️  Warning: not ready after {timeout}s: {format_blockers(blockers, limit=20)}")
+                return False
+            if now >= next_report:
+                print(f"  ⏳ Waiting for {format_blockers(blockers)}")
+                next_report = now + report_interval
+            try:
+                resource, batch = events.get(timeout=max(0.1, min(deadline, next_report) - now))
+            except queue.Empty:
+                continue
+            if batch is None:
+                stores[resource].clear()
+                continue
+            for item in batch:
+                apply_event(stores[resource], item)
+            blockers = [blocker for watched, _, check in conditions for blocker in check(stores[watched])]
+            if not blockers:
+                return True
+    finally:
+        for watch in watches:
+            watch.stop()
+
+def parse_reference(reference):
+    """NAMESPACE/NAME, or NAME in the default namespace"""
+    namespace, _, name = reference.rpartition('/')
+    return namespace or 'default', name
+
+def build_conditions(args, k8s_dir, node_count=0):
+    conditions = []
+    if args.nodes:
+        conditions.append(nodes_ready(node_count))
+    namespaces = release_namespaces(k8s_dir) if args.releases else []
+    conditions += [pods_ready(namespace) for namespace in args.pods + namespaces]
+    conditions += [endpoints_ready(namespace) for namespace in args.endpoints + namespaces]
+    conditions += [pods_ready(*parse_reference(reference)) for reference in args.pod]
+    conditions += [endpoints_ready(*parse_reference(reference)) for reference in args.endpoint]
+    return conditions
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Wait for cluster objects to become ready")
+    parser.add_argument('config_file', help="path to k8s-env.yaml")
+    parser.add_argument('action', choices=['wait'])
+    parser.add_argument('--nodes', action='store_true', help="all nodes of the configuration are registered and Ready")
+    parser.add_argument('--pod', action='append', default=[], metavar='NAMESPACE/NAME', help="a pod is Ready")
+    parser.add_argument('--pods', action='append', default=[], metavar='NAMESPACE',
+                        help="every pod of a namespace is Ready")
+    parser.add_argument('--endpoint', action='append', default=[], metavar='NAMESPACE/NAME',
+                        help="a service's Endpoints have a ready address")
+    parser.add_argument('--endpoints', action='append', default=[], metavar='NAMESPACE',
+                        help="no Endpoints of a namespace is waiting on a not-ready pod")
+    parser.add_argument('--releases', action='store_true',
+                        help="pods and endpoints of the namespaces of all helm releases are ready")
+    parser.add_argument('--timeout', type=int, default=180, help="seconds to wait (default: 180)")
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+
+    from generate_configs import load_config, build_task_vars
+    task_vars = build_task_vars(load_config(args.config_file))
+    k8s_dir = task_vars['K8S_DIR']
+    node_count = int(task_vars['SERVERS']) + int(task_vars['WORKERS'])
+
+    start = time.monotonic()
+    ok = wait_for(os.path.join(k8s_dir, 'kubeconfig'), build_conditions(args, k8s_dir, node_count), args.timeout)
+    if ok:
+        print(f"✅ Ready after {time.monotonic() - start:.1f}s")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
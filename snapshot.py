@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Warm snapshots of the local cluster, for restoring it in seconds instead of re-creating it.
+
+A snapshot holds:
+  - one image per kind container (`<runtime> commit`), plus an archive of each container's anonymous
+    volumes (kind keeps /var, i.e. containerd's images and etcd's data, on one), and its run settings
+  - an archive of the host side of the environment: the storage and logs mounts of prepare_context(),
+    the certificates, the generated configuration, the kubeconfig and the stored credentials
+and is keyed by a hash of the rendered configuration files. It is stored in <base-dir>/.snapshots/<name>,
+so it survives destroy-env, and only the latest snapshot of an environment is kept.
+
+Usage:
+    python3 snapshot.py k8s-env.yaml capture        # snapshot the running environment (briefly stops the nodes)
+    python3 snapshot.py k8s-env.yaml check          # exit 0 when the snapshot matches the current configuration
+    python3 snapshot.py k8s-env.yaml restore-files  # restore the host side of the environment
+    python3 snapshot.py k8s-env.yaml restore-nodes  # re-create the node containers and wait until they are ready
+    python3 snapshot.py k8s-env.yaml show
+    python3 snapshot.py k8s-env.yaml delete
+"""
+import os
+import sys
+import copy
+import json
+import shutil
+import tarfile
+import hashlib
+import argparse
+from datetime import datetime
+
+from generate_configs import (
+    load_config, prepare_context, render_all, get_base_dir, get_k8s_dir, warm_up,
+    write_file_atomic, CREDENTIALS_FILE, APPLIED_RELEASES_FILE,
+)
+from k8s_runtime import ClusterRuntime, run
+
+SNAPSHOTS_DIR = '.snapshots'
+MANIFEST_FILE = 'manifest.json'
+HOST_ARCHIVE = 'host.tar'
+IMAGE_REPOSITORY = 'k8s-env-snapshot'
+
+# Entries of the environment directory restored along with the storage and logs mounts
+STATE_ENTRIES = ['certs', 'config', 'kubeconfig', CREDENTIALS_FILE, APPLIED_RELEASES_FILE, 'service-secrets.txt']
+
+# Container roles created by kind; the dnsmasq and mirror containers are re-created by their own tasks
+KIND_ROLES = ('control-plane', 'worker', 'external-load-balancer')
+
+def get_snapshot_dir(env):
+    return os.path.abspath(os.path.join(get_base_dir(env), SNAPSHOTS_DIR, env['name']))
+
+def load_manifest(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def config_hash(context):
+    """Hash of the configuration files rendered from a context"""
+    rendered = render_all(context)
+    digest = hashlib.sha256()
+    for path in sorted(rendered):
+        digest.update(f"{os.path.basename(path)}\0{rendered[path]}\0".encode())
+    return digest.hexdigest()[:16]
+
+def snapshot_credentials(snapshot_dir):
+    """The credential store saved in a snapshot's host archive"""
+    with tarfile.open(os.path.join(snapshot_dir, HOST_ARCHIVE)) as archive:
+        try:
+            return json.load(archive.extractfile(CREDENTIALS_FILE))
+        except KeyError:
+            return {}
+
+def run_options(inspect):
+    """`<runtime> create` arguments reproducing a container from its inspect output, except its network and image"""
+    config = inspect['Config']
+    host_config = inspect['HostConfig']
+    options = ['--name', inspect['Name'].lstrip('/'), '--hostname', config.get('Hostname') or inspect['Name'].lstrip('/')]
+    for key, value in (config.get('Labels') or {}).items():
+        options += ['--label', f"{key}={value}"]
+    if host_config.get('Privileged'):
+        options.append('--privileged')
+    for security_option in host_config.get('SecurityOpt') or []:
+        options += ['--security-opt', security_option]
+    for path, mount_options in (host_config.get('Tmpfs') or {}).items():
+        options += ['--tmpfs', f"{path}:{mount_options}" if mount_options else path]
+    for bind in host_config.get('Binds') or []:
+        options += ['--volume', bind]
+    for mount in inspect.get('Mounts') or []:
+        if mount.get('Type') == 'volume':
+            options += ['--volume', mount['Destination']]
+    for device in host_config.get('Devices') or []:
+        options += ['--device', f"{device['PathOnHost']}:{device['PathInContainer']}"]
+    for container_port, bindings in (host_config.get('PortBindings') or {}).items():
+        for binding in bindings or []:
+            host = f"{binding['HostIp']}:" if binding.get('HostIp') else ''
+            options += ['--publish', f"{host}{binding.get('HostPort', '')}:{container_port}"]
+    restart = host_config.get('RestartPolicy') or {}
+    if restart.get('Name'):
+        policy = restart['Name']
+        if policy == 'on-failure' and restart.get('MaximumRetryCount'):
+            policy += f":{restart['MaximumRetryCount']}"
+        options += ['--restart', policy]
+    if host_config.get('CgroupnsMode'):
+        options += ['--cgroupns', host_config['CgroupnsMode']]
+    return options
+
+def network_options(inspect):
+    """The container's network and addresses; certificates and etcd of a kubeadm node refer to its address"""
+    for network, settings in (inspect['NetworkSettings'].get('Networks') or {}).items():
+        return {'network': network, 'ip': settings.get('IPAddress', ''), 'ip6': settings.get('GlobalIPv6Address', '')}
+    return {'network': '', 'ip': '', 'ip6': ''}
+
+def snapshot_image(container, key):
+    return f"{IMAGE_REPOSITORY}/{container}:{key}"
+
+def volume_archive_name(container, destination):
+    return f"{container}{destination.replace('/', '-')}.tar"
+
+def capture(config, auto=False):
+    env = config['environment']
+    if auto and not env.get('snapshot', {}).get('enabled', False):
+        print("ℹ️ Snapshots are disabled")
+        return True
+
+    runtime = ClusterRuntime(config)
+    k8s_dir = get_k8s_dir(env)
+    containers = [container for container in runtime.list_containers() if container['role'] in KIND_ROLES]
+    if not containers:
+        print(f"❌ No containers found for cluster '{runtime.cluster_name}'")
+        return False
+
+    snapshot_dir = get_snapshot_dir(env)
+    context = prepare_context(copy.deepcopy(config))
+    key = config_hash(context)
+    print(f"📸 Capturing snapshot {key} of '{runtime.cluster_name}'...")
+
+    # The previous snapshot is replaced; its manifest goes first so it is never used half-overwritten
+    previous = load_manifest(snapshot_dir)
+    if os.path.exists(os.path.join(snapshot_dir, MANIFEST_FILE)):
+        os.remove(os.path.join(snapshot_dir, MANIFEST_FILE))
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    # Nodes are stopped so etcd and containerd are captured in a consistent state
+    if not runtime.stop():
+        return False
+    names = [container['name'] for container in containers]
+    inspected = {entry['Name'].lstrip('/'): entry for entry in json.loads(run([runtime.runtime, 'inspect', *names]))}
+
+    def capture_container(name):
+        image = snapshot_image(name, key)
+        run([runtime.runtime, 'commit', name, image])
+        for mount in inspected[name].get('Mounts') or []:
+            if mount.get('Type') != 'volume':
+                continue
+            run([runtime.runtime, 'run', '--rm', '--volumes-from', name, '-v', f"{snapshot_dir}:/snapshot",
+                 '--entrypoint', 'tar', image, '-C', mount['Destination'], '-cf',
+                 f"/snapshot/{volume_archive_name(name, mount['Destination'])}", '.'])
+
+    print(f"  📦 Committing {len(names)} containers...")
+    results = runtime.for_each(names, capture_container)
+    captured = runtime.report(results, 'Captured')
+
+    print("  📦 Archiving the environment directory...")
+    with tarfile.open(os.path.join(snapshot_dir, HOST_ARCHIVE), 'w') as archive:
+        for entry in [mount['local_path'] for mount in context['mounts']] + STATE_ENTRIES:
+            if os.path.exists(os.path.join(k8s_dir, entry)):
+                archive.add(os.path.join(k8s_dir, entry), arcname=entry)
+
+    if not runtime.start():
+        captured = False
+    if not captured:
+        print("❌ Snapshot failed")
+        return False
+
+    nodes = []
+    for container in containers:
+        name = container['name']
+        image = snapshot_image(name, key)
+        nodes.append({
+            'name': name,
+            'role': container['role'],
+            'image': image,
+            'create': run_options(inspected[name]),
+            'address': network_options(inspected[name]),
+            'volumes': [
+                {'destination': mount['Destination'], 'archive': volume_archive_name(name, mount['Destination'])}
+                for mount in inspected[name].get('Mounts') or [] if mount.get('Type') == 'volume'
+            ],
+        })
+    manifest = {
+        'config_hash': key,
+        'cluster_name': runtime.cluster_name,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'nodes': nodes,
+    }
+    write_file_atomic(os.path.join(snapshot_dir, MANIFEST_FILE), json.dumps(manifest, indent=2) + "\n")
+
+    # Images of the replaced snapshot
+    if previous and previous['config_hash'] != key:
+        stale = [node['image'] for node in previous['nodes']]
+        run([runtime.runtime, 'image', 'rm', *stale], check=False)
+    print(f"✅ Snapshot {key} saved to {snapshot_dir}")
+    return True
+
+def check(config):
+    """True when a complete snapshot exists and matches the current configuration"""
+    env = config['environment']
+    snapshot_dir = get_snapshot_dir(env)
+    manifest = load_manifest(snapshot_dir)
+    if manifest is None:
+        print(f"ℹ️ No snapshot of '{env['name']}'")
+        return False
+
+    # The snapshot's credentials are restored with it, so they are the ones the configuration is rendered with.
+    # Presets and templates are loaded without their on-disk caches, so a check writes nothing under k8s_dir
+    warm_up()
+    key = config_hash(prepare_context(copy.deepcopy(config), credentials=snapshot_credentials(snapshot_dir)))
+    if key != manifest['config_hash']:
+        print(f"ℹ️ The snapshot of {manifest['created']} was taken with a different configuration")
+        return False
+
+    runtime = ClusterRuntime(config)
+    try:
+        run([runtime.runtime, 'image', 'inspect', *[node['image'] for node in manifest['nodes']]])
+    except RuntimeError:
+        print("ℹ️ The images of the snapshot are missing")
+        return False
+    print(f"✅ Snapshot {key} of {manifest['created']} matches the configuration")
+    return True
+
+def restore_files(config):
+    """Restore the environment directory (mounts, certificates, configuration, credentials) from the snapshot"""
+    env = config['environment']
+    snapshot_dir = get_snapshot_dir(env)
+    if load_manifest(snapshot_dir) is None:
+        print(f"❌ No snapshot of '{env['name']}'")
+        return False
+    k8s_dir = get_k8s_dir(env)
+    os.makedirs(k8s_dir, exist_ok=True)
+    with tarfile.open(os.path.join(snapshot_dir, HOST_ARCHIVE)) as archive:
+        for entry in archive.getmembers():
+            if '/' not in entry.name and os.path.isdir(os.path.join(k8s_dir, entry.name)) and entry.isdir():
+                shutil.rmtree(os.path.join(k8s_dir, entry.name))
+        # Archives are created by capture(); the filter only silences the warning of newer Pythons
+        archive.extractall(k8s_dir, **({'filter': 'tar'} if hasattr(tarfile, 'tar_filter') else {}))
+    print(f"✅ Restored {k8s_dir}")
+    return True
+
+def restore_nodes(config, timeout=180):
+    """Re-create the node containers from the snapshot images and volume archives, then start them"""
+    env = config['environment']
+    snapshot_dir = get_snapshot_dir(env)
+    manifest = load_manifest(snapshot_dir)
+    if manifest is None:
+        print(f"❌ No snapshot of '{env['name']}'")
+        return False
+
+    runtime = ClusterRuntime(config)
+    nodes = {node['name']: node for node in manifest['nodes']}
+
+    def restore_node(name):
+        node = nodes[name]
+        address = node['address']
+        run([runtime.runtime, 'rm', '-f', name], check=False)
+        network = ['--network', address['network']] if address['network'] else []
+        pinned = network + (['--ip', address['ip']] if address['ip'] else []) + (['--ip6', address['ip6']] if address['ip6'] else [])
+        try:
+            run([runtime.runtime, 'create', *pinned, *node['create'], node['image']])
+        except RuntimeError as error:
+            # Addresses can only be pinned on networks with a configured subnet, or may have been taken
+            if pinned == network:
+                raise
+            print(f"    ⚠️  {name}: cannot keep address {address['ip'] or address['ip6']}, using a new one ({error})")
+            run([runtime.runtime, 'create', *network, *node['create'], node['image']])
+        for volume in node['volumes']:
+            run([runtime.runtime, 'run', '--rm', '--volumes-from', name, '-v', f"{snapshot_dir}:/snapshot:ro",
+                 '--entrypoint', 'tar', node['image'], '-C', volume['destination'], '-xf',
+                 f"/snapshot/{volume['archive']}"])
+
+    print(f"🔄 Restoring {len(nodes)} containers from snapshot {manifest['config_hash']}...")
+    results = runtime.for_each(list(nodes), restore_node)
+    if not runtime.report(results, 'Restored'):
+        return False
+    return runtime.start(timeout)
+
+def show(config):
+    manifest = load_manifest(get_snapshot_dir(config['environment']))
+    if manifest is None:
+        print("ℹ️ No snapshot")
+        return False
+    print(f"📸 Snapshot {manifest['config_hash']} of '{manifest['cluster_name']}', taken {manifest['created']}")
+    for node in manifest['nodes']:
+        print(f"  {node['role']:<24} {node['name']:<36} {node['image']}")
+    return True
+
+def delete(config):
+    env = config['environment']
+    snapshot_dir = get_snapshot_dir(env)
+    manifest = load_manifest(snapshot_dir)
+    if manifest is not None:
+        run([ClusterRuntime(config).runtime, 'image', 'rm', *[node['image'] for node in manifest['nodes']]], check=False)
+    if os.path.exists(snapshot_dir):
+        shutil.rmtree(snapshot_dir)
+        print(f"✅ Deleted the snapshot of '{env['name']}'")
+    else:
+        print(f"ℹ️ No snapshot of '{env['name']}'")
+    return True
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Snapshot and restore the local environment")
+    parser.add_argument('config_file', help="path to k8s-env.yaml")
+    parser.add_argument('action', choices=['capture', 'check', 'restore-files', 'restore-nodes', 'show', 'delete'])
+    parser.add_argument('--auto', action='store_true', help="with capture: only capture when snapshot.enabled is set")
+    parser.add_argument('--timeout', type=int, default=180, help="seconds to wait for the restored nodes (default: 180)")
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    config = load_config(args.config_file)
+
+    if args.action == 'capture':
+        ok = capture(config, args.auto)
+    elif args.action == 'check':
+        ok = check(config)
+    elif args.action == 'restore-files':
+        ok = restore_files(config)
+    elif args.action == 'restore-nodes':
+        ok = restore_nodes(config, args.timeout)
+    elif args.action == 'show':
+        ok = show(config)
+    else:
+        ok = delete(config)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
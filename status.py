@@ -0,0 +1,684 @@
+#!/usr/bin/env python3
+"""
+Status of the local environment, collected in one pass.
+
+The configuration side comes from a single prepare_context() call. The live side comes from a few bulk
+queries run concurrently: one `kubectl get nodes,namespaces,pods,services,ingresses -A -o json`, Traefik's
+IngressRouteTCPs (a separate call, since the CRD may not be installed), `helm list -A -o json` and one
+`<runtime> ps -a --format json`. A status run takes about as long as the slowest of them instead of one
+round trip per namespace and resource.
+
+Usage:
+    python3 status.py k8s-env.yaml                  # cluster overview (task status)
+    python3 status.py k8s-env.yaml all              # every section (task status:all)
+    python3 status.py k8s-env.yaml dns --json       # one JSON document instead of the tree view
+    python3 status.py k8s-env.yaml --cache-ttl 10   # reuse live results collected less than 10s ago
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import calendar
+import subprocess
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+
+from generate_configs import (
+    load_config, prepare_context, build_task_vars, write_file_atomic, DNSMASQ_HOSTS_DIR,
+)
+from k8s_runtime import ClusterRuntime
+
+SECTIONS = ['overview', 'environment', 'cluster', 'services', 'dns', 'storage', 'logs', 'certificates', 'all']
+ALL_SECTIONS = ['environment', 'cluster', 'services', 'dns', 'storage', 'logs', 'certificates']
+
+# Sections that need the live queries; the others only read the configuration and local files
+LIVE_SECTIONS = {'overview', 'cluster', 'dns', 'all'}
+
+KUBECTL_RESOURCES = 'nodes,namespaces,pods,services,ingresses'
+TCP_ROUTE_RESOURCE = 'ingressroutetcps.traefik.io'
+
+# Namespaces of the cluster itself and of the internal components, left out of "User Namespaces"
+SYSTEM_NAMESPACES = {'kube-system', 'kube-public', 'kube-node-lease', 'local-path-storage', 'traefik', 'registry'}
+
+STATUS_CACHE_FILE = 'status.json'
+
+DEFAULT_TIMEOUT = 10
+
+def query(command, timeout):
+    """Run one query; returns (stdout, None) or (None, error message)"""
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return None, str(e)
+    if result.returncode != 0:
+        return None, result.stderr.strip() or f"exit code {result.returncode}"
+    return result.stdout, None
+
+def parse_timestamp(value):
+    """Seconds since the epoch of a Kubernetes (RFC 3339, UTC) timestamp"""
+    if not value:
+        return None
+    return calendar.timegm(time.strptime(value.replace('Z', '').split('.')[0], '%Y-%m-%dT%H:%M:%S'))
+
+def format_age(created, now=None):
+    """Age in kubectl's short format: 45s, 3m20s, 71m, 5h12m, 30h, 6d4h, 40d"""
+    if created is None:
+        return '<unknown>'
+    seconds = max(0, int((now or time.time()) - created))
+    minutes, hours, days = seconds // 60, seconds // 3600, seconds // 86400
+    if seconds < 120:
+        return f"{seconds}s"
+    if minutes < 10:
+        return f"{minutes}m{seconds % 60}s" if seconds % 60 else f"{minutes}m"
+    if hours < 3:
+        return f"{minutes}m"
+    if hours < 8:
+        return f"{hours}h{minutes % 60}m" if minutes % 60 else f"{hours}h"
+    if hours < 48:
+        return f"{hours}h"
+    if days < 8:
+        return f"{days}d{hours % 24}h" if hours % 24 else f"{days}d"
+    if days < 730:
+        return f"{days}d"
+    return f"{days // 365}y"
+
+def format_size(size):
+    """Size in du -h style: 512B, 4.0K, 12M"""
+    for unit in ['B', 'K', 'M', 'G']:
+        if size < 1024 or unit == 'G':
+            if unit == 'B':
+                return f"{size}{unit}"
+            return f"{size:.1f}{unit}" if size < 10 else f"{size:.0f}{unit}"
+        size /= 1024
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+def summarize_node(node):
+    conditions = {condition['type']: condition['status'] for condition in node.get('status', {}).get('conditions', [])}
+    status = 'Ready' if conditions.get('Ready') == 'True' else 'NotReady'
+    if node.get('spec', {}).get('unschedulable'):
+        status += ',SchedulingDisabled'
+    roles = sorted(
+        label.split('/', 1)[1] for label in node['metadata'].get('labels', {})
+        if label.startswith('node-role.kubernetes.io/')
+    )
+    return {
+        'name': node['metadata']['name'],
+        'status': status,
+        'roles': roles,
+        'version': node.get('status', {}).get('nodeInfo', {}).get('kubeletVersion'),
+        'created': parse_timestamp(node['metadata'].get('creationTimestamp')),
+    }
+
+def summarize_pod(pod):
+    statuses = pod.get('status', {}).get('containerStatuses', []) or []
+    status = pod.get('status', {}).get('phase', 'Unknown')
+    for container in statuses:
+        state = container.get('state', {})
+        reason = (state.get('waiting') or state.get('terminated') or {}).get('reason')
+        if reason:
+            status = reason
+            break
+    if pod['metadata'].get('deletionTimestamp'):
+        status = 'Terminating'
+    return {
+        'namespace': pod['metadata']['namespace'],
+        'name': pod['metadata']['name'],
+        'status': status,
+        'ready': f"{sum(1 for container in statuses if container.get('ready'))}/{len(pod.get('spec', {}).get('containers', []))}",
+        'restarts': sum(container.get('restartCount', 0) for container in statuses),
+        'created': parse_timestamp(pod['metadata'].get('creationTimestamp')),
+    }
+
+def summarize_service(service):
+    ports = []
+    for port in service.get('spec', {}).get('ports', []) or []:
+        node_port = f":{port['nodePort']}" if port.get('nodePort') else ''
+        ports.append(f"{port['port']}{node_port}/{port.get('protocol', 'TCP')}")
+    return {
+        'namespace': service['metadata']['namespace'],
+        'name': service['metadata']['name'],
+        'type': service.get('spec', {}).get('type', 'ClusterIP'),
+        'cluster_ip': service.get('spec', {}).get('clusterIP', ''),
+        'ports': ','.join(ports) or '<none>',
+    }
+
+def summarize_ingress(ingress):
+    addresses = ingress.get('status', {}).get('loadBalancer', {}).get('ingress', []) or [{}]
+    return {
+        'namespace': ingress['metadata']['namespace'],
+        'name': ingress['metadata']['name'],
+        'hosts': [rule['host'] for rule in ingress.get('spec', {}).get('rules', []) or [] if rule.get('host')],
+        'address': addresses[0].get('ip') or addresses[0].get('hostname') or 'N/A',
+    }
+
+def summarize_tcp_route(route):
+    spec = route.get('spec', {})
+    return {
+        'namespace': route['metadata']['namespace'],
+        'name': route['metadata']['name'],
+        'entry_points': spec.get('entryPoints', []),
+        'services': [
+            f"{service['name']}:{service.get('port')}"
+            for item in spec.get('routes', []) or [] for service in item.get('services', []) or []
+        ],
+    }
+
+def list_containers(runtime):
+    """The cluster's containers; returns (containers, None) or (None, error message)"""
+    try:
+        return runtime.list_containers(), None
+    except (OSError, RuntimeError, ValueError) as e:
+        return None, str(e)
+
+def collect_live(config, task_vars, helm_binary='helm', timeout=DEFAULT_TIMEOUT):
+    """Run the bulk queries concurrently and reduce their output to what the status views show"""
+    kubeconfig = os.path.join(task_vars['K8S_DIR'], 'kubeconfig')
+    queries = {}
+    if os.path.exists(kubeconfig):
+        kubectl = ['kubectl', '--kubeconfig', kubeconfig, '--request-timeout', f"{timeout}s"]
+        queries['resources'] = kubectl + ['get', KUBECTL_RESOURCES, '--all-namespaces', '-o', 'json']
+        queries['tcp_routes'] = kubectl + ['get', TCP_ROUTE_RESOURCE, '--all-namespaces', '-o', 'json']
+        queries['releases'] = [helm_binary, 'list', '--all-namespaces', '--kubeconfig', kubeconfig, '-o', 'json']
+
+    with ThreadPoolExecutor(max_workers=len(queries) + 1) as executor:
+        futures = {name: executor.submit(query, command, timeout) for name, command in queries.items()}
+        futures['containers'] = executor.submit(list_containers, ClusterRuntime(config))
+        outputs = {name: future.result() for name, future in futures.items()}
+
+    live = {
+        'collected_at': time.time(),
+        'kubeconfig': os.path.exists(kubeconfig),
+        'api_reachable': False,
+        'containers': [], 'nodes': [], 'namespaces': [], 'pods': [], 'services': [], 'ingresses': [],
+        'tcp_routes': [], 'releases': [],
+        'errors': {name: error for name, (_, error) in outputs.items() if error},
+    }
+    # A missing Traefik CRD only means there are no TCP routes
+    live['errors'].pop('tcp_routes', None)
+
+    live['containers'] = outputs['containers'][0] or []
+
+    output = outputs.get('resources', (None, None))[0]
+    if output is not None:
+        live['api_reachable'] = True
+        summarizers = {
+            'Node': ('nodes', summarize_node),
+            'Pod': ('pods', summarize_pod),
+            'Service': ('services', summarize_service),
+            'Ingress': ('ingresses', summarize_ingress),
+        }
+        for item in json.loads(output).get('items', []):
+            if item.get('kind') == 'Namespace':
+                live['namespaces'].append({
+                    'name': item['metadata']['name'],
+                    'phase': item.get('status', {}).get('phase', ''),
+                    'created': parse_timestamp(item['metadata'].get('creationTimestamp')),
+                })
+            elif item.get('kind') in summarizers:
+                key, summarize = summarizers[item['kind']]
+                live[key].append(summarize(item))
+
+    output = outputs.get('tcp_routes', (None, None))[0]
+    if output is not None:
+        live['tcp_routes'] = [summarize_tcp_route(item) for item in json.loads(output).get('items', [])]
+
+    output = outputs.get('releases', (None, None))[0]
+    if output is not None:
+        live['releases'] = [
+            {key: release.get(key) for key in ('name', 'namespace', 'status', 'chart', 'app_version', 'revision')}
+            for release in json.loads(output or '[]') or []
+        ]
+    return live
+
+def load_live(config, task_vars, cache_ttl=0, helm_binary='helm', timeout=DEFAULT_TIMEOUT):
+    """Live status, reused from <k8s_dir>/.cache/status.json when it is younger than cache_ttl seconds"""
+    cache_path = os.path.join(task_vars['K8S_DIR'], '.cache', STATUS_CACHE_FILE)
+    if cache_ttl > 0 and os.path.exists(cache_path):
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if time.time() - cached.get('collected_at', 0) < cache_ttl:
+                cached['cached'] = True
+                return cached
+        except (OSError, ValueError):
+            pass
+
+    live = collect_live(config, task_vars, helm_binary, timeout)
+    if cache_ttl > 0:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        write_file_atomic(cache_path, json.dumps(live) + "\n")
+    return live
+
+def collect_config(context, task_vars):
+    """The configuration side of the status, from one prepare_context() result"""
+    k8s_dir = context['k8s_dir']
+    records = []
+    hosts_dir = os.path.join(k8s_dir, 'config', DNSMASQ_HOSTS_DIR)
+    if os.path.isdir(hosts_dir):
+        for name in sorted(os.listdir(hosts_dir)):
+            if name.startswith('.'):
+                continue
+            with open(os.path.join(hosts_dir, name)) as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) >= 2 and not fields[0].startswith('#'):
+                        records.append(f"{fields[1]}/{fields[0]}")
+    dnsmasq_conf = os.path.join(k8s_dir, 'config', 'dnsmasq.conf')
+    if os.path.exists(dnsmasq_conf):
+        with open(dnsmasq_conf) as f:
+            records.extend(line.strip()[len('address=/'):] for line in f if line.startswith('address=/'))
+
+    return {
+        'environment': {
+            'name': task_vars['ENV_NAME'],
+            'base_dir': task_vars['BASE_DIR'],
+            'local_domain': task_vars['LOCAL_DOMAIN'],
+            'local_ip': task_vars['LOCAL_IP'],
+            'runtime': task_vars['RUNTIME'],
+            'servers': int(task_vars['SERVERS']),
+            'workers': int(task_vars['WORKERS']),
+            'allow_control_plane_scheduling': task_vars['ALLOW_CONTROL_PLANE_SCHEDULING'] == 'true',
+            'run_services_on_workers_only': task_vars['RUN_SERVICES_ON_WORKERS_ONLY'] == 'true',
+            'use_service_presets': task_vars['USE_SERVICE_PRESETS'] == 'true',
+            'registry_host': task_vars['REGISTRY_HOST'],
+        },
+        'services': {
+            'system': [
+                {'name': service['name'], 'namespace': service.get('namespace', service['name']),
+                 'ports': service.get('ports') or []}
+                for service in context['system_services'] if service.get('enabled', False)
+            ],
+            'user': [
+                {'name': service['name'], 'namespace': service.get('namespace', service['name'])}
+                for service in context['user_services'] if service.get('enabled', False)
+            ],
+        },
+        'releases': [{'name': name, 'namespace': release['namespace']} for name, release in context['release_plan'].items()],
+        'dns': {
+            'container': f"{task_vars['CLUSTER_NAME']}-dns",
+            'config_file': dnsmasq_conf,
+            'hosts_dir': hosts_dir,
+            'records': records,
+        },
+    }
+
+def collect_local(context, task_vars):
+    """Storage, logs and certificates under <k8s_dir>"""
+    k8s_dir = context['k8s_dir']
+    nodes = [f"control-{i}" for i in range(int(task_vars['SERVERS']))] + \
+            [f"worker-{i}" for i in range(int(task_vars['WORKERS']))]
+
+    def recent(path, count=3):
+        try:
+            entries = [os.path.join(path, name) for name in os.listdir(path)]
+        except OSError:
+            return []
+        return [os.path.basename(entry) for entry in sorted(entries, key=os.path.getmtime, reverse=True)[:count]]
+
+    logs = {}
+    for node in nodes:
+        path = os.path.join(k8s_dir, 'logs', node)
+        if os.path.isdir(path):
+            logs[node] = {
+                'size': format_size(directory_size(path)),
+                'containers': recent(os.path.join(path, 'containers')),
+                'pods': recent(os.path.join(path, 'pods')),
+            }
+
+    def describe_certificate(path):
+        if not os.path.exists(path):
+            return None
+        output, _ = query(['openssl', 'x509', '-in', path, '-noout', '-subject', '-issuer', '-dates'], DEFAULT_TIMEOUT)
+        return output.strip().splitlines() if output else []
+
+    certificates = {
+        'ca_path': context['root_ca_path'],
+        'directory': os.path.join(k8s_dir, 'certs'),
+        'root_ca': describe_certificate(os.path.join(k8s_dir, 'certs', 'rootCA.pem')),
+        'domain': describe_certificate(os.path.join(k8s_dir, 'certs', f"{task_vars['LOCAL_DOMAIN']}.pem")),
+    }
+    storage = {
+        node: format_size(directory_size(os.path.join(k8s_dir, 'storage', node)))
+        if os.path.isdir(os.path.join(k8s_dir, 'storage', node)) else 'N/A'
+        for node in nodes
+    }
+    return {'storage': {'path': os.path.join(k8s_dir, 'storage'), 'nodes': storage},
+            'logs': {'path': os.path.join(k8s_dir, 'logs'), 'nodes': logs},
+            'certificates': certificates}
+
+def cluster_state(status):
+    """'running', 'stopped' or 'missing', from the node containers"""
+    nodes = [c for c in status['live']['containers'] if c['role'] in ('control-plane', 'worker')]
+    if not nodes:
+        return 'missing'
+    return 'running' if any(c['running'] and c['role'] == 'control-plane' for c in nodes) else 'stopped'
+
+def print_pods(pods, prefix, now):
+    if not pods:
+        print(f"{prefix}└── No pods found")
+    width = max((len(pod['name']) for pod in pods), default=0)
+    for pod in pods:
+        print(f"{prefix}├── {pod['name']:<{width}}  {pod['status']}/{pod['ready']}  "
+              f"Restarts: {pod['restarts']}  Age: {format_age(pod['created'], now)}")
+
+def print_services(services, prefix):
+    if not services:
+        print(f"{prefix}└── No services found")
+    width = max((len(service['name']) for service in services), default=0)
+    for service in services:
+        print(f"{prefix}├── {service['name']:<{width}}  Type: {service['type']}  "
+              f"Cluster-IP: {service['cluster_ip']}  Ports: {service['ports']}")
+
+def print_ingresses(ingresses, prefix):
+    if not ingresses:
+        print(f"{prefix}└── No ingresses found")
+    for ingress in ingresses:
+        print(f"{prefix}├── {ingress['name']}")
+        print(f"{prefix}│   ├── Hosts: {' '.join(ingress['hosts'])}")
+        print(f"{prefix}│   └── Address: {ingress['address']}")
+
+def in_namespace(items, namespace):
+    return [item for item in items if item['namespace'] == namespace]
+
+def print_overview(status):
+    """The `task status` view; returns the exit code"""
+    config, live = status['config'], status['live']
+    name = config['environment']['name']
+    now = live['collected_at']
+
+    print("🔍 Checking cluster status...")
+    state = cluster_state(status)
+    if state == 'missing':
+        print(f"❌ Cluster '{name}' does not exist")
+        return 1
+    if state == 'stopped':
+        print(f"❌ Cluster '{name}' is not running")
+        return 1
+    print(f"✅ Cluster '{name}' is running")
+
+    print("\n📊 DNS Status:")
+    dns = next((c for c in live['containers'] if c['role'] == 'dns'), None)
+    print(f"└── {config['dns']['container']}: {dns['status'] if dns else 'Not running'}")
+
+    if not live['kubeconfig']:
+        print(f"❌ Kubeconfig not found at {os.path.join(status['k8s_dir'], 'kubeconfig')}")
+        return 1
+    if not live['api_reachable']:
+        print("❌ Cluster is not accessible. Containers may be stopped.")
+        print("👉 Try running 'task start-env' to start the cluster")
+        return 1
+
+    print("\n📊 Node Status:")
+    if not live['nodes']:
+        print("├── No nodes found")
+    for node in live['nodes']:
+        roles = ', '.join(node['roles']) or '<none>'
+        print(f"├── {node['name']:<25} {node['status']:<10} {'Roles: ' + roles:<25} Age: {format_age(node['created'], now)}")
+
+    print("\n📊 Namespace Status:")
+    for namespace in live['namespaces']:
+        print(f"├── {namespace['name']:<25} {namespace['phase']:<10} Age: {format_age(namespace['created'], now)}")
+
+    print("\n📊 Traefik Status:")
+    if any(namespace['name'] == 'traefik' for namespace in live['namespaces']):
+        print_pods(in_namespace(live['pods'], 'traefik'), '', now)
+    else:
+        print("├── Traefik not installed")
+
+    print("\n📊 Registry Status:")
+    if any(namespace['name'] == 'registry' for namespace in live['namespaces']):
+        print("├── Pods:")
+        print_pods(in_namespace(live['pods'], 'registry'), '│   ', now)
+        print("├── Services:")
+        print_services(in_namespace(live['services'], 'registry'), '│   ')
+        print("└── Ingress:")
+        ingresses = in_namespace(live['ingresses'], 'registry')
+        if ingresses:
+            print(f"    ├── Name: {ingresses[0]['name']}")
+            print(f"    ├── Hosts: {' '.join(ingresses[0]['hosts'])}")
+            print(f"    └── Address: {ingresses[0]['address']}")
+        else:
+            print("    └── No ingress configured")
+    else:
+        print("├── Registry not installed")
+
+    print("\n📊 User Namespaces:")
+    user_namespaces = [ns['name'] for ns in live['namespaces'] if ns['name'] not in SYSTEM_NAMESPACES]
+    if not user_namespaces:
+        print("├── No user namespaces found")
+    for namespace in user_namespaces:
+        print(f"├── Namespace: {namespace}")
+        pods, services = in_namespace(live['pods'], namespace), in_namespace(live['services'], namespace)
+        ingresses = in_namespace(live['ingresses'], namespace)
+        if pods:
+            print("│   ├── Pods:")
+            print_pods(pods, '│   │   ', now)
+        if services:
+            print("│   ├── Services:")
+            print_services(services, '│   │   ')
+        if ingresses:
+            print("│   └── Ingresses:")
+            print_ingresses(ingresses, '│       ')
+
+    print("\n📊 Enabled Services Status:")
+    by_namespace = {}
+    for service in config['services']['system'] + config['services']['user']:
+        by_namespace.setdefault(service['namespace'], []).append(service['name'])
+    if not by_namespace:
+        print("├── No enabled services found")
+    deployed = {(release['namespace'], release['name']): release for release in live['releases']}
+    for namespace, names in by_namespace.items():
+        print(f"├── Namespace: {namespace}")
+        print("│   ├── Pods:")
+        print_pods(in_namespace(live['pods'], namespace), '│   │   ', now)
+        print("│   ├── Services:")
+        print_services(in_namespace(live['services'], namespace), '│   │   ')
+        print("│   ├── Ingresses:")
+        print_ingresses(in_namespace(live['ingresses'], namespace), '│   │   ')
+        routes = in_namespace(live['tcp_routes'], namespace)
+        if routes:
+            print("│   ├── TCP Routes:")
+            for route in routes:
+                print(f"│   │   ├── {route['name']}  Entry points: {', '.join(route['entry_points'])}  "
+                      f"Services: {', '.join(route['services'])}")
+        print("│   ├── Releases:")
+        for name in names:
+            release = deployed.get((namespace, name))
+            if release:
+                print(f"│   │   ├── {name}  {release['status']}  Chart: {release['chart']}  Revision: {release['revision']}")
+            else:
+                print(f"│   │   ├── {name}  not deployed")
+        print(f"│   └── Enabled Services: {' '.join(names)}")
+
+    for query_name, error in live['errors'].items():
+        if query_name != 'resources':
+            print(f"\n⚠️  {query_name} could not be collected: {error}")
+    print("\n✅ Status check complete")
+    return 0
+
+def print_environment(status):
+    env = status['config']['environment']
+    print("🌍 Environment Configuration:")
+    print(f"├── Name: {env['name']}")
+    print(f"├── Base Directory: {env['base_dir']}")
+    print(f"├── Local Domain: {env['local_domain']}")
+    print(f"├── Local IP: {env['local_ip']}")
+    print(f"├── Container Runtime: {env['runtime']}")
+    print("├── Nodes:")
+    print(f"│   ├── Control Plane: {env['servers']}")
+    print(f"│   ├── Workers: {env['workers']}")
+    print(f"│   ├── Allow Control Plane Scheduling: {str(env['allow_control_plane_scheduling']).lower()}")
+    print(f"│   └── Run Services on Workers Only: {str(env['run_services_on_workers_only']).lower()}")
+    print(f"└── Service Presets Enabled: {str(env['use_service_presets']).lower()}")
+    return 0
+
+def print_cluster(status):
+    name = status['config']['environment']['name']
+    live = status['live']
+    print(f"🏢 Cluster Name: {name}")
+    state = cluster_state(status)
+    if state == 'missing':
+        print(f"ℹ️ Cluster {name} does not exist")
+        return 0
+    print(f"├── State: {state}")
+    for container in live['containers']:
+        print(f"├── {container['name']} ({container['role']}): {container['status']}")
+    if live['api_reachable']:
+        versions = sorted({node['version'] for node in live['nodes'] if node['version']})
+        print(f"└── API server: reachable, {len(live['nodes'])} nodes, Kubernetes {', '.join(versions)}")
+    else:
+        print(f"└── API server: not reachable{': ' + live['errors']['resources'] if 'resources' in live['errors'] else ''}")
+    return 0
+
+def print_services_config(status):
+    services = status['config']['services']
+    print("🔌 Enabled Services:")
+    if services['system']:
+        print("├── System Services (with presets):")
+        for service in services['system']:
+            print(f"│   ├── {service['name']}: {', '.join(str(port) for port in service['ports'])}")
+    else:
+        print("├── System Services: None enabled")
+    if services['user']:
+        print("├── User Services (custom configuration):")
+        for service in services['user']:
+            print(f"│   ├── {service['name']} (namespace: {service['namespace']})")
+    else:
+        print("├── User Services: None enabled")
+    print(f"└── Registry: {status['config']['environment']['registry_host']}")
+    return 0
+
+def print_dns(status):
+    dns = status['config']['dns']
+    container = next((c for c in status['live']['containers'] if c['role'] == 'dns'), None)
+    print("🔍 DNS Configuration:")
+    print(f"├── Container Name: {dns['container']}")
+    print(f"├── Status: {container['status'] if container else 'Not running'}")
+    print(f"├── Config File: {dns['config_file']}")
+    print(f"└── Hosts Directory: {dns['hosts_dir']}")
+    if dns['records']:
+        print("\n📄 DNS Records:")
+        for record in dns['records']:
+            print(f"├── {record}")
+    return 0
+
+def print_storage(status):
+    storage = status['local']['storage']
+    print("💾 Storage Information:")
+    print(f"├── Base Path: {storage['path']}")
+    control = {node: size for node, size in storage['nodes'].items() if node.startswith('control-')}
+    workers = {node: size for node, size in storage['nodes'].items() if node.startswith('worker-')}
+    print("├── Control Plane Storage:")
+    for node, size in control.items():
+        print(f"│   ├── {node}: {size}")
+    print("└── Worker Storage:")
+    for node, size in workers.items():
+        print(f"    ├── {node}: {size}")
+    return 0
+
+def print_logs(status):
+    logs = status['local']['logs']
+    print("📝 Logs Information:")
+    print(f"├── Base Path: {logs['path']}")
+    for kind, title, prefix in [('control', 'Control Plane Logs:', '│'), ('worker', 'Worker Logs:', ' ')]:
+        print(f"{'├' if kind == 'control' else '└'}── {title}")
+        for node, info in logs['nodes'].items():
+            if not node.startswith(f"{kind}-"):
+                continue
+            print(f"{prefix}   ├── {node}:")
+            print(f"{prefix}   │   ├── Size: {info['size']}")
+            if info['containers']:
+                print(f"{prefix}   │   ├── Container Logs:")
+                for name in info['containers']:
+                    print(f"{prefix}   │   │   ├── {name}")
+            if info['pods']:
+                print(f"{prefix}   │   └── Pod Logs:")
+                for name in info['pods']:
+                    print(f"{prefix}   │       ├── {name}")
+            else:
+                print(f"{prefix}   │   └── No logs present")
+    return 0
+
+def print_certificates(status):
+    certificates = status['local']['certificates']
+    print("🔐 Certificate Information:")
+    print(f"├── CA Path: {certificates['ca_path']}")
+    print(f"├── Certificates Directory: {certificates['directory']}")
+    for key, title in [('root_ca', 'Root CA Certificate:'), ('domain', 'Domain Certificate:')]:
+        if certificates[key] is not None:
+            print(f"├── {title}")
+            for line in certificates[key]:
+                print(f"│   ├── {line}")
+    return 0
+
+PRINTERS = {
+    'overview': print_overview,
+    'environment': print_environment,
+    'cluster': print_cluster,
+    'services': print_services_config,
+    'dns': print_dns,
+    'storage': print_storage,
+    'logs': print_logs,
+    'certificates': print_certificates,
+}
+
+def collect_status(config, section, cache_ttl=0, helm_binary='helm', timeout=DEFAULT_TIMEOUT):
+    """Everything the given section shows: config, live (when needed) and local files"""
+    task_vars = build_task_vars(config)
+    context = prepare_context(config)
+    status = {'k8s_dir': task_vars['K8S_DIR'], 'config': collect_config(context, task_vars)}
+    if section in LIVE_SECTIONS:
+        status['live'] = load_live(config, task_vars, cache_ttl, helm_binary, timeout)
+    if section in ('storage', 'logs', 'certificates', 'all'):
+        status['local'] = collect_local(context, task_vars)
+    return status
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Show the status of the local environment")
+    parser.add_argument('config_file', help="path to k8s-env.yaml")
+    parser.add_argument('section', nargs='?', choices=SECTIONS, default='overview',
+                        help="what to show (default: overview)")
+    parser.add_argument('--json', action='store_true', help="print the collected status as JSON")
+    parser.add_argument('--cache-ttl', type=float, default=0,
+                        help="reuse live results collected less than this many seconds ago (default: 0, no cache)")
+    parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT,
+                        help=f"seconds to wait for each query (default: {DEFAULT_TIMEOUT})")
+    parser.add_argument('--helm-binary', default='helm', help="helm binary for `helm list` (default: helm)")
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    start = time.monotonic()
+    # Keep the generator's messages out of the status views
+    with redirect_stdout(sys.stderr):
+        status = collect_status(load_config(args.config_file), args.section, args.cache_ttl,
+                                args.helm_binary, args.timeout)
+    if args.json:
+        print(json.dumps(status, indent=2))
+        return 0
+
+    sections = ALL_SECTIONS if args.section == 'all' else [args.section]
+    code = 0
+    for index, section in enumerate(sections):
+        if index:
+            print()
+        code = PRINTERS[section](status) or code
+    if 'live' in status:
+        if status['live'].get('cached'):
+            print(f"\n⏱️  Status from cache, collected {format_age(status['live']['collected_at'])} ago")
+        else:
+            print(f"\n⏱️  Status collected in {time.monotonic() - start:.2f}s")
+    return code
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# The scripts live at the repository root, next to the Taskfile
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from generate_configs import create_output_directories, load_config, prepare_context, save_credential_store
+
+EXAMPLE_CONFIG = os.path.join(ROOT_DIR, 'k8s-env.yaml.example')
+
+@pytest.fixture
+def config(tmp_path):
+    """The example config, with its environment under a temporary base-dir"""
+    config = load_config(EXAMPLE_CONFIG)
+    config['environment']['base-dir'] = str(tmp_path)
+    return config
+
+@pytest.fixture
+def context(config):
+    """The prepared context of the example config, with its output directories and credentials created"""
+    context = prepare_context(config)
+    create_output_directories(context)
+    save_credential_store(context['k8s_dir'], context['credentials'])
+    return context
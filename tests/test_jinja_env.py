@@ -0,0 +1,20 @@
+import os
+
+from generate_configs import CONFIG_TEMPLATES, get_jinja_env, render_template
+
+def test_the_bytecode_cache_follows_the_cache_dir(tmp_path):
+    first, second = str(tmp_path / 'a' / 'jinja'), str(tmp_path / 'b' / 'jinja')
+    env = get_jinja_env(first)
+    assert env.bytecode_cache.directory == first
+    assert get_jinja_env(second) is env
+    assert env.bytecode_cache.directory == second
+    assert get_jinja_env(None).bytecode_cache is None
+    # The directory is only created when a compiled template is written to it
+    assert not os.path.exists(first) and not os.path.exists(second)
+
+def test_compiled_templates_are_cached_under_the_callers_directory(context):
+    cache_dir = os.path.join(context['k8s_dir'], '.cache', 'jinja')
+    env = get_jinja_env(cache_dir)
+    env.cache.clear()
+    render_template(CONFIG_TEMPLATES['dnsmasq.conf'], context)
+    assert os.listdir(cache_dir)
@@ -0,0 +1,147 @@
+import socket
+import asyncio
+import threading
+
+import pytest
+
+import loadgen
+
+RESPONSES = {
+    '/ok': b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: close\r\n\r\nok",
+    '/missing': b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n",
+    '/fail': b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n",
+}
+
+class StubServer:
+    """HTTP/TCP stub on an ephemeral port, served by its own event loop in a background thread"""
+
+    def __init__(self):
+        self.paths = []
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+
+    async def handle(self, reader, writer):
+        request_line = await reader.readline()
+        if request_line:
+            path = request_line.split()[1].decode()
+            self.paths.append(path)
+            while (await reader.readline()) not in (b'\r\n', b''):
+                pass
+            if path == '/slow':
+                await asyncio.sleep(1)
+            writer.write(RESPONSES.get(path, RESPONSES['/ok']))
+            await writer.drain()
+        writer.close()
+
+    def serve(self):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(asyncio.start_server(self.handle, '127.0.0.1', 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+
+    def start(self):
+        self.thread.start()
+        self.ready.wait(5)
+        return self
+
+    async def shutdown(self):
+        self.server.close()
+        handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in handlers:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+
+@pytest.fixture
+def stub():
+    server = StubServer().start()
+    yield server
+    server.stop()
+
+def http_target(port, path):
+    return {'name': 'stub', 'kind': 'http', 'host': '127.0.0.1', 'port': port, 'path': path}
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_run_sends_rate_times_duration_requests(stub):
+    [result] = loadgen.run([http_target(stub.port, '/ok')], rate=50, duration=0.2, timeout=2)
+    assert result['requests'] == 10
+    assert result['ok'] == 10
+    assert result['failed'] == 0
+    assert result['statuses'] == {'200': 10}
+    assert result['errors'] == {}
+    assert stub.paths == ['/ok'] * 10
+    assert result['p50_ms'] <= result['p95_ms'] <= result['p99_ms'] <= result['max_ms']
+    assert result['throughput'] > 0
+
+def test_run_reports_every_target_in_order(stub):
+    results = loadgen.run([http_target(stub.port, '/ok'), http_target(stub.port, '/missing')],
+                          rate=20, duration=0.1, timeout=2)
+    assert [result['path'] for result in results] == ['/ok', '/missing']
+    assert [result['requests'] for result in results] == [2, 2]
+
+def test_server_errors_count_as_failures(stub):
+    [result] = loadgen.run([http_target(stub.port, '/fail')], rate=50, duration=0.1, timeout=2)
+    assert result['requests'] == 5
+    assert result['ok'] == 0
+    assert result['failed'] == 5
+    assert result['statuses'] == {'503': 5}
+    assert result['errors'] == {'HTTP 503': 5}
+    assert result['p50_ms'] is None and result['max_ms'] is None
+    assert result['throughput'] == 0.0
+
+def test_client_errors_still_count_as_responses(stub):
+    [result] = loadgen.run([http_target(stub.port, '/missing')], rate=50, duration=0.1, timeout=2)
+    assert result['ok'] == 5
+    assert result['statuses'] == {'404': 5}
+
+def test_drive_target_tcp_connects_without_a_request(stub):
+    target = {'name': 'stub', 'kind': 'tcp', 'host': '127.0.0.1', 'port': stub.port, 'path': None}
+    samples, elapsed = asyncio.run(loadgen.drive_target(target, 50, 0.1, 10, 2, None))
+    assert len(samples) == 5
+    assert all(sample['status'] is None and sample['error'] is None for sample in samples)
+    assert elapsed >= 0.08
+
+def test_drive_target_records_connection_errors():
+    target = {'name': 'closed', 'kind': 'tcp', 'host': '127.0.0.1', 'port': closed_port(), 'path': None}
+    samples, _ = asyncio.run(loadgen.drive_target(target, 50, 0.1, 10, 2, None))
+    assert len(samples) == 5
+    assert all(sample['error'] for sample in samples)
+
+def test_drive_target_times_out_slow_responses(stub):
+    samples, _ = asyncio.run(loadgen.drive_target(http_target(stub.port, '/slow'), 10, 0.1, 10, 0.1, None))
+    assert [sample['error'] for sample in samples] == ["timed out after 0.1s"]
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 11))
+    assert loadgen.percentile(values, 50) == 5
+    assert loadgen.percentile(values, 95) == 10
+    assert loadgen.percentile(values, 99) == 10
+    assert loadgen.percentile(values, 10) == 1
+    assert loadgen.percentile([7], 99) == 7
+    assert loadgen.percentile([], 50) is None
+
+def test_summarize():
+    samples = [{'latency': latency / 1000, 'status': 200, 'error': None} for latency in range(1, 101)]
+    samples += [{'latency': 0.5, 'status': 502, 'error': 'HTTP 502'},
+                {'latency': 5.0, 'status': None, 'error': 'timed out after 5.0s'}]
+    result = loadgen.summarize({'name': 'stub', 'kind': 'http'}, samples, 2.0)
+    assert result['name'] == 'stub'
+    assert result['requests'] == 102
+    assert result['ok'] == 100
+    assert result['failed'] == 2
+    assert result['seconds'] == 2.0
+    assert result['throughput'] == 50.0
+    assert result['statuses'] == {'200': 100, '502': 1}
+    assert result['errors'] == {'HTTP 502': 1, 'timed out after 5.0s': 1}
+    assert (result['p50_ms'], result['p95_ms'], result['p99_ms'], result['max_ms']) == (50.0, 95.0, 99.0, 100.0)
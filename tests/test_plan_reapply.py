@@ -0,0 +1,66 @@
+import os
+import sys
+
+import pytest
+
+from generate_configs import (
+    SCRIPT_DIR, generate_config_files, mark_releases_applied, plan_reapply, prepare_context,
+)
+
+CONFIG_FILE = 'k8s-env.yaml'
+
+@pytest.fixture
+def deployed(config, context):
+    """An environment whose configuration files are generated and whose releases are all deployed"""
+    generate_config_files(context)
+    mark_releases_applied(config)
+    return config
+
+def config_var():
+    return f"CONFIG_FILE={os.path.abspath(CONFIG_FILE)}"
+
+def test_nothing_changed(deployed):
+    assert plan_reapply(CONFIG_FILE, deployed, []) == []
+
+def test_cluster_files_are_only_reported(deployed):
+    actions = plan_reapply(CONFIG_FILE, deployed, ['containerd.yaml', 'cluster.yaml'])
+    assert [command for _, command in actions] == [None, None]
+    assert [description.split()[0] for description, _ in actions] == ['cluster.yaml', 'containerd.yaml']
+
+def test_dns_configuration_recreates_the_dns_container(deployed):
+    assert plan_reapply(CONFIG_FILE, deployed, ['dnsmasq.conf', 'dnsmasq.d/services.hosts']) == [
+        ("DNS configuration changed, re-creating the DNS container", ['task', 'start-dnsmasq', config_var()]),
+    ]
+
+def test_dns_records_only_reload_dnsmasq(deployed):
+    assert plan_reapply(CONFIG_FILE, deployed, ['dnsmasq.d/services.hosts']) == [
+        ("DNS records changed, reloading dnsmasq",
+         [sys.executable, os.path.join(SCRIPT_DIR, 'k8s_runtime.py'), CONFIG_FILE, 'reload-dns']),
+    ]
+
+def test_changed_releases_are_deployed_with_the_tiers_and_routes(deployed):
+    deployed['environment']['enable-metrics-server'] = not deployed['environment'].get('enable-metrics-server', False)
+    changed = generate_config_files(prepare_context(deployed))
+    assert changed == ['helmfile.yaml']
+    actions = plan_reapply(CONFIG_FILE, deployed, changed + ['storage-tiers.yaml', 'traefik-tcp-routes.yaml'])
+    assert actions == [
+        ("Releases changed: metrics-server", ['task', 'kubernetes:deploy-changed-services', config_var()]),
+    ]
+
+def test_helmfile_without_release_changes_applies_the_rest(deployed):
+    k8s_dir = prepare_context(deployed)['k8s_dir']
+    actions = plan_reapply(CONFIG_FILE, deployed, ['helmfile.yaml', 'storage-tiers.yaml', 'traefik-tcp-routes.yaml'])
+    assert actions == [
+        ("Storage tiers changed, applying them", ['task', 'kubernetes:apply-storage-tiers', config_var()]),
+        ("TCP routes changed, applying them",
+         ['kubectl', '--kubeconfig', os.path.join(k8s_dir, 'kubeconfig'), 'apply', '-f',
+          os.path.join(k8s_dir, 'config', 'traefik-tcp-routes.yaml')]),
+    ]
+
+def test_actions_run_in_dependency_order(config, context):
+    # Without a recorded deploy every release counts as changed
+    generate_config_files(context)
+    actions = plan_reapply(CONFIG_FILE, config, ['cluster.yaml', 'helmfile.yaml', 'dnsmasq.conf'])
+    assert [command[1] if command else None for _, command in actions] == [
+        None, 'start-dnsmasq', 'kubernetes:deploy-changed-services',
+    ]
@@ -0,0 +1,51 @@
+import json
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+import probe
+
+ARGS = SimpleNamespace(image='python:3-alpine', timeout=1.0, attempts=1, backoff=0.1, pod_timeout=5)
+TARGETS = [{'host': 'mysql.dev.me', 'port': 3306}]
+
+@pytest.fixture
+def kubectl(monkeypatch):
+    """Records the kubectl calls; `run` is the behaviour of `kubectl run`"""
+    calls = []
+    behaviour = {'run': lambda: SimpleNamespace(stdout='', stderr='', returncode=1)}
+
+    def fake_run(command, **kwargs):
+        calls.append(command)
+        if command[3] == 'run':
+            return behaviour['run']()
+        return SimpleNamespace(stdout='', stderr='', returncode=0)
+
+    monkeypatch.setattr(probe.subprocess, 'run', fake_run)
+    return SimpleNamespace(calls=calls, behaviour=behaviour)
+
+def test_results_are_read_from_the_pod_output(kubectl):
+    results = [{'host': 'mysql.dev.me', 'port': 3306, 'ok': True}]
+    kubectl.behaviour['run'] = lambda: SimpleNamespace(stdout=f"pod ready\n{json.dumps({'results': results})}\n", stderr='')
+    assert probe.probe_in_cluster('kubeconfig', TARGETS, ARGS) == results
+
+def test_a_stuck_pod_is_reported_and_deleted(kubectl, capsys):
+    def timeout():
+        raise subprocess.TimeoutExpired('kubectl', ARGS.pod_timeout)
+    kubectl.behaviour['run'] = timeout
+    assert probe.probe_in_cluster('kubeconfig', TARGETS, ARGS) is None
+    assert "❌ Probe pod failed: no result within 5s" in capsys.readouterr().out
+    assert [command[3] for command in kubectl.calls] == ['delete', 'run', 'delete']
+    assert kubectl.calls[-1][-1] == '--wait=false'
+
+def test_a_missing_kubectl_is_reported(monkeypatch, capsys):
+    def missing(command, **kwargs):
+        raise FileNotFoundError(2, "No such file or directory", 'kubectl')
+    monkeypatch.setattr(probe.subprocess, 'run', missing)
+    assert probe.probe_in_cluster('kubeconfig', TARGETS, ARGS) is None
+    assert "❌ Probe pod failed: [Errno 2] No such file or directory: 'kubectl'" in capsys.readouterr().out
+
+def test_output_without_results_is_reported(kubectl, capsys):
+    kubectl.behaviour['run'] = lambda: SimpleNamespace(stdout='', stderr='ImagePullBackOff')
+    assert probe.probe_in_cluster('kubeconfig', TARGETS, ARGS) is None
+    assert "❌ Probe pod failed: ImagePullBackOff" in capsys.readouterr().out
@@ -0,0 +1,89 @@
+import pytest
+
+from generate_configs import build_release_plan
+
+REGISTRY_HOST = 'registry.dev.me'
+TIMEOUTS = {'default': 600, 'postgresql': 900, 'api': 120}
+
+def service(name, values=None, needs=None, namespace=None, chart='bitnami/postgresql', timeout=None):
+    config = {'chart': chart}
+    if timeout:
+        config['timeout'] = timeout
+    result = {'name': name, 'base_values': values or {}, 'config': config}
+    if needs is not None:
+        result['needs'] = needs
+    if namespace:
+        result['namespace'] = namespace
+    return result
+
+def plan(services, deploy_metrics_server=False):
+    return build_release_plan(services, REGISTRY_HOST, deploy_metrics_server, TIMEOUTS)
+
+def test_internal_components_only():
+    releases, tiers = plan([], deploy_metrics_server=True)
+    assert tiers == [['traefik', 'metrics-server'], ['registry']]
+    assert releases['registry']['needs'] == ['traefik/traefik']
+    assert releases['metrics-server']['namespace'] == 'kube-system'
+
+def test_needs_are_derived_from_the_values():
+    releases, tiers = plan([
+        service('db'),
+        service('web', {'ingress': {'enabled': True, 'hosts': [{'host': 'web.dev.me'}]}}),
+        service('hidden', {'ingress': {'enabled': False}}),
+        service('app', {'image': {'repository': f"{REGISTRY_HOST}/app"}}),
+    ])
+    assert releases['db']['needs'] == []
+    assert releases['web']['needs'] == ['traefik/traefik']
+    assert releases['hidden']['needs'] == []
+    assert releases['app']['needs'] == ['registry/registry']
+    assert tiers == [['traefik', 'db', 'hidden'], ['registry', 'web'], ['app']]
+
+def test_explicit_needs_by_name_or_namespace_and_name():
+    releases, tiers = plan([
+        service('db', namespace='data'),
+        service('cache'),
+        service('api', needs=['data/db', 'cache', 'cache']),
+        service('worker', needs=['api']),
+    ])
+    assert releases['api']['needs'] == ['data/db', 'cache/cache']
+    assert releases['worker']['needs'] == ['api/api']
+    assert [releases[name]['tier'] for name in ('db', 'cache', 'api', 'worker')] == [0, 0, 1, 2]
+    assert tiers[2] == ['worker']
+
+def test_tier_is_the_longest_dependency_chain():
+    releases, _ = plan([
+        service('a'),
+        service('b', needs=['a']),
+        service('c', needs=['b']),
+        service('d', needs=['a', 'c']),
+    ])
+    assert releases['d']['tier'] == 3
+
+@pytest.mark.parametrize('services, cycle', [
+    ([service('a', needs=['a'])], 'a -> a'),
+    ([service('a', needs=['b']), service('b', needs=['a'])], 'a -> b -> a'),
+    ([service('x'), service('a', needs=['x', 'c']), service('b', needs=['a']), service('c', needs=['b'])],
+     'a -> c -> b -> a'),
+])
+def test_dependency_cycles_are_rejected(services, cycle):
+    with pytest.raises(ValueError, match=f"Release dependency cycle: {cycle}$"):
+        plan(services)
+
+def test_unknown_needs_are_rejected():
+    with pytest.raises(ValueError, match="Service 'api' needs unknown release 'db'"):
+        plan([service('api', needs=['db'])])
+
+def test_services_cannot_shadow_internal_releases():
+    with pytest.raises(ValueError, match="Service 'registry' conflicts with another release"):
+        plan([service('registry')])
+
+def test_timeouts():
+    releases, _ = plan([
+        service('db'),
+        service('api', chart='charts/web'),
+        service('other', chart='charts/web'),
+        service('slow', chart='charts/web', timeout='1200'),
+    ])
+    # By chart name, by release name, the default, then the service's own config.timeout
+    assert [releases[name]['timeout'] for name in ('db', 'api', 'other', 'slow')] == [900, 120, 600, 1200]
+    assert releases['traefik']['timeout'] == 600
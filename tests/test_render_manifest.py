@@ -0,0 +1,69 @@
+import os
+import json
+
+from generate_configs import (
+    CONFIG_TEMPLATES, RENDER_MANIFEST_FILE, generate_config_files, hash_file, hash_render_inputs, prepare_context,
+)
+
+def output_path(context, output_name):
+    return os.path.join(context['k8s_dir'], 'config', output_name)
+
+def mtimes(context):
+    return {name: os.stat(output_path(context, name)).st_mtime_ns for name in CONFIG_TEMPLATES}
+
+def load_manifest(context):
+    with open(output_path(context, RENDER_MANIFEST_FILE)) as f:
+        return json.load(f)
+
+def test_first_run_writes_every_file_and_the_manifest(context):
+    assert generate_config_files(context) == list(CONFIG_TEMPLATES)
+    manifest = load_manifest(context)
+    assert list(manifest['files']) == list(CONFIG_TEMPLATES)
+    assert manifest['changed'] == list(CONFIG_TEMPLATES)
+    for name, entry in manifest['files'].items():
+        assert entry['template'] == CONFIG_TEMPLATES[name]
+        assert entry['input_hash'] == hash_render_inputs(CONFIG_TEMPLATES[name], context)
+        assert entry['output_hash'] == hash_file(output_path(context, name))
+
+def test_unchanged_inputs_leave_the_files_alone(context):
+    generate_config_files(context)
+    before = mtimes(context)
+    assert generate_config_files(context) == []
+    assert mtimes(context) == before
+    assert load_manifest(context)['changed'] == []
+
+def test_only_files_with_new_content_are_written(config, context):
+    generate_config_files(context)
+    before = mtimes(context)
+    config['environment']['enable-metrics-server'] = not config['environment'].get('enable-metrics-server', False)
+    assert generate_config_files(prepare_context(config)) == ['helmfile.yaml']
+    after = mtimes(context)
+    assert [name for name in CONFIG_TEMPLATES if after[name] != before[name]] == ['helmfile.yaml']
+
+def test_edited_or_deleted_outputs_are_rendered_again(context):
+    generate_config_files(context)
+    with open(output_path(context, 'dnsmasq.conf')) as f:
+        original = f.read()
+    with open(output_path(context, 'dnsmasq.conf'), 'a') as f:
+        f.write("# edited by hand\n")
+    os.remove(output_path(context, 'containerd.yaml'))
+
+    assert generate_config_files(context) == ['containerd.yaml', 'dnsmasq.conf']
+    with open(output_path(context, 'dnsmasq.conf')) as f:
+        assert f.read() == original
+    assert os.path.exists(output_path(context, 'containerd.yaml'))
+
+def test_a_missing_or_broken_manifest_renders_everything_again(context):
+    generate_config_files(context)
+    with open(output_path(context, RENDER_MANIFEST_FILE), 'w') as f:
+        f.write("{not json")
+    before = mtimes(context)
+    # The outputs are rendered again, but identical content is not rewritten
+    assert generate_config_files(context) == []
+    assert mtimes(context) == before
+    assert list(load_manifest(context)['files']) == list(CONFIG_TEMPLATES)
+
+def test_input_hash_covers_the_context(context):
+    template_name = CONFIG_TEMPLATES['helmfile.yaml']
+    assert hash_render_inputs(template_name, context) == hash_render_inputs(template_name, dict(context))
+    assert hash_render_inputs(template_name, context) != hash_render_inputs(template_name, dict(context, local_ip='10.0.0.1'))
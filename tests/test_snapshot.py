@@ -0,0 +1,82 @@
+import os
+import copy
+
+import snapshot
+from generate_configs import get_jinja_env, get_k8s_dir, prepare_context
+from snapshot import config_hash, run_options
+
+KIND_NODE_INSPECT = {
+    'Name': '/dev-me-control-plane',
+    'Config': {
+        'Hostname': 'dev-me-control-plane',
+        'Labels': {'io.x-k8s.kind.cluster': 'dev-me', 'io.x-k8s.kind.role': 'control-plane'},
+    },
+    'HostConfig': {
+        'Privileged': True,
+        'SecurityOpt': ['seccomp=unconfined', 'apparmor=unconfined'],
+        'Tmpfs': {'/tmp': '', '/run': ''},
+        'Binds': ['/lib/modules:/lib/modules:ro', '/home/dev/.local/dev-me/storage/cp:/var/local-path-provisioner'],
+        'Devices': [{'PathOnHost': '/dev/fuse', 'PathInContainer': '/dev/fuse', 'CgroupPermissions': 'rwm'}],
+        'PortBindings': {
+            '6443/tcp': [{'HostIp': '127.0.0.1', 'HostPort': '6443'}],
+            '80/tcp': [{'HostIp': '', 'HostPort': '80'}, {'HostIp': '::1', 'HostPort': '80'}],
+        },
+        'RestartPolicy': {'Name': 'on-failure', 'MaximumRetryCount': 1},
+        'CgroupnsMode': 'private',
+    },
+    'Mounts': [
+        {'Type': 'volume', 'Name': '3f2a', 'Destination': '/var'},
+        {'Type': 'bind', 'Source': '/lib/modules', 'Destination': '/lib/modules'},
+    ],
+}
+
+def test_run_options_reproduce_a_kind_node():
+    assert run_options(KIND_NODE_INSPECT) == [
+        '--name', 'dev-me-control-plane', '--hostname', 'dev-me-control-plane',
+        '--label', 'io.x-k8s.kind.cluster=dev-me', '--label', 'io.x-k8s.kind.role=control-plane',
+        '--privileged',
+        '--security-opt', 'seccomp=unconfined', '--security-opt', 'apparmor=unconfined',
+        '--tmpfs', '/tmp', '--tmpfs', '/run',
+        '--volume', '/lib/modules:/lib/modules:ro',
+        '--volume', '/home/dev/.local/dev-me/storage/cp:/var/local-path-provisioner',
+        '--volume', '/var',
+        '--device', '/dev/fuse:/dev/fuse',
+        '--publish', '127.0.0.1:6443:6443/tcp', '--publish', '80:80/tcp', '--publish', '::1:80:80/tcp',
+        '--restart', 'on-failure:1',
+        '--cgroupns', 'private',
+    ]
+
+def test_run_options_of_a_minimal_container():
+    inspect = {'Name': '/dev-me-dns', 'Config': {}, 'HostConfig': {'RestartPolicy': {'Name': 'unless-stopped'},
+                                                                     'Tmpfs': {'/cache': 'size=64m'}}}
+    assert run_options(inspect) == ['--name', 'dev-me-dns', '--hostname', 'dev-me-dns',
+                                    '--tmpfs', '/cache:size=64m', '--restart', 'unless-stopped']
+
+def test_run_options_skip_an_empty_restart_policy():
+    inspect = copy.deepcopy(KIND_NODE_INSPECT)
+    inspect['HostConfig']['RestartPolicy'] = {'Name': '', 'MaximumRetryCount': 0}
+    assert '--restart' not in run_options(inspect)
+
+def test_config_hash_is_stable_for_the_same_configuration(config, context):
+    assert config_hash(context) == config_hash(prepare_context(copy.deepcopy(config), credentials=context['credentials']))
+
+def test_config_hash_follows_the_rendered_configuration(config, context):
+    changed = copy.deepcopy(config)
+    changed['environment']['nodes']['workers'] += 1
+    assert config_hash(context) != config_hash(prepare_context(changed, credentials=context['credentials']))
+
+def test_config_hash_depends_on_the_credentials(config, context):
+    credentials = copy.deepcopy(context['credentials'])
+    for service_credentials in credentials.values():
+        for key in service_credentials:
+            service_credentials[key] = 'rotated'
+    assert config_hash(context) != config_hash(prepare_context(copy.deepcopy(config), credentials=credentials))
+
+def test_check_writes_no_caches(config, monkeypatch):
+    # Start from a process without parsed presets or compiled templates
+    get_jinja_env().cache.clear()
+    monkeypatch.setattr(snapshot, 'load_manifest', lambda snapshot_dir: {'config_hash': 'other', 'created': 'now'})
+    monkeypatch.setattr(snapshot, 'snapshot_credentials', lambda snapshot_dir: {})
+    monkeypatch.setattr('generate_configs._presets_cache', None)
+    assert snapshot.check(config) is False
+    assert not os.path.exists(os.path.join(get_k8s_dir(config['environment']), '.cache'))
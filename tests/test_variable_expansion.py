@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from generate_configs import VariableExpander
+
+ENVIRON = {'HOME': '/home/dev', 'PWD': '/work', 'LOCAL_DOMAIN': 'from-os.me'}
+K8S_ENV_VARS = {'LOCAL_DOMAIN': 'dev.me', 'ENV_NAME': 'dev', 'API_PORT': 6443}
+
+@pytest.fixture
+def expander():
+    return VariableExpander(K8S_ENV_VARS, environ=ENVIRON)
+
+@pytest.mark.parametrize('value, expected', [
+    ('plain', 'plain'),
+    ('$HOME/data', '/home/dev/data'),
+    ('${PWD}/charts', '/work/charts'),
+    ('${ENV_NAME}.${API_PORT}', 'dev.6443'),
+    # OS variables take precedence over k8s-env variables of the same name
+    ('${LOCAL_DOMAIN}', 'from-os.me'),
+    # k8s-env variables are only expanded in the braced form
+    ('$ENV_NAME', '$ENV_NAME'),
+    # Escape-like forms behave as in os.path.expandvars: only the variable after the first `$` is expanded
+    ('$$HOME', '$/home/dev'),
+    ('$${PWD}', '$/work'),
+    ('${}', '${}'),
+    ('${UNCLOSED', '${UNCLOSED'),
+    ('cost: 5$', 'cost: 5$'),
+])
+def test_expand_string(expander, value, expected):
+    assert expander.expand_string(value)[0] == expected
+
+def test_os_variables_match_os_path_expandvars(monkeypatch):
+    monkeypatch.setenv('K8S_ENV_TEST_DIR', '/srv/test')
+    expander = VariableExpander({})
+    for value in ['$K8S_ENV_TEST_DIR/a', '${K8S_ENV_TEST_DIR}b', '$$K8S_ENV_TEST_DIR', '${}', '$', '${UNSET_K8S_ENV_VAR}']:
+        assert expander.expand_string(value)[0] == os.path.expandvars(value)
+
+def test_unresolved_braced_references_are_reported(expander):
+    assert expander.expand_string('a-${MISSING}-$ALSO_MISSING-${}') == ('a-${MISSING}-$ALSO_MISSING-${}', ('${MISSING}', '${}'))
+
+def test_expand_walks_the_tree_and_records_unresolved_paths(expander):
+    values = {'image': {'tag': '${ENV_NAME}', 'pullPolicy': 'Always'}, 'replicas': 2, 'enabled': True,
+              'env': [{'name': 'DATA', 'value': '${HOME}/${MISSING}'}], 'empty': None}
+    assert expander.expand(values, source='services.api') == {
+        'image': {'tag': 'dev', 'pullPolicy': 'Always'}, 'replicas': 2, 'enabled': True,
+        'env': [{'name': 'DATA', 'value': '/home/dev/${MISSING}'}], 'empty': None,
+    }
+    assert expander.unresolved == [{'path': 'services.api.env[0].value', 'variable': '${MISSING}'}]
+    # The input is left unchanged
+    assert values['image']['tag'] == '${ENV_NAME}'
+
+def test_expand_vars_false_returns_the_values_as_they_are():
+    expander = VariableExpander(K8S_ENV_VARS, expand_vars=False, environ=ENVIRON)
+    values = {'path': '${HOME}'}
+    assert expander.expand(values) is values
+
+def test_legacy_apps_domain_is_rewritten_in_ingress_hosts_only():
+    expander = VariableExpander({'LOCAL_APPS_DOMAIN': 'apps.dev.me', 'LOCAL_DOMAIN': 'dev.me', 'APPS_SUBDOMAIN': 'apps'},
+                                environ={})
+    values = {
+        'ingress': {'hosts': [{'host': 'web.${APPS_SUBDOMAIN}.${LOCAL_DOMAIN}'}],
+                    'tls': [{'hosts': ['web.${USER_SUBDOMAIN}.${LOCAL_DOMAIN}']}]},
+        'note': 'web.${USER_SUBDOMAIN}.${LOCAL_DOMAIN}',
+    }
+    expanded = expander.expand(values, rewrite_ingress_hosts=True)
+    assert expanded['ingress']['hosts'][0]['host'] == 'web.apps.dev.me'
+    assert expanded['ingress']['tls'][0]['hosts'][0] == 'web.apps.dev.me'
+    assert expanded['note'] == 'web.${USER_SUBDOMAIN}.dev.me'
+
+def test_repeated_strings_are_expanded_once(expander, monkeypatch):
+    calls = []
+    replace = expander._replace
+    monkeypatch.setattr(expander, '_replace', lambda match: calls.append(match.group(0)) or replace(match))
+    values = [{'host': '${ENV_NAME}.${LOCAL_DOMAIN}'} for _ in range(50)]
+    assert expander.expand(values) == [{'host': 'dev.from-os.me'}] * 50
+    assert calls == ['${ENV_NAME}', '${LOCAL_DOMAIN}']
+    assert expander.expand_string('${ENV_NAME}.${LOCAL_DOMAIN}') is expander.expand_string('${ENV_NAME}.${LOCAL_DOMAIN}')
+
+def test_unresolved_references_of_memoized_strings_are_reported_at_every_path(expander):
+    expander.expand({'a': '${MISSING}', 'b': ['${MISSING}']}, source='values')
+    assert expander.unresolved == [{'path': 'values.a', 'variable': '${MISSING}'},
+                                   {'path': 'values.b[0]', 'variable': '${MISSING}'}]